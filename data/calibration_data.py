@@ -1,11 +1,17 @@
-
 class CalibrationData:
     def __init__(self):
         self.image_points = []
         self.objects_points = []
+        self.image_size = None
 
     def get_image_points(self):
         return self.image_points
 
     def get_objects_points(self):
-        return self.objects_points
\ No newline at end of file
+        return self.objects_points
+
+    def get_image_size(self):
+        return self.image_size
+
+    def set_image_size(self, image_size):
+        self.image_size = image_size
@@ -1,11 +1,18 @@
-
 class CalibrationStereoData:
-    def __init__(self, R, T):
+    def __init__(self, R, T, E = None, F = None):
         self.T = T
         self.R = R
+        self.E = E
+        self.F = F
 
     def get_rotation_matrix(self):
         return self.R
 
     def get_translation_matrix(self):
-        return self.T
\ No newline at end of file
+        return self.T
+
+    def get_essential_matrix(self):
+        return self.E
+
+    def get_fundamental_matrix(self):
+        return self.F
@@ -0,0 +1,73 @@
+from typing import Iterator, Optional
+
+import numpy as np
+
+from data.math.point_3d import Point3D
+
+HANDEDNESS_LEFT = 0
+HANDEDNESS_RIGHT = 1
+HANDEDNESS_UNKNOWN = 255
+
+
+class LandmarkSet:
+    """ Landmarks of one hand as a contiguous float32 (N, 3) array, with a confidence per landmark and a capture timestamp """
+    __slots__ = ('positions', 'confidences', 'timestamp', 'reprojection_errors', 'handedness')
+
+    def __init__(self, positions: np.ndarray, confidences: Optional[np.ndarray] = None, timestamp = 0, reprojection_errors: Optional[np.ndarray] = None, handedness = HANDEDNESS_UNKNOWN):
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(-1, 3)
+        if confidences is None:
+            confidences = np.ones(len(self.positions), dtype=np.float32)
+        self.confidences = np.ascontiguousarray(confidences, dtype=np.float32)
+        self.timestamp = timestamp
+        # Pixels, only known for triangulated landmarks
+        self.reprojection_errors = reprojection_errors
+        self.handedness = handedness
+
+    @staticmethod
+    def from_points_3d(points_3d: list[Point3D], timestamp = 0) -> 'LandmarkSet':
+        return LandmarkSet(np.array([point_3d.to_list() for point_3d in points_3d], dtype=np.float32), None, timestamp)
+
+    def with_positions(self, positions: np.ndarray) -> 'LandmarkSet':
+        """ Same landmarks (confidences, timestamp) at new positions """
+        return LandmarkSet(positions, self.confidences, self.timestamp, self.reprojection_errors, self.handedness)
+
+    def with_points_2d(self, points_2d: np.ndarray) -> 'LandmarkSet':
+        """ Same landmarks at new image positions, z is 0 """
+        points_2d = np.asarray(points_2d, dtype=np.float32).reshape(-1, 2)
+        positions = np.zeros((len(points_2d), 3), dtype=np.float32)
+        positions[:, :2] = points_2d
+        return self.with_positions(positions)
+
+    def get_positions(self) -> np.ndarray:
+        return self.positions
+
+    def get_points_2d(self) -> np.ndarray:
+        return self.positions[:, :2]
+
+    def get_confidences(self) -> np.ndarray:
+        return self.confidences
+
+    def get_reprojection_errors(self) -> Optional[np.ndarray]:
+        return self.reprojection_errors
+
+    def get_handedness(self) -> int:
+        return self.handedness
+
+    def get_timestamp(self) -> int:
+        return self.timestamp
+
+    def set_timestamp(self, timestamp: int) -> None:
+        self.timestamp = timestamp
+
+    def to_points_3d(self) -> list[Point3D]:
+        return [Point3D(x, y, z) for x, y, z in self.positions.tolist()]
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, index: int) -> Point3D:
+        x, y, z = self.positions[index].tolist()
+        return Point3D(x, y, z)
+
+    def __iter__(self) -> Iterator[Point3D]:
+        return iter(self.to_points_3d())
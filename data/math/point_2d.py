@@ -2,6 +2,8 @@ import numpy as np
 
 
 class Point2D:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x: float, y: float):
         self.x = x
         self.y = y
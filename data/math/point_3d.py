@@ -2,6 +2,8 @@ import numpy as np
 
 
 class Point3D:
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x: float, y: float, z: float):
         self.x = x
         self.y = y
@@ -0,0 +1,33 @@
+
+class MocapResult:
+    """ Immutable snapshot of what the pipeline knows about one frame """
+
+    def __init__(self, frame_id: int, timestamp: int, left_points_3d = None, right_points_3d = None, left_filtrated_points_3d = None, right_filtrated_points_3d = None, positions = None):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.left_points_3d = left_points_3d
+        self.right_points_3d = right_points_3d
+        self.left_filtrated_points_3d = left_filtrated_points_3d
+        self.right_filtrated_points_3d = right_filtrated_points_3d
+        self.positions = positions
+
+    def get_frame_id(self) -> int:
+        return self.frame_id
+
+    def get_timestamp(self) -> int:
+        return self.timestamp
+
+    def get_left_points_3d(self):
+        return self.left_points_3d
+
+    def get_right_points_3d(self):
+        return self.right_points_3d
+
+    def get_left_filtrated_points_3d(self):
+        return self.left_filtrated_points_3d
+
+    def get_right_filtrated_points_3d(self):
+        return self.right_filtrated_points_3d
+
+    def get_positions(self):
+        return self.positions
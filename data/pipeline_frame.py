@@ -0,0 +1,36 @@
+
+class PipelineFrame:
+    """ Everything known about one stereo pair while it travels through the mocap pipeline """
+
+    def __init__(self, frame_id: int, timestamp: int, stereo_frame_pair = None):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.stereo_frame_pair = stereo_frame_pair
+        self.frame_size = None
+        self.rgb_frames = None
+        self.left_points_3d = None
+        self.right_points_3d = None
+        self.left_filtrated_points_3d = None
+        self.right_filtrated_points_3d = None
+        self.positions = None
+        self.filtrated_positions = None
+        self.packet = None
+        self.finished = False
+
+    def get_frame_id(self) -> int:
+        return self.frame_id
+
+    def get_timestamp(self) -> int:
+        return self.timestamp
+
+    def finish(self) -> bool:
+        """ Marks the end of the journey of the frame, False when it was already over """
+        if self.finished:
+            return False
+        self.finished = True
+        return True
+
+    def release(self) -> None:
+        if self.stereo_frame_pair is not None:
+            self.stereo_frame_pair.release()
+            self.stereo_frame_pair = None
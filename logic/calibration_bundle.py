@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from data.calibration_stereo_data import CalibrationStereoData
+from logic.stereo_rig import StereoRig
+
+CALIBRATION_BUNDLE_VERSION = 2
+MANIFEST_FILE_NAME = 'manifest.json'
+RECTIFICATION_NAMES = ('R1', 'R2', 'P1', 'P2', 'Q')
+
+
+class CalibrationBundle(object):
+    """
+    Everything a stereo rig calibration produced, stored as one .npy file per array plus a JSON
+    manifest: intrinsics, distortion, R/T/E/F and optionally the undistortion maps and rectification
+    for one image size. Arrays load memory-mapped, the maps are paged in by the first remaps.
+    Every save writes the files of a new generation, then replaces the manifest naming them: a save never
+    writes into the files a loaded rig still maps, and a bundle without its manifest is ignored.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def get_directory(self) -> str:
+        return self.directory
+
+    def get_array_path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def get_manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_FILE_NAME)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.get_manifest_path())
+
+    @staticmethod
+    def get_cameras_names(stereo_rig: StereoRig) -> list[str]:
+        return [stereo_rig.get_left_camera().get_camera_name(), stereo_rig.get_right_camera().get_camera_name()]
+
+    def save(self, stereo_rig: StereoRig, image_size: Optional[tuple[int, int]] = None) -> None:
+        """ With an image size, the undistortion maps and the rectification for it are saved too """
+        os.makedirs(self.directory, exist_ok=True)
+        previous_manifest = self.read_manifest()
+        generation = 0 if previous_manifest is None else previous_manifest['generation'] + 1
+        left_camera = stereo_rig.get_left_camera()
+        right_camera = stereo_rig.get_right_camera()
+        calibration_stereo_data = stereo_rig.get_calibration_stereo_data()
+        arrays = {
+            'K1': left_camera.get_intrinsics_matrix(),
+            'D1': left_camera.get_distortion_coefficients(),
+            'K2': right_camera.get_intrinsics_matrix(),
+            'D2': right_camera.get_distortion_coefficients(),
+            'R': calibration_stereo_data.get_rotation_matrix(),
+            'T': calibration_stereo_data.get_translation_matrix(),
+            'E': calibration_stereo_data.get_essential_matrix(),
+            'F': calibration_stereo_data.get_fundamental_matrix(),
+        }
+        if image_size is not None:
+            for prefix, camera in (('left', left_camera), ('right', right_camera)):
+                undistorter = camera.get_undistorter()
+                if undistorter.get_maps()[0] != image_size:
+                    undistorter.build_maps(image_size)
+                _, arrays[prefix + '_map_1'], arrays[prefix + '_map_2'] = undistorter.get_maps()
+            arrays.update(zip(RECTIFICATION_NAMES, stereo_rig.get_rectification(image_size)))
+        saved_files = {}
+        for name, array in arrays.items():
+            if array is not None:
+                file_name = name + '_' + str(generation) + '.npy'
+                np.save(self.get_array_path(file_name), np.ascontiguousarray(array))
+                saved_files[name] = file_name
+        manifest = {
+            'version': CALIBRATION_BUNDLE_VERSION,
+            'generation': generation,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'cameras': self.get_cameras_names(stereo_rig),
+            'image_size': None if image_size is None else list(image_size),
+            'arrays': saved_files,
+        }
+        temporary_path = self.get_manifest_path() + '.tmp'
+        with open(temporary_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        os.replace(temporary_path, self.get_manifest_path())
+        self.remove_unused_arrays(set(saved_files.values()))
+
+    def remove_unused_arrays(self, used_files: set[str]) -> None:
+        """ Older generations are removed once the manifest no longer names them """
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.npy') and file_name not in used_files:
+                try:
+                    os.remove(self.get_array_path(file_name))
+                except OSError:
+                    # Still memory-mapped on Windows, a later save removes it
+                    pass
+
+    def read_manifest(self) -> Optional[dict]:
+        if not self.exists():
+            return None
+        try:
+            with open(self.get_manifest_path()) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != CALIBRATION_BUNDLE_VERSION:
+            return None
+        return manifest
+
+    def matches(self, stereo_rig: StereoRig) -> bool:
+        """ Whether the bundle was made for the cameras of this rig """
+        manifest = self.read_manifest()
+        return manifest is not None and manifest['cameras'] == self.get_cameras_names(stereo_rig)
+
+    def load(self, stereo_rig: StereoRig) -> bool:
+        """ Calibrates the rig and its cameras from the bundle, False if it doesn't match the rig """
+        manifest = self.read_manifest()
+        if manifest is None or manifest['cameras'] != self.get_cameras_names(stereo_rig):
+            return False
+        arrays = {name: np.load(self.get_array_path(file_name), mmap_mode='r') for name, file_name in manifest['arrays'].items()}
+        left_camera = stereo_rig.get_left_camera()
+        right_camera = stereo_rig.get_right_camera()
+        # The small matrices are copied, OpenCV and the rig write in their results
+        left_camera.set_intrinsics_matrix(np.array(arrays['K1']))
+        left_camera.set_distortion_coefficients(np.array(arrays['D1']))
+        right_camera.set_intrinsics_matrix(np.array(arrays['K2']))
+        right_camera.set_distortion_coefficients(np.array(arrays['D2']))
+        left_camera.set_calibrated(True)
+        right_camera.set_calibrated(True)
+        stereo_rig.set_calibration_stereo_data(CalibrationStereoData(
+            np.array(arrays['R']),
+            np.array(arrays['T']),
+            np.array(arrays['E']) if 'E' in arrays else None,
+            np.array(arrays['F']) if 'F' in arrays else None,
+        ))
+        image_size = manifest['image_size']
+        if image_size is not None:
+            image_size = tuple(image_size)
+            left_camera.get_undistorter().set_maps(image_size, arrays['left_map_1'], arrays['left_map_2'])
+            right_camera.get_undistorter().set_maps(image_size, arrays['right_map_1'], arrays['right_map_2'])
+            stereo_rig.set_rectification(image_size, tuple(np.array(arrays[name]) for name in RECTIFICATION_NAMES))
+        return True
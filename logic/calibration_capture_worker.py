@@ -0,0 +1,180 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Callable, Optional
+
+import numpy as np
+
+from logic.calibrator import Calibrator
+from logic.filesystem import ImagesFileSystem
+from logic.stereo_cameras import StereoCameras
+
+FRAME_WAIT_TIMEOUT = 0.5
+# The image is split in COVERAGE_GRID_SIZE x COVERAGE_GRID_SIZE cells for the board centre
+COVERAGE_GRID_SIZE = 3
+# Board bounding box area, as a fraction of the image, splitting far, middle and near boards
+COVERAGE_SCALE_LIMITS = (0.08, 0.2)
+
+
+def get_coverage_key(corners: np.ndarray, image_width: int, image_height: int) -> tuple[int, int, int]:
+    """ (column, row, scale) of the board in the image """
+    corners = corners.reshape(-1, 2)
+    centre_x, centre_y = corners.mean(axis=0)
+    column = min(int(centre_x * COVERAGE_GRID_SIZE / image_width), COVERAGE_GRID_SIZE - 1)
+    row = min(int(centre_y * COVERAGE_GRID_SIZE / image_height), COVERAGE_GRID_SIZE - 1)
+    board_width, board_height = corners.max(axis=0) - corners.min(axis=0)
+    area = board_width * board_height / (image_width * image_height)
+    scale = int(np.searchsorted(COVERAGE_SCALE_LIMITS, area))
+    return column, row, scale
+
+
+class CalibrationCaptureWorker(object):
+    """
+    Collects chessboard views for the calibration on its own thread, the UI only receives log messages.
+    Both frames of a pair are screened at once on a downscaled copy, the full resolution detection only
+    runs on pairs where both passed, and a pair is kept only when it shows the board somewhere new.
+    In shared mode it reads the frames like the mocap pipeline does, the two must not run together.
+    """
+
+    def __init__(self,
+                 stereo_cameras: StereoCameras,
+                 calibrator: Calibrator,
+                 image_file_system: ImagesFileSystem,
+                 views_number = 10,
+                 minimum_interval = 1.0,
+                 on_log: Optional[Callable[[str], None]] = None,
+                 on_finished: Optional[Callable[[int], None]] = None,
+                 ):
+        self.stereo_cameras = stereo_cameras
+        self.calibrator = calibrator
+        self.image_file_system = image_file_system
+        self.views_number = views_number
+        # Leaves time to move the board, consecutive frames are nearly the same view
+        self.minimum_interval = minimum_interval
+        self.on_log = on_log
+        self.on_finished = on_finished
+        self.covered_keys = [set(), set()]
+        self.views_counter = 0
+        self.saved_views = 0
+        self.screened_pairs = 0
+        self.duplicate_logged = False
+        self.stop_event = Event()
+        self.lock = Lock()
+        self.thread = None
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+        self.covered_keys = [set(), set()]
+        self.views_counter = 0
+        self.saved_views = 0
+        self.screened_pairs = 0
+        self.stop_event.clear()
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def get_views_counter(self) -> int:
+        return self.views_counter
+
+    def get_saved_views(self) -> int:
+        return self.saved_views
+
+    def get_screened_pairs(self) -> int:
+        return self.screened_pairs
+
+    def log(self, message: str) -> None:
+        if self.on_log is not None:
+            self.on_log(message)
+
+    def run(self) -> None:
+        try:
+            # Two threads, one per camera: OpenCV releases the GIL while searching
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                last_view_time = 0.0
+                while not self.stop_event.is_set() and self.views_counter < self.views_number:
+                    if time.monotonic() - last_view_time < self.minimum_interval:
+                        self.stop_event.wait(self.minimum_interval - (time.monotonic() - last_view_time))
+                        continue
+                    frames = self.capture_frames()
+                    if frames is None:
+                        continue
+                    if self.process_frames(executor, frames):
+                        last_view_time = time.monotonic()
+        except Exception as error:
+            self.log("Capture stopped: " + str(error))
+        finally:
+            # Leaving the executor waited for the last images to be written
+            if self.saved_views == self.views_number:
+                self.log("Congratulations, you have captured chessboards for calibration !")
+            if self.on_finished is not None:
+                self.on_finished(self.saved_views)
+
+    def capture_frames(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        stereo_cameras = self.stereo_cameras
+        left_camera = stereo_cameras.get_left_camera()
+        right_camera = stereo_cameras.get_right_camera()
+        if not stereo_cameras.is_started():
+            self.stop_event.wait(FRAME_WAIT_TIMEOUT)
+            return None
+        if not (left_camera.is_shared_mode() and right_camera.is_shared_mode()):
+            return self.calibrator.capture_frame(left_camera), self.calibrator.capture_frame(right_camera)
+        # Matched pairs only: both views of a stereo sample must show the board at the same instant
+        stereo_frame_pair = stereo_cameras.wait_for_next_frames(FRAME_WAIT_TIMEOUT)
+        if stereo_frame_pair is None:
+            return None
+        with stereo_frame_pair:
+            return stereo_frame_pair.get_left_frame().copy(), stereo_frame_pair.get_right_frame().copy()
+
+    def process_frames(self, executor: ThreadPoolExecutor, frames: tuple[np.ndarray, np.ndarray]) -> bool:
+        calibrator = self.calibrator
+        self.screened_pairs += 1
+        if not all(executor.map(calibrator.screen_chessboard, frames)):
+            return False
+        corners_list = list(executor.map(calibrator.find_chessboard_corners, frames))
+        if any(corners is None for corners in corners_list):
+            return False
+        keys = []
+        for frame, corners in zip(frames, corners_list):
+            height, width = frame.shape[:2]
+            keys.append(get_coverage_key(corners, width, height))
+        if all(key in covered_keys for key, covered_keys in zip(keys, self.covered_keys)):
+            # Once per view, a board held still is found on every frame
+            if not self.duplicate_logged:
+                self.duplicate_logged = True
+                self.log("Board already seen there, move it somewhere else")
+            return False
+        self.duplicate_logged = False
+        for key, covered_keys in zip(keys, self.covered_keys):
+            covered_keys.add(key)
+        self.save_views(executor, frames)
+        return True
+
+    def save_views(self, executor: ThreadPoolExecutor, frames: tuple[np.ndarray, np.ndarray]) -> None:
+        self.views_counter += 1
+        # Encoding runs beside the screening of the next pairs, the executor waits for it on exit
+        future = executor.submit(self.save_view, self.views_counter - 1, frames)
+        future.add_done_callback(self.on_view_saved)
+
+    def save_view(self, index: int, frames: tuple[np.ndarray, np.ndarray]) -> int:
+        for camera, frame in zip(self.stereo_cameras.get_cameras_as_list(), frames):
+            self.image_file_system.save_image('/' + camera.get_camera_name() + '/picture_' + str(index) + '.jpg', frame)
+        return index
+
+    def on_view_saved(self, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            # A full disk or a missing permission won't fix itself, better stop than collect unsaved views
+            self.stop_event.set()
+            self.log("Could not save a view, capture stopped: " + str(error))
+            return
+        with self.lock:
+            self.saved_views += 1
+        self.log("Success for view #" + str(future.result() + 1) + " of " + str(self.views_number))
@@ -1,33 +1,68 @@
+from typing import Optional
+
 import cv2
+import numpy as np
 
 from data.chessboard_data import ChessboardData
+from logic.camera import Camera
 from logic.stereo_cameras import StereoCameras
 
+# Frames are screened at this width at most, a board that can't be seen there is too small to calibrate anyway
+SCREENING_WIDTH = 640
+SCREENING_FLAGS = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK
+
 
 class Calibrator:
     def __init__(self, chessboard_data: ChessboardData):
         self.chessboard_data = chessboard_data
 
+    @staticmethod
+    def to_gray(frame: np.ndarray) -> np.ndarray:
+        if frame.ndim == 2:
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def screen_chessboard(self, frame: np.ndarray) -> bool:
+        """ Cheap presence check on a downscaled copy: a frame without any board is rejected in a few milliseconds """
+        gray_frame = self.to_gray(frame)
+        height, width = gray_frame.shape
+        if width > SCREENING_WIDTH:
+            scale = SCREENING_WIDTH / width
+            gray_frame = cv2.resize(gray_frame, (SCREENING_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA)
+        result, _ = cv2.findChessboardCorners(gray_frame, self.chessboard_data.get_size(), flags=SCREENING_FLAGS)
+        return result
+
+    def find_chessboard_corners(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """ Full resolution detection, (N, 1, 2) corners or None """
+        result, corners = cv2.findChessboardCorners(self.to_gray(frame), self.chessboard_data.get_size(), None)
+        return corners if result else None
+
     def is_chessboard_on_picture(self, frame):
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        result, corners = cv2.findChessboardCorners(gray_frame, self.chessboard_data.get_size(), None)
+        corners = self.find_chessboard_corners(frame)
         average_position = None
-        if result:
+        if corners is not None:
             average_position = self.compute_average(corners)
-        return result, average_position
+        return corners is not None, average_position
+
+    @staticmethod
+    def compute_average(corners) -> tuple:
+        average_x, average_y = np.asarray(corners).reshape(-1, 2).mean(axis=0)
+        return int(average_x), int(average_y)
 
-    def compute_average(self, corners) -> tuple:
-        average_x = 0
-        average_y = 0
-        for corner in corners:
-            average_x += corner[0][0]
-            average_y += corner[0][1]
-        num_corners = len(corners)
-        return int(average_x / num_corners), int(average_y / num_corners)
+    @staticmethod
+    def capture_frame(camera: Camera) -> np.ndarray:
+        if not camera.is_shared_mode():
+            return camera.get_frame()
+        # The capture thread owns the source, the frame is copied out of the ring so that it can be kept
+        frame_lease = camera.acquire_shared_frame()
+        if frame_lease is None:
+            raise IOError("No frame captured yet")
+        with frame_lease:
+            return frame_lease.get_frame().copy()
 
     def capture_stereo(self, stereo_cameras: StereoCameras):
-        left_frame = stereo_cameras.get_left_camera().get_frame()
-        right_frame = stereo_cameras.get_right_camera().get_frame()
+        left_frame = self.capture_frame(stereo_cameras.get_left_camera())
+        right_frame = self.capture_frame(stereo_cameras.get_right_camera())
         result1, average_point1 = self.is_chessboard_on_picture(left_frame)
         result2, average_point2 = self.is_chessboard_on_picture(right_frame)
         return result1 and result2, left_frame, right_frame
@@ -1,5 +1,8 @@
-from threading import Lock
+from threading import Condition
+from threading import RLock
 from threading import Thread
+import time
+from typing import Optional
 
 import cv2
 import numpy as np
@@ -7,45 +10,72 @@ import os
 
 from data.calibration_data import CalibrationData
 from data.chessboard_data import ChessboardData
-from logic.stats import Stats
+from logic.chessboard_detector import ChessboardDetector
+from logic.common.frame_lease import FrameLease
+from logic.common.frame_ring_buffer import FrameRingBuffer
+from logic.metrics.latency_histogram import LatencyHistogram
+from logic.process_capture import ProcessCapture
+from logic.source.device_frame_source import DeviceFrameSource
+from logic.source.frame_source import FrameSource
+from logic.undistorter import Undistorter
 
 
 class Camera(object):
-    def __init__(self, capture_id: int, fps: int, shared_mode = False, distorted = False) -> None:
+    def __init__(self, capture_id: int, fps: int, shared_mode = False, distorted = False, frame_source: Optional[FrameSource] = None, ring_slots_number = 4, capture_process = False) -> None:
         self.capture_id = capture_id
-        self.lock = Lock()
+        self.frame_source = frame_source if frame_source is not None else DeviceFrameSource(capture_id, fps)
+        self.lock = RLock()
+        self.frame_condition = Condition(self.lock)
         self.fps = fps
         self.shared_mode = shared_mode
         self.distorted = distorted
-        self.last_frame = None
-        self.capture = None
+        self.ring_slots_number = ring_slots_number
+        self.frame_ring_buffer = None
+        # Captures and decodes in another process, frames are then shared raw (never undistorted)
+        self.process_capture = ProcessCapture(self.frame_source, ring_slots_number) if capture_process and shared_mode else None
+        self.distorted_frame = None
         self.intrinsics_matrix = None
         self.distortion_coefficients = None
+        self.undistorter = None
         self.translation_matrix = None
         self.rotation_matrix = None
-        self.stats = Stats()
+        # Written by the capture thread only, the preview reads the frame rate and jitter from it
+        self.frame_intervals = LatencyHistogram('frame_interval')
+        self.last_frame_timestamp = 0
         self.calibrated = False
 
-    def start(self) -> None:
-        self.capture = cv2.VideoCapture(self.capture_id, cv2.CAP_DSHOW)
-        self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
-        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1080)
-        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    def start(self, capture_thread = True) -> None:
+        """ Without capture thread, the owner drives the shared mode through grab_frame and retrieve_into_ring_buffer """
+        if self.process_capture is not None:
+            if not capture_thread:
+                raise ValueError("A camera captured in its own process can't be driven from outside")
+            self.frame_ring_buffer = self.process_capture.start(self.notify_new_frame)
+            return
+        self.frame_source.open()
         if not self.is_started():
             raise IOError("Could not open camera")
-        if self.shared_mode:
+        if self.shared_mode and capture_thread:
             Thread(target=self.update_frame, daemon=True).start()
 
     def stop(self) -> None:
-        if self.is_started():
-            self.capture.release()
+        if self.process_capture is not None:
+            self.process_capture.stop()
+        elif self.is_started():
+            self.frame_source.release()
+        # Wake up the consumers waiting for a frame that will never come
+        with self.frame_condition:
+            self.frame_condition.notify_all()
 
     def is_started(self) -> bool:
-        return self.capture is not None and self.capture.isOpened()
+        if self.process_capture is not None:
+            return self.process_capture.is_running()
+        return self.frame_source.is_opened()
+
+    def is_capture_process(self) -> bool:
+        return self.process_capture is not None
 
     def is_frame_available(self) -> bool:
-        return self.last_frame is not None
+        return self.frame_ring_buffer is not None and self.frame_ring_buffer.is_frame_available()
 
     def is_calibrated(self) -> bool:
         return self.calibrated
@@ -56,30 +86,114 @@ class Camera(object):
     def get_capture_id(self) -> int:
         return self.capture_id
 
+    def get_frame_source(self) -> FrameSource:
+        return self.frame_source
+
     def update_frame(self) -> None:
         while self.is_started():
-            frame = self.get_frame()
-            self.stats.increment_frame_counter()
-            self.stats.compute_fps()
-            with self.lock:
-                self.last_frame = frame
+            try:
+                self.capture_into_ring_buffer()
+            except IOError:
+                # The source has been stopped or reached its end in the meantime
+                if not self.is_started():
+                    break
+                raise
+
+    def capture_into_ring_buffer(self) -> None:
+        timestamp = self.grab_frame()
+        self.retrieve_into_ring_buffer(timestamp)
+
+    def grab_frame(self) -> int:
+        if not self.frame_source.grab():
+            raise IOError("Could not grab frame")
+        return time.perf_counter_ns()
+
+    def retrieve_into_ring_buffer(self, timestamp: int) -> None:
+        if self.last_frame_timestamp:
+            self.frame_intervals.record(timestamp - self.last_frame_timestamp)
+        self.last_frame_timestamp = timestamp
+        frame_ring_buffer = self.frame_ring_buffer
+        if frame_ring_buffer is None:
+            # The real resolution is only known once the first frame has been read
+            frame = self.retrieve_frame()
+            self.create_ring_buffer(frame, timestamp)
+            return
+        slot_index = frame_ring_buffer.get_write_slot_index()
+        if slot_index is None:
+            # Every slot is leased by a reader, the grabbed frame is simply never decoded
+            frame_ring_buffer.count_dropped_frame()
+            return
+        slot = frame_ring_buffer.get_write_slot(slot_index)
+        frame = self.retrieve_frame(slot)
+        if frame is not slot:
+            if not frame_ring_buffer.is_compatible(frame):
+                self.create_ring_buffer(frame, timestamp)
+                return
+            np.copyto(slot, frame)
+        frame_ring_buffer.publish(slot_index, timestamp)
+        self.notify_new_frame()
+
+    def create_ring_buffer(self, frame: np.ndarray, timestamp: int) -> None:
+        frame_ring_buffer = FrameRingBuffer(self.ring_slots_number, frame.shape, frame.dtype, self.lock)
+        slot_index = frame_ring_buffer.get_write_slot_index()
+        np.copyto(frame_ring_buffer.get_write_slot(slot_index), frame)
+        frame_ring_buffer.publish(slot_index, timestamp)
+        self.frame_ring_buffer = frame_ring_buffer
+        self.notify_new_frame()
+
+    def notify_new_frame(self) -> None:
+        with self.frame_condition:
+            self.frame_condition.notify_all()
+
+    def get_last_sequence(self) -> int:
+        return -1 if self.frame_ring_buffer is None else self.frame_ring_buffer.get_last_sequence()
+
+    def wait_for_next_frame(self, last_sequence: int, timeout: Optional[float] = None) -> Optional[FrameLease]:
+        """ Blocks until a frame newer than last_sequence is published, returns None on timeout or stop """
+        if not self.shared_mode:
+            raise IOError("You can't use this method with shared_mode=FALSE")
+        with self.frame_condition:
+            self.frame_condition.wait_for(
+                lambda: self.get_last_sequence() > last_sequence or not self.is_started(),
+                timeout
+            )
+            if self.get_last_sequence() <= last_sequence:
+                return None
+            return self.frame_ring_buffer.acquire_latest()
 
     def get_fps_stats(self) -> int:
-        return int(self.stats.fps)
+        if self.process_capture is not None:
+            return self.process_capture.get_fps()
+        return int(self.frame_intervals.get_rate())
+
+    def get_frame_intervals(self) -> LatencyHistogram:
+        return self.frame_intervals
+
+    def get_dropped_frames(self) -> int:
+        return 0 if self.frame_ring_buffer is None else self.frame_ring_buffer.get_dropped_frames()
 
-    def get_shared_frame(self) -> np.ndarray:
+    def acquire_shared_frame(self) -> Optional[FrameLease]:
+        """ Latest frame, its slot is not overwritten until the lease is released. None until the first frame has been captured """
         if not self.shared_mode:
             raise IOError("You can't use this method with shared_mode=FALSE")
-        with self.lock:
-            last_frame = self.last_frame.copy()
-        return last_frame
+        frame_ring_buffer = self.frame_ring_buffer
+        if frame_ring_buffer is None:
+            return None
+        return frame_ring_buffer.acquire_latest()
+
+    def get_frame(self, image: Optional[np.ndarray] = None) -> np.ndarray:
+        if not self.frame_source.grab():
+            raise IOError("Could not read frame")
+        return self.retrieve_frame(image)
 
-    def get_frame(self) -> np.ndarray:
-        result, frame = self.capture.read()
+    def retrieve_frame(self, image: Optional[np.ndarray] = None) -> np.ndarray:
+        undistort = self.distorted and self.is_calibrated()
+        result, frame = self.frame_source.retrieve(self.distorted_frame if undistort else image)
         if not result:
             raise IOError("Could not read frame")
-        if self.distorted and self.is_calibrated():
-            frame = cv2.undistort(frame, self.intrinsics_matrix, self.distortion_coefficients, None, self.intrinsics_matrix)
+        if undistort:
+            self.distorted_frame = frame
+            frame = self.get_undistorter().undistort_frame(frame, image)
         #frame = cv2.bilateralFilter(frame, d=15, sigmaColor=75, sigmaSpace=75)
         return frame
 
@@ -89,31 +203,20 @@ class Camera(object):
     def is_shared_mode(self) -> bool:
         return self.shared_mode
 
-    def calibrate_new(self, images_list: list, chessboard_data: ChessboardData) -> CalibrationData:
-        return self.calibrate(images_list, chessboard_data.get_square_length(), chessboard_data.get_width(), chessboard_data.get_height())
-
     def calibrate(self, images_list: list, square_size: float, width=9, height=6) -> CalibrationData:
-        # Arrays to store object points and image points from all images
+        chessboard_detector = ChessboardDetector(ChessboardData(width, height, square_size))
+        return self.calibrate_from_detections(chessboard_detector.detect_all(images_list), chessboard_detector.get_object_points())
+
+    def calibrate_from_detections(self, detections: list, object_points: np.ndarray) -> CalibrationData:
+        """ detections: (image size, corners or None) of every image, as given by ChessboardDetector """
         calibration_data = CalibrationData()
-        chessboard_size = (width, height)
-        # Prepare object points (0,0,0), (1,0,0), (2,0,0), ...
-        objp = np.zeros((width * height, 3), np.float32)
-        objp[:, :2] = np.mgrid[0:width, 0:height].T.reshape(-1, 2)
-        objp *= square_size
-        # LOOP
-        for image_path in images_list:
-            img = cv2.imread(image_path)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            # Find the chessboard corners
-            result, corners = cv2.findChessboardCorners(gray, chessboard_size, None)
-            # If found, add object points, image points (after refining them)
-            if result:
-                corners2 = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1),
-                                            criteria=(cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001))
-                calibration_data.get_objects_points().append(objp)
-                calibration_data.get_image_points().append(corners2)
+        for image_size, corners in detections:
+            if corners is not None:
+                calibration_data.get_objects_points().append(object_points)
+                calibration_data.get_image_points().append(corners)
+                calibration_data.set_image_size(image_size)
         if len(calibration_data.get_objects_points()) > 0:
-            result, intrinsics_matrix, distortion_coefficients, _, _ = cv2.calibrateCamera(calibration_data.get_objects_points(), calibration_data.get_image_points(), gray.shape[::-1], None, None)
+            result, intrinsics_matrix, distortion_coefficients, _, _ = cv2.calibrateCamera(calibration_data.get_objects_points(), calibration_data.get_image_points(), calibration_data.get_image_size(), None, None)
             if result:
                 self.calibrated = True
                 self.intrinsics_matrix = intrinsics_matrix
@@ -127,7 +230,9 @@ class Camera(object):
         return './configs/' + self.get_camera_name() + '/calibration.xml'
 
     def save_calibration(self) -> None:
-        fs = cv2.FileStorage("calibration.xml", cv2.FILE_STORAGE_WRITE)
+        path = self.get_calibration_file_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fs = cv2.FileStorage(path, cv2.FILE_STORAGE_WRITE)
         fs.write("K", self.intrinsics_matrix)
         fs.write("D", self.distortion_coefficients)
         fs.release()
@@ -136,7 +241,7 @@ class Camera(object):
         path = self.get_calibration_file_path()
         if not os.path.exists(path):
             raise FileNotFoundError(f"The file doesn't exist in {path}")
-        fs = cv2.FileStorage("calibration_data.xml", cv2.FILE_STORAGE_READ)
+        fs = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
         self.intrinsics_matrix = fs.getNode("K").mat()
         self.distortion_coefficients = fs.getNode("D").mat()
         self.calibrated = True
@@ -145,6 +250,14 @@ class Camera(object):
     def is_calibration_config_available(self) -> bool:
         return os.path.exists(self.get_calibration_file_path())
 
+    def get_undistorter(self) -> Undistorter:
+        """ Rebuilt lazily whenever the calibration matrices are replaced """
+        undistorter = self.undistorter
+        if undistorter is None or not undistorter.matches(self.intrinsics_matrix, self.distortion_coefficients):
+            undistorter = Undistorter(self.intrinsics_matrix, self.distortion_coefficients)
+            self.undistorter = undistorter
+        return undistorter
+
     def get_distortion_coefficients(self) -> np.ndarray:
         return self.distortion_coefficients
 
@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from data.chessboard_data import ChessboardData
+
+CORNERS_CACHE_VERSION = 1
+
+
+class ChessboardCornersCache(object):
+    """
+    Persistent chessboard detections (image size and refined corners, or the failure) of calibration
+    images, keyed by path, file size and modification time so that only new or changed pictures are
+    searched again. The whole cache is dropped when the chessboard it was built for changes.
+    """
+
+    def __init__(self, cache_path: str, chessboard_data: ChessboardData):
+        self.cache_path = cache_path
+        self.chessboard = {
+            'width': chessboard_data.get_width(),
+            'height': chessboard_data.get_height(),
+            'square_length': chessboard_data.get_square_length(),
+        }
+        self.entries = {}
+        self.modified = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as cache_file:
+                content = json.load(cache_file)
+        except (OSError, ValueError):
+            # A corrupted cache is only lost time, everything is detected again
+            self.modified = True
+            return
+        if content.get('version') != CORNERS_CACHE_VERSION or content.get('chessboard') != self.chessboard:
+            self.modified = True
+            return
+        self.entries = content.get('entries', {})
+
+    @staticmethod
+    def get_file_key(image_path: str) -> Optional[list]:
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, image_path: str) -> Optional[tuple]:
+        """ Cached (image size, corners or None) if the file didn't change since, None otherwise """
+        entry = self.entries.get(os.path.abspath(image_path))
+        if entry is None or entry['file'] != self.get_file_key(image_path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        image_size = None if entry['image_size'] is None else tuple(entry['image_size'])
+        corners = None if entry['corners'] is None else np.array(entry['corners'], dtype=np.float32).reshape(-1, 1, 2)
+        return image_size, corners
+
+    def put(self, image_path: str, detection: tuple) -> None:
+        file_key = self.get_file_key(image_path)
+        if file_key is None:
+            return
+        image_size, corners = detection
+        self.entries[os.path.abspath(image_path)] = {
+            'file': file_key,
+            'image_size': None if image_size is None else list(image_size),
+            'corners': None if corners is None else np.asarray(corners, dtype=np.float32).reshape(-1, 2).tolist(),
+        }
+        self.modified = True
+
+    def save(self) -> None:
+        # Pictures deleted since are forgotten
+        entries = {image_path: entry for image_path, entry in self.entries.items() if os.path.exists(image_path)}
+        if not self.modified and len(entries) == len(self.entries):
+            return
+        self.entries = entries
+        directory = os.path.dirname(self.cache_path)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = self.cache_path + '.tmp'
+        with open(temporary_path, 'w') as cache_file:
+            json.dump({'version': CORNERS_CACHE_VERSION, 'chessboard': self.chessboard, 'entries': entries}, cache_file)
+        os.replace(temporary_path, self.cache_path)
+        self.modified = False
+
+    def get_hits(self) -> int:
+        return self.hits
+
+    def get_misses(self) -> int:
+        return self.misses
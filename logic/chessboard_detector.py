@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from data.chessboard_data import ChessboardData
+from logic.chessboard_corners_cache import ChessboardCornersCache
+
+CORNERS_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+# Below this many images the pool start up costs more than it saves
+PARALLEL_MINIMUM_IMAGES = 4
+
+
+def initialize_worker() -> None:
+    # One process per core already, OpenCV's own threads would only fight over them
+    cv2.setNumThreads(1)
+
+
+def detect_chessboard_corners(image_path: str, chessboard_size: tuple[int, int]) -> tuple[Optional[tuple[int, int]], Optional[np.ndarray]]:
+    """ Image (width, height) and refined corners, None for what couldn't be read or found """
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None, None
+    image_size = gray.shape[::-1]
+    result, corners = cv2.findChessboardCorners(gray, chessboard_size, None)
+    if not result:
+        return image_size, None
+    return image_size, cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria=CORNERS_CRITERIA)
+
+
+class ChessboardDetector(object):
+    """
+    Finds the chessboard corners of many images on a process pool, results keep the order of the paths.
+    With a cache, only the images it doesn't know yet are searched.
+    """
+
+    def __init__(self, chessboard_data: ChessboardData, workers_number: Optional[int] = None, corners_cache: Optional[ChessboardCornersCache] = None):
+        self.chessboard_data = chessboard_data
+        self.workers_number = workers_number if workers_number is not None else os.cpu_count()
+        self.corners_cache = corners_cache
+
+    def get_object_points(self) -> np.ndarray:
+        """ Chessboard corners in its own plane: (0,0,0), (1,0,0), (2,0,0) ... times the square length """
+        width, height = self.chessboard_data.get_size()
+        object_points = np.zeros((width * height, 3), np.float32)
+        object_points[:, :2] = np.mgrid[0:width, 0:height].T.reshape(-1, 2)
+        object_points *= self.chessboard_data.get_square_length()
+        return object_points
+
+    def detect_all(self, images_paths: list[str]) -> list[tuple[Optional[tuple[int, int]], Optional[np.ndarray]]]:
+        corners_cache = self.corners_cache
+        if corners_cache is None:
+            return self.detect(images_paths)
+        detections = [corners_cache.get(image_path) for image_path in images_paths]
+        missing_indices = [index for index, detection in enumerate(detections) if detection is None]
+        for index, detection in zip(missing_indices, self.detect([images_paths[index] for index in missing_indices])):
+            detections[index] = detection
+            corners_cache.put(images_paths[index], detection)
+        corners_cache.save()
+        return detections
+
+    def detect(self, images_paths: list[str]) -> list[tuple[Optional[tuple[int, int]], Optional[np.ndarray]]]:
+        chessboard_size = self.chessboard_data.get_size()
+        if self.workers_number <= 1 or len(images_paths) < PARALLEL_MINIMUM_IMAGES:
+            return [detect_chessboard_corners(image_path, chessboard_size) for image_path in images_paths]
+        with ProcessPoolExecutor(max_workers=min(self.workers_number, len(images_paths)), initializer=initialize_worker) as executor:
+            return list(executor.map(detect_chessboard_corners, images_paths, [chessboard_size] * len(images_paths)))
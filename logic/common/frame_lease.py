@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class FrameLease(object):
+    """ Read-only access to a ring buffer slot, the slot is not reused until the lease is released """
+
+    def __init__(self, frame_ring_buffer, slot_index: int, sequence: int, timestamp: int, frame: np.ndarray):
+        self.frame_ring_buffer = frame_ring_buffer
+        self.slot_index = slot_index
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.frame = frame
+        self.released = False
+
+    def get_frame(self) -> np.ndarray:
+        return self.frame
+
+    def get_sequence(self) -> int:
+        return self.sequence
+
+    def get_timestamp(self) -> int:
+        """ Capture time in perf_counter nanoseconds """
+        return self.timestamp
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.frame_ring_buffer.release(self.slot_index)
+
+    def __enter__(self) -> 'FrameLease':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
@@ -0,0 +1,125 @@
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+from logic.common.frame_lease import FrameLease
+
+LATEST_INDEX = 0
+LAST_SEQUENCE = 1
+DROPPED_FRAMES = 2
+STATE_SIZE = 3
+
+
+class FrameRingBuffer(object):
+    """
+    Preallocated frame slots written by one producer and read by many consumers without copies.
+    The producer never writes into the latest published slot nor into a slot pinned by a lease.
+    """
+
+    def __init__(self, slots_number: int, frame_shape: tuple, dtype = np.uint8, lock: Optional[Lock] = None, buffer: Optional[memoryview] = None):
+        """ With a buffer (e.g. a shared memory block), every slot and every counter lives inside it """
+        if slots_number < 2:
+            raise ValueError("A frame ring buffer needs at least 2 slots")
+        self.slots_number = slots_number
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.lock = lock if lock is not None else Lock()
+        owns_buffer = buffer is None
+        if owns_buffer:
+            buffer = bytearray(FrameRingBuffer.get_required_size(slots_number, frame_shape, dtype))
+        header = np.ndarray((3 * slots_number + STATE_SIZE,), dtype=np.int64, buffer=buffer)
+        self.sequences = header[0:slots_number]
+        self.timestamps = header[slots_number:2 * slots_number]
+        self.pins = header[2 * slots_number:3 * slots_number]
+        self.state = header[3 * slots_number:]
+        frame_size = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self.slots = [
+            np.ndarray(self.frame_shape, dtype=self.dtype, buffer=buffer, offset=header.nbytes + index * frame_size)
+            for index in range(slots_number)
+        ]
+        self.read_only_slots = [self.create_read_only_view(slot) for slot in self.slots]
+        if owns_buffer:
+            self.initialize()
+
+    @staticmethod
+    def get_required_size(slots_number: int, frame_shape: tuple, dtype = np.uint8) -> int:
+        frame_size = int(np.prod(frame_shape)) * np.dtype(dtype).itemsize
+        return (3 * slots_number + STATE_SIZE) * np.dtype(np.int64).itemsize + slots_number * frame_size
+
+    def initialize(self) -> None:
+        """ Resets the counters, only needed once by the owner of a reused buffer """
+        with self.lock:
+            self.sequences[:] = -1
+            self.timestamps[:] = 0
+            self.pins[:] = 0
+            self.state[:] = [-1, -1, 0]
+
+    @staticmethod
+    def create_read_only_view(slot: np.ndarray) -> np.ndarray:
+        view = slot.view()
+        view.flags.writeable = False
+        return view
+
+    def get_slots_number(self) -> int:
+        return self.slots_number
+
+    def get_frame_shape(self) -> tuple:
+        return self.frame_shape
+
+    def is_compatible(self, frame: np.ndarray) -> bool:
+        return frame.shape == self.frame_shape and frame.dtype == self.dtype
+
+    def get_write_slot_index(self) -> Optional[int]:
+        with self.lock:
+            latest_index = self.state[LATEST_INDEX]
+            best_index = None
+            for index in range(self.slots_number):
+                if index == latest_index or self.pins[index] > 0:
+                    continue
+                if best_index is None or self.sequences[index] < self.sequences[best_index]:
+                    best_index = index
+            return best_index
+
+    def get_write_slot(self, index: int) -> np.ndarray:
+        return self.slots[index]
+
+    def publish(self, index: int, timestamp: int) -> int:
+        with self.lock:
+            sequence = int(self.state[LAST_SEQUENCE]) + 1
+            self.sequences[index] = sequence
+            self.timestamps[index] = timestamp
+            self.state[LATEST_INDEX] = index
+            self.state[LAST_SEQUENCE] = sequence
+        return sequence
+
+    def count_dropped_frame(self) -> None:
+        with self.lock:
+            self.state[DROPPED_FRAMES] += 1
+
+    def get_dropped_frames(self) -> int:
+        return int(self.state[DROPPED_FRAMES])
+
+    def get_last_sequence(self) -> int:
+        return int(self.state[LAST_SEQUENCE])
+
+    def is_frame_available(self) -> bool:
+        return self.state[LATEST_INDEX] >= 0
+
+    def acquire_latest(self) -> Optional[FrameLease]:
+        with self.lock:
+            latest_index = int(self.state[LATEST_INDEX])
+            if latest_index < 0:
+                return None
+            self.pins[latest_index] += 1
+            return FrameLease(
+                self,
+                latest_index,
+                int(self.sequences[latest_index]),
+                int(self.timestamps[latest_index]),
+                self.read_only_slots[latest_index]
+            )
+
+    def release(self, index: int) -> None:
+        with self.lock:
+            self.pins[index] -= 1
@@ -0,0 +1,38 @@
+import numpy as np
+
+from logic.common.frame_lease import FrameLease
+
+
+class StereoFramePair(object):
+    def __init__(self, left_lease: FrameLease, right_lease: FrameLease):
+        self.left_lease = left_lease
+        self.right_lease = right_lease
+
+    def get_left_lease(self) -> FrameLease:
+        return self.left_lease
+
+    def get_right_lease(self) -> FrameLease:
+        return self.right_lease
+
+    def get_left_frame(self) -> np.ndarray:
+        return self.left_lease.get_frame()
+
+    def get_right_frame(self) -> np.ndarray:
+        return self.right_lease.get_frame()
+
+    def get_timestamp(self) -> int:
+        """ Capture time of the pair, the earliest of both frames """
+        return min(self.left_lease.get_timestamp(), self.right_lease.get_timestamp())
+
+    def get_skew(self) -> int:
+        return self.left_lease.get_timestamp() - self.right_lease.get_timestamp()
+
+    def release(self) -> None:
+        self.left_lease.release()
+        self.right_lease.release()
+
+    def __enter__(self) -> 'StereoFramePair':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
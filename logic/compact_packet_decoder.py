@@ -0,0 +1,66 @@
+from typing import Optional
+
+import numpy as np
+
+from data.landmark_set import LandmarkSet
+from logic.compact_packet_encoder import COMPACT_HEADER, COMPACT_PACKET_VERSION, FRAME_TYPE_KEYFRAME, dequantize, get_values_dtype
+from logic.packet_encoder import PACKET_HEADER, PACKET_MAGIC, HAND_HEADER
+
+
+class CompactPacketDecoder(object):
+    """
+    Receiver side of the CompactPacketEncoder format. Deltas are only applied on top of the packet just
+    before them, after a lost packet the decoder waits for the next keyframe.
+    """
+
+    def __init__(self):
+        self.quantized = None
+        self.last_sequence = None
+        self.skipped_packets = 0
+
+    def get_quantized(self) -> Optional[np.ndarray]:
+        """ (hands, landmarks, 3) int16 values of the last decoded packet """
+        return self.quantized
+
+    def get_last_sequence(self) -> Optional[int]:
+        return self.last_sequence
+
+    def get_skipped_packets(self) -> int:
+        return self.skipped_packets
+
+    def decode(self, packet) -> Optional[list[LandmarkSet]]:
+        """ None when the packet can't be rebuilt yet (delta without its reference) """
+        magic, version, hands_number, landmarks_number, sequence, timestamp = PACKET_HEADER.unpack_from(packet, 0)
+        if magic != PACKET_MAGIC or version != COMPACT_PACKET_VERSION:
+            raise ValueError(f"Not a compact mocap packet (magic {magic}, version {version})")
+        frame_type, values_size, *bounds = COMPACT_HEADER.unpack_from(packet, PACKET_HEADER.size)
+        bounds_min = np.array(bounds[:3], dtype=np.float32)
+        bounds_max = np.array(bounds[3:], dtype=np.float32)
+        offset = PACKET_HEADER.size + COMPACT_HEADER.size
+        values_number = landmarks_number * 3
+        handedness = []
+        values = np.empty((hands_number, landmarks_number, 3), dtype=np.int16)
+        for hand_index in range(hands_number):
+            handedness.append(HAND_HEADER.unpack_from(packet, offset)[0])
+            offset += HAND_HEADER.size
+            values[hand_index] = np.frombuffer(packet, dtype=get_values_dtype(values_size), count=values_number, offset=offset).reshape(landmarks_number, 3)
+            offset += values_number * values_size
+        if frame_type == FRAME_TYPE_KEYFRAME:
+            quantized = values
+        else:
+            previous_quantized = self.quantized
+            if (previous_quantized is None
+                    or self.last_sequence is None
+                    or sequence != (self.last_sequence + 1) & 0xFFFFFFFF
+                    or previous_quantized.shape != values.shape):
+                self.quantized = None
+                self.skipped_packets += 1
+                return None
+            # int16 wrap around, the exact inverse of the encoder's differences
+            quantized = previous_quantized + values
+        self.quantized = quantized
+        self.last_sequence = sequence
+        return [
+            LandmarkSet(dequantize(quantized[hand_index], bounds_min, bounds_max), timestamp=timestamp, handedness=handedness[hand_index])
+            for hand_index in range(hands_number)
+        ]
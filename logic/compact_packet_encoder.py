@@ -0,0 +1,124 @@
+import struct
+from typing import Sequence
+
+import numpy as np
+
+from data.landmark_set import LandmarkSet
+from logic.packet_encoder import PACKET_HEADER, PACKET_MAGIC, HAND_HEADER
+
+COMPACT_PACKET_VERSION = 2
+# frame type, bytes per delta (1 or 2), padding, bounding volume min (x, y, z) and max (x, y, z)
+COMPACT_HEADER = struct.Struct('<BB2x6f')
+FRAME_TYPE_KEYFRAME = 0
+FRAME_TYPE_DELTA = 1
+QUANTIZATION_LEVELS = 65535
+QUANTIZATION_OFFSET = 32768
+
+
+def quantize(positions: np.ndarray, bounds_min: np.ndarray, bounds_max: np.ndarray) -> np.ndarray:
+    """ Positions to int16 steps of the bounding volume, positions outside of it are clamped """
+    normalized = (positions - bounds_min) / (bounds_max - bounds_min)
+    steps = np.rint(np.clip(normalized, 0.0, 1.0) * QUANTIZATION_LEVELS) - QUANTIZATION_OFFSET
+    return steps.astype(np.int16)
+
+
+def get_values_dtype(values_size: int) -> str:
+    return '<i2' if values_size == 2 else 'i1'
+
+
+def dequantize(quantized: np.ndarray, bounds_min: np.ndarray, bounds_max: np.ndarray) -> np.ndarray:
+    normalized = (quantized.astype(np.float32) + QUANTIZATION_OFFSET) / QUANTIZATION_LEVELS
+    return (bounds_min + normalized * (bounds_max - bounds_min)).astype(np.float32)
+
+
+class CompactPacketEncoder(object):
+    """
+    Compact alternative to the PacketEncoder format: positions are quantized to int16 inside a bounding
+    volume (metres), a keyframe carries them as is and the following frames only their difference with
+    the previous packet, on one byte when every difference fits. Integer deltas don't drift, from any
+    keyframe the receiver rebuilds the exact quantized values. A keyframe is sent every keyframe_interval
+    packets, and whenever the hands change.
+    As with PacketEncoder, a packet stays valid until buffers_number more packets were encoded. Deltas are
+    only worth sending right away: queued packets can be dropped, so encode just before sending and call
+    request_keyframe whenever a packet is lost on the way (PacketOutput.set_on_packet_dropped).
+    """
+
+    def __init__(self, bounds_min = (-1.0, -1.0, -1.0), bounds_max = (1.0, 1.0, 1.0), keyframe_interval = 30, max_hands = 2, landmarks_number = 21, buffers_number = 1):
+        self.bounds_min = np.array(bounds_min, dtype=np.float32)
+        self.bounds_max = np.array(bounds_max, dtype=np.float32)
+        if np.any(self.bounds_max <= self.bounds_min):
+            raise ValueError("The bounding volume must not be empty")
+        self.keyframe_interval = keyframe_interval
+        self.max_hands = max_hands
+        self.landmarks_number = landmarks_number
+        self.headers_size = PACKET_HEADER.size + COMPACT_HEADER.size
+        self.packet_max_size = self.headers_size + max_hands * (HAND_HEADER.size + landmarks_number * 3 * 2)
+        self.buffers = [bytearray(self.packet_max_size) for _ in range(buffers_number)]
+        self.buffer_index = 0
+        self.sequence = 0
+        self.frames_since_keyframe = 0
+        self.previous_quantized = None
+        self.previous_handedness = None
+        # Counters rather than a flag: requests come from other threads and none may be lost while encoding
+        self.keyframe_requests = 0
+        self.handled_keyframe_requests = 0
+
+    def get_packet_max_size(self) -> int:
+        return self.packet_max_size
+
+    def get_sequence(self) -> int:
+        return self.sequence
+
+    def request_keyframe(self) -> None:
+        """ The next packet will be a keyframe, e.g. when a subscriber joins or a packet was dropped """
+        self.keyframe_requests += 1
+
+    def encode(self, hands: Sequence[LandmarkSet], timestamp = None) -> memoryview:
+        hands_number = len(hands)
+        if hands_number > self.max_hands:
+            raise ValueError(f"Can't encode {hands_number} hands, the packet holds {self.max_hands}")
+        if timestamp is None:
+            timestamp = hands[0].get_timestamp() if hands_number > 0 else 0
+        for hand in hands:
+            if len(hand) != self.landmarks_number:
+                raise ValueError(f"Expected {self.landmarks_number} landmarks, got {len(hand)}")
+        quantized = np.empty((hands_number, self.landmarks_number, 3), dtype=np.int16)
+        for hand_index, hand in enumerate(hands):
+            quantized[hand_index] = quantize(hand.get_positions(), self.bounds_min, self.bounds_max)
+        handedness = [hand.get_handedness() for hand in hands]
+        frame_type, payload, delta_size = self.create_payload(quantized, handedness)
+        buffer = self.buffers[self.buffer_index]
+        self.buffer_index = (self.buffer_index + 1) % len(self.buffers)
+        PACKET_HEADER.pack_into(buffer, 0, PACKET_MAGIC, COMPACT_PACKET_VERSION, hands_number, self.landmarks_number, self.sequence, timestamp)
+        COMPACT_HEADER.pack_into(buffer, PACKET_HEADER.size, frame_type, delta_size, *self.bounds_min.tolist(), *self.bounds_max.tolist())
+        hand_size = HAND_HEADER.size + self.landmarks_number * 3 * delta_size
+        offset = self.headers_size
+        for hand_index in range(hands_number):
+            HAND_HEADER.pack_into(buffer, offset, handedness[hand_index])
+            values = np.frombuffer(buffer, dtype=get_values_dtype(delta_size), count=self.landmarks_number * 3, offset=offset + HAND_HEADER.size)
+            np.copyto(values, payload[hand_index].reshape(-1))
+            offset += hand_size
+        self.previous_quantized = quantized
+        self.previous_handedness = handedness
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        return memoryview(buffer)[:offset]
+
+    def create_payload(self, quantized: np.ndarray, handedness: list[int]) -> tuple[int, np.ndarray, int]:
+        """ Frame type, values to write and their size in bytes """
+        previous_quantized = self.previous_quantized
+        keyframe_requests = self.keyframe_requests
+        keyframe_requested = keyframe_requests != self.handled_keyframe_requests
+        self.handled_keyframe_requests = keyframe_requests
+        if (previous_quantized is None
+                or keyframe_requested
+                or self.frames_since_keyframe + 1 >= self.keyframe_interval
+                or previous_quantized.shape != quantized.shape
+                or self.previous_handedness != handedness):
+            self.frames_since_keyframe = 0
+            return FRAME_TYPE_KEYFRAME, quantized, 2
+        self.frames_since_keyframe += 1
+        # Wraps around like the int16 sum of the decoder, so any difference fits in two bytes
+        deltas = quantized - previous_quantized
+        if deltas.size == 0 or (deltas.min() >= -128 and deltas.max() <= 127):
+            return FRAME_TYPE_DELTA, deltas.astype(np.int8), 1
+        return FRAME_TYPE_DELTA, deltas, 2
@@ -1,8 +1,12 @@
 import os
+from typing import Optional
+
 import cv2
 import numpy as np
 
+from logic.calibration_bundle import CalibrationBundle
 from logic.camera import Camera
+from logic.stereo_rig import StereoRig
 
 
 class FileSystem:
@@ -30,9 +34,11 @@ class ImagesFileSystem(FileSystem):
         super().__init__(root_path)
 
     def save_image(self, image_path: str, frame: cv2.Mat | np.ndarray) -> None:
-        self.create_root_folder()
         file_path = self.get_file_path(image_path)
-        cv2.imwrite(file_path, frame)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # imwrite only returns False, a lost calibration view must not go unnoticed
+        if not cv2.imwrite(file_path, frame):
+            raise IOError("Could not write image " + file_path)
 
     def load_image(self, image_path: str) -> np.ndarray:
         return cv2.imread(self.get_file_path(image_path))
@@ -40,6 +46,9 @@ class ImagesFileSystem(FileSystem):
     def get_all_images_paths(self, images_path: str) -> list:
         return super().get_all_files_paths(images_path, '.jpg')
 
+    def get_corners_cache_path(self) -> str:
+        return self.get_file_path('/corners_cache.json')
+
 
 class ConfigsFileSystem(FileSystem):
     def __init__(self, root_path: str) -> None:
@@ -48,8 +57,8 @@ class ConfigsFileSystem(FileSystem):
     def get_camera_calibration_config_path(self, camera: Camera) -> str:
         return self.root_path + '/' + camera.get_camera_name() + '/calibration.xml'
 
-    def get_stereo_cameras_calibration_config_path(self) -> str:
-        return self.root_path + '/stereo/calibration_config.xml'
+    def get_stereo_cameras_calibration_config_path(self, stereo_rig: StereoRig) -> str:
+        return self.root_path + '/stereo/' + '_'.join(CalibrationBundle.get_cameras_names(stereo_rig))
 
     def save_camera_calibration_config(self, camera: Camera):
         file_path = self.get_camera_calibration_config_path(camera)
@@ -68,8 +77,12 @@ class ConfigsFileSystem(FileSystem):
         file_storage.release()
         camera.set_calibrated(True)
 
-    def save_stereo_cameras_configs(self, camera: Camera):
-        pass
+    def save_stereo_cameras_configs(self, stereo_rig: StereoRig, image_size: Optional[tuple[int, int]] = None) -> None:
+        CalibrationBundle(self.get_stereo_cameras_calibration_config_path(stereo_rig)).save(stereo_rig, image_size)
+
+    def load_stereo_cameras_configs(self, stereo_rig: StereoRig) -> bool:
+        """ Whether a calibration bundle made for these cameras was found and loaded """
+        return CalibrationBundle(self.get_stereo_cameras_calibration_config_path(stereo_rig)).load(stereo_rig)
 
     def is_calibration_config_available(self, camera: Camera) -> bool:
         file_path = self.get_camera_calibration_config_path(camera)
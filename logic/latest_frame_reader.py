@@ -0,0 +1,36 @@
+from typing import Optional
+
+from logic.camera import Camera
+from logic.common.frame_lease import FrameLease
+
+
+class LatestFrameReader(object):
+    """ Consumes only the most recent frame of a camera, the frames published in between are counted as dropped """
+
+    def __init__(self, camera: Camera):
+        self.camera = camera
+        self.last_sequence = -1
+        self.read_frames = 0
+        self.dropped_frames = 0
+
+    def read_next(self, timeout: Optional[float] = None) -> Optional[FrameLease]:
+        frame_lease = self.camera.wait_for_next_frame(self.last_sequence, timeout)
+        if frame_lease is None:
+            return None
+        if self.last_sequence >= 0:
+            self.dropped_frames += frame_lease.get_sequence() - self.last_sequence - 1
+        self.last_sequence = frame_lease.get_sequence()
+        self.read_frames += 1
+        return frame_lease
+
+    def get_camera(self) -> Camera:
+        return self.camera
+
+    def get_last_sequence(self) -> int:
+        return self.last_sequence
+
+    def get_read_frames(self) -> int:
+        return self.read_frames
+
+    def get_dropped_frames(self) -> int:
+        return self.dropped_frames
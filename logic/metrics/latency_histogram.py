@@ -0,0 +1,112 @@
+from typing import Optional
+
+# Log-linear buckets: each power of two is split in SUB_BUCKETS_NUMBER buckets, about 3% of resolution
+SUB_BUCKETS_BITS = 5
+SUB_BUCKETS_NUMBER = 1 << (SUB_BUCKETS_BITS - 1)
+# Enough buckets for a bit more than a minute in nanoseconds, longer durations share the last one
+BUCKETS_NUMBER = 38 * SUB_BUCKETS_NUMBER
+PERCENTILES = (50.0, 95.0, 99.0)
+
+
+def get_bucket_index(value: int) -> int:
+    if value < (1 << SUB_BUCKETS_BITS):
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKETS_BITS
+    return min(shift * SUB_BUCKETS_NUMBER + (value >> shift), BUCKETS_NUMBER - 1)
+
+
+def get_bucket_upper_bound(index: int) -> int:
+    """ Greatest value stored in the bucket """
+    if index < (1 << SUB_BUCKETS_BITS):
+        return index
+    shift = index // SUB_BUCKETS_NUMBER - 1
+    mantissa = index - shift * SUB_BUCKETS_NUMBER
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram(object):
+    """
+    Durations in nanoseconds, counted in log-linear buckets.
+    Only one thread records into a histogram, so there is no lock: readers copy the counts and can see a
+    snapshot one record behind, which is fine for statistics.
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.counts = [0] * BUCKETS_NUMBER
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def get_name(self) -> str:
+        return self.name
+
+    def record(self, duration: int) -> None:
+        self.counts[get_bucket_index(duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.max:
+            self.max = duration
+
+    def get_count(self) -> int:
+        return self.count
+
+    def get_max(self) -> int:
+        return self.max
+
+    def get_last(self) -> int:
+        return self.last
+
+    def get_mean(self) -> float:
+        count = self.count
+        return self.total / count if count > 0 else 0.0
+
+    def get_percentiles(self, percentiles = PERCENTILES) -> list[Optional[int]]:
+        """ Upper bound of the bucket holding each percentile, None while empty """
+        counts = list(self.counts)
+        count = sum(counts)
+        if count == 0:
+            return [None] * len(percentiles)
+        ranks = [max(int(count * percentile / 100.0 + 0.5), 1) for percentile in percentiles]
+        values = [None] * len(percentiles)
+        cumulated = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count == 0:
+                continue
+            cumulated += bucket_count
+            for rank_index, rank in enumerate(ranks):
+                if values[rank_index] is None and cumulated >= rank:
+                    values[rank_index] = min(get_bucket_upper_bound(index), self.max)
+            if all(value is not None for value in values):
+                break
+        return values
+
+    def get_percentile(self, percentile: float) -> Optional[int]:
+        return self.get_percentiles((percentile,))[0]
+
+    def get_rate(self) -> float:
+        """ Events per second, for a histogram of the intervals between them (the median resists the hiccups) """
+        median = self.get_percentile(50.0)
+        return 1e9 / median if median else 0.0
+
+    def snapshot(self) -> dict:
+        """ Summary in milliseconds """
+        p50, p95, p99 = self.get_percentiles(PERCENTILES)
+        return {
+            'count': self.count,
+            'mean_ms': self.get_mean() / 1e6,
+            'p50_ms': None if p50 is None else p50 / 1e6,
+            'p95_ms': None if p95 is None else p95 / 1e6,
+            'p99_ms': None if p99 is None else p99 / 1e6,
+            'max_ms': self.max / 1e6,
+        }
+
+    def reset(self) -> None:
+        """ Only safe from the recording thread """
+        self.counts = [0] * BUCKETS_NUMBER
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
@@ -0,0 +1,86 @@
+import json
+import os
+import time
+from threading import Lock
+
+from logic.metrics.latency_histogram import LatencyHistogram
+
+# Span names of the mocap stages, the pipeline stages use theirs as well
+# From the capture timestamp of a frame pair to its hand-off to the processing, the wait for the pair is not part of it
+SPAN_CAPTURE = 'capture'
+SPAN_UNDISTORT = 'undistort'
+SPAN_COLOUR_CONVERSION = 'colour_conversion'
+SPAN_INFERENCE = 'detection'
+SPAN_FILTER_2D = 'filter_2d'
+SPAN_TRIANGULATION = 'triangulation'
+SPAN_FILTER_3D = 'filter_3d'
+SPAN_ENCODE = 'encode'
+SPAN_SEND = 'send'
+# From the capture timestamp of a frame to the moment its packet is handed to the output
+SPAN_END_TO_END = 'end_to_end'
+
+
+class LatencyMetrics(object):
+    """
+    Named latency histograms fed by perf_counter_ns spans:
+
+        start = latency_metrics.start()
+        ...
+        latency_metrics.stop(SPAN_TRIANGULATION, start)
+
+    Disabled, start returns 0 and stop returns right away, so the spans can stay in the hot paths.
+    Each span name must be recorded by a single thread, see LatencyHistogram.
+    """
+
+    def __init__(self, enabled = True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.lock = Lock()
+
+    def is_enabled(self) -> bool:
+        return self.enabled
+
+    def get_histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    # Copy on write, readers iterate over the dictionary without the lock
+                    histograms = dict(self.histograms)
+                    histogram = histograms[name] = LatencyHistogram(name)
+                    self.histograms = histograms
+        return histogram
+
+    def get_histograms(self) -> dict[str, LatencyHistogram]:
+        return self.histograms
+
+    def start(self) -> int:
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def stop(self, name: str, start: int) -> None:
+        if start:
+            self.get_histogram(name).record(time.perf_counter_ns() - start)
+
+    def record(self, name: str, duration: int) -> None:
+        if self.enabled:
+            self.get_histogram(name).record(duration)
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+    def get_report(self) -> str:
+        lines = []
+        for name, summary in self.snapshot().items():
+            if summary['count'] == 0:
+                continue
+            lines.append(f"{name}: n={summary['count']} p50 {summary['p50_ms']:.2f}ms p95 {summary['p95_ms']:.2f}ms "
+                         f"p99 {summary['p99_ms']:.2f}ms max {summary['max_ms']:.2f}ms")
+        return '\n'.join(lines)
+
+    def dump(self, path: str) -> None:
+        """ Writes the snapshot as JSON, atomically so that a reader never sees half a file """
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump({'timestamp': time.perf_counter_ns(), 'spans': self.snapshot()}, file, indent=2)
+        os.replace(temporary_path, path)
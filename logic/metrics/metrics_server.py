@@ -0,0 +1,66 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Optional
+
+from logic.metrics.latency_metrics import LatencyMetrics
+
+METRICS_PATH = '/metrics'
+
+
+class MetricsServer(object):
+    """ Serves the latency snapshot as JSON on http://<host>:<port>/metrics, local only by default """
+
+    def __init__(self, latency_metrics: LatencyMetrics, port = 9464, host = '127.0.0.1'):
+        self.latency_metrics = latency_metrics
+        self.port = port
+        self.host = host
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread = None
+
+    def start(self) -> None:
+        if self.server is not None:
+            return
+        self.server = ThreadingHTTPServer((self.host, self.port), self.create_handler())
+        self.server.daemon_threads = True
+        self.thread = Thread(target=self.server.serve_forever, name='metrics-server', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.server = None
+        self.thread = None
+
+    def is_running(self) -> bool:
+        return self.server is not None
+
+    def get_address(self) -> tuple[str, int]:
+        """ The real port once started, useful when created with port 0 """
+        if self.server is not None:
+            return self.server.server_address[:2]
+        return self.host, self.port
+
+    def create_handler(self) -> type:
+        latency_metrics = self.latency_metrics
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != METRICS_PATH:
+                    self.send_error(404)
+                    return
+                body = json.dumps(latency_metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Polled every few seconds, the console doesn't need a line per request
+                pass
+
+        return MetricsRequestHandler
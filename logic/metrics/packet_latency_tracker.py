@@ -0,0 +1,102 @@
+import time
+from typing import Optional
+
+from logic.metrics.latency_histogram import LatencyHistogram
+
+SEQUENCE_MODULO = 1 << 32
+# Smoothing of the RFC 3550 interarrival jitter estimator
+JITTER_GAIN = 1.0 / 16.0
+
+
+class PacketLatencyTracker(object):
+    """
+    Receiver side statistics of the mocap packets: capture to receive latency, interarrival jitter and loss.
+    Capture timestamps are perf_counter_ns values of the sender, a monotonic clock shared by the processes of
+    one host: the latency only means something when the receiver runs on the same machine.
+    """
+
+    def __init__(self):
+        self.latencies = LatencyHistogram('capture_to_receive')
+        self.intervals = LatencyHistogram('interarrival')
+        self.first_sequence = None
+        self.highest_sequence = None
+        self.received_packets = 0
+        self.reordered_packets = 0
+        self.last_receive_time = None
+        self.last_transit = None
+        self.jitter = 0.0
+
+    def add(self, sequence: int, timestamp: int, receive_time: Optional[int] = None) -> None:
+        if receive_time is None:
+            receive_time = time.perf_counter_ns()
+        self.received_packets += 1
+        if timestamp > 0:
+            transit = receive_time - timestamp
+            self.latencies.record(transit)
+            if self.last_transit is not None:
+                self.jitter += (abs(transit - self.last_transit) - self.jitter) * JITTER_GAIN
+            self.last_transit = transit
+        if self.last_receive_time is not None:
+            self.intervals.record(receive_time - self.last_receive_time)
+        self.last_receive_time = receive_time
+        self.update_sequence(sequence)
+
+    def update_sequence(self, sequence: int) -> None:
+        """ Sequences are unsigned 32 bits, extended here so that the counts survive the wrap around """
+        if self.highest_sequence is None:
+            self.first_sequence = self.highest_sequence = sequence
+            return
+        delta = (sequence - self.highest_sequence) % SEQUENCE_MODULO
+        if delta >= SEQUENCE_MODULO // 2:
+            # Behind the highest one: a late packet, already counted as lost until now
+            self.reordered_packets += 1
+            return
+        self.highest_sequence += delta
+
+    def get_latencies(self) -> LatencyHistogram:
+        return self.latencies
+
+    def get_intervals(self) -> LatencyHistogram:
+        return self.intervals
+
+    def get_received_packets(self) -> int:
+        return self.received_packets
+
+    def get_reordered_packets(self) -> int:
+        return self.reordered_packets
+
+    def get_expected_packets(self) -> int:
+        if self.highest_sequence is None:
+            return 0
+        return self.highest_sequence - self.first_sequence + 1
+
+    def get_lost_packets(self) -> int:
+        # Duplicates could make it negative
+        return max(self.get_expected_packets() - self.received_packets, 0)
+
+    def get_loss_ratio(self) -> float:
+        expected_packets = self.get_expected_packets()
+        return self.get_lost_packets() / expected_packets if expected_packets > 0 else 0.0
+
+    def get_jitter_ms(self) -> float:
+        return self.jitter / 1e6
+
+    def snapshot(self) -> dict:
+        return {
+            'latency': self.latencies.snapshot(),
+            'interarrival': self.intervals.snapshot(),
+            'jitter_ms': self.get_jitter_ms(),
+            'received_packets': self.received_packets,
+            'lost_packets': self.get_lost_packets(),
+            'loss_ratio': self.get_loss_ratio(),
+            'reordered_packets': self.reordered_packets,
+        }
+
+    def get_report(self) -> str:
+        latency = self.latencies.snapshot()
+        interarrival = self.intervals.snapshot()
+        if latency['count'] == 0:
+            return f"received {self.received_packets} packets, no capture timestamps"
+        return (f"latency p50 {latency['p50_ms']:.2f}ms p95 {latency['p95_ms']:.2f}ms p99 {latency['p99_ms']:.2f}ms max {latency['max_ms']:.2f}ms | "
+                f"interarrival p50 {interarrival['p50_ms'] or 0.0:.2f}ms p99 {interarrival['p99_ms'] or 0.0:.2f}ms jitter {self.get_jitter_ms():.2f}ms | "
+                f"received {self.received_packets} lost {self.get_lost_packets()} ({self.get_loss_ratio() * 100.0:.2f}%) reordered {self.reordered_packets}")
@@ -0,0 +1,81 @@
+from typing import Optional
+
+import numpy as np
+
+
+class MocapBatchKalmanFilter:
+    """
+    A batch of independent constant velocity Kalman filters (position and velocity per axis) updated
+    together with array operations. It follows cv2.KalmanFilter step by step: correct() then predict(),
+    the pseudo-inverse standing in for its DECOMP_SVD solve.
+    """
+
+    def __init__(self, dimensions: int, standard_deviations: np.ndarray, process_corrector_factor: float):
+        filters_number = len(standard_deviations)
+        states_number = 2 * dimensions
+        self.dimensions = dimensions
+        self.filters_number = filters_number
+        self.standard_deviations = np.asarray(standard_deviations, dtype=np.float32)[:, :dimensions]
+        # Transition matrix (F): p' = p + v, v' = v
+        self.transition_matrix = np.eye(states_number, dtype=np.float32)
+        self.transition_matrix[:dimensions, dimensions:] = np.eye(dimensions, dtype=np.float32)
+        # Observation matrix (H): only the positions are measured
+        self.measurement_matrix = np.zeros((dimensions, states_number), dtype=np.float32)
+        self.measurement_matrix[:, :dimensions] = np.eye(dimensions, dtype=np.float32)
+        self.measurement_noise_covs = self.create_diagonals(self.standard_deviations)
+        self.process_noise_cov = np.eye(states_number, dtype=np.float32) * process_corrector_factor
+        self.state_pre = np.zeros((filters_number, states_number), dtype=np.float32)
+        self.state_post = np.zeros((filters_number, states_number), dtype=np.float32)
+        self.error_cov_pre = np.zeros((filters_number, states_number, states_number), dtype=np.float32)
+        self.error_cov_post = np.tile(np.eye(states_number, dtype=np.float32), (filters_number, 1, 1))
+
+    @staticmethod
+    def create_diagonals(values: np.ndarray) -> np.ndarray:
+        filters_number, dimensions = values.shape
+        diagonals = np.zeros((filters_number, dimensions, dimensions), dtype=np.float32)
+        diagonals[:, np.arange(dimensions), np.arange(dimensions)] = values
+        return diagonals
+
+    def get_dimensions(self) -> int:
+        return self.dimensions
+
+    def get_filters_number(self) -> int:
+        return self.filters_number
+
+    def update_measure_factor(self, measure_factor: float) -> None:
+        self.measurement_noise_covs = self.create_diagonals(self.standard_deviations ** 2 * measure_factor)
+
+    def update_process_factor(self, process_factor: float) -> None:
+        self.process_noise_cov = np.eye(2 * self.dimensions, dtype=np.float32) * process_factor
+
+    def correct(self, measurements: np.ndarray, measurement_noise_scales: Optional[np.ndarray] = None) -> None:
+        """
+        measurements: (filters_number, dimensions) positions
+        measurement_noise_scales: optional (filters_number,) factors applied to R for this measurement only
+        """
+        dimensions = self.dimensions
+        error_cov_pre = self.error_cov_pre
+        measurement_noise_covs = self.measurement_noise_covs
+        if measurement_noise_scales is not None:
+            measurement_noise_covs = measurement_noise_covs * np.asarray(measurement_noise_scales, dtype=np.float32)[:, None, None]
+        # H selects the positions, so H.P and H.P.Ht are plain slices
+        measured_error_cov = error_cov_pre[:, :dimensions, :]
+        innovation_cov = measured_error_cov[:, :, :dimensions] + measurement_noise_covs
+        gain = np.matmul(np.linalg.pinv(innovation_cov), measured_error_cov).transpose(0, 2, 1)
+        innovation = measurements - self.state_pre[:, :dimensions]
+        self.state_post = self.state_pre + np.einsum('bij,bj->bi', gain, innovation)
+        self.error_cov_post = error_cov_pre - np.matmul(gain, measured_error_cov)
+
+    def predict(self) -> np.ndarray:
+        """ Returns the (filters_number, dimensions) predicted positions """
+        transition_matrix = self.transition_matrix
+        self.state_pre = self.state_post @ transition_matrix.T
+        self.error_cov_pre = transition_matrix @ self.error_cov_post @ transition_matrix.T + self.process_noise_cov
+        # Same as OpenCV, a predict not followed by a correct stays the current estimate
+        self.state_post = self.state_pre.copy()
+        self.error_cov_post = self.error_cov_pre.copy()
+        return self.state_pre[:, :self.dimensions]
+
+    def correct_and_predict(self, measurements: np.ndarray, measurement_noise_scales: Optional[np.ndarray] = None) -> np.ndarray:
+        self.correct(np.asarray(measurements, dtype=np.float32)[:, :self.dimensions], measurement_noise_scales)
+        return self.predict()
@@ -1,14 +1,17 @@
+from typing import Optional
+
 import cv2
 import numpy as np
 import mediapipe as mp
 
-from data.calibration_stereo_data import CalibrationStereoData
 from logic.camera import Camera
+from logic.metrics.latency_metrics import LatencyMetrics, SPAN_INFERENCE, SPAN_TRIANGULATION, SPAN_UNDISTORT
 from logic.mocap.mocap_internal_results import MocapInternalResults
+from logic.stereo_rig import StereoRig
 
 
 class MocapCore:
-    def __init__(self):
+    def __init__(self, latency_metrics: Optional[LatencyMetrics] = None):
         mp_hands = mp.solutions.hands
         self.left_hands = mp_hands.Hands(static_image_mode=False, max_num_hands=1, min_detection_confidence=0.5)
         self.right_hands = mp_hands.Hands(static_image_mode=False, max_num_hands=1, min_detection_confidence=0.5)
@@ -18,17 +21,25 @@ class MocapCore:
         self.point2_filtered = None
         self.mocap_internal_results = MocapInternalResults()
         self.hand_landmarks_number = 21
+        self.latency_metrics = latency_metrics if latency_metrics is not None else LatencyMetrics(enabled=False)
 
     def get_hand_landmarks_number(self) -> int:
         return self.hand_landmarks_number
 
-    def get_frames(self, left_camera: Camera, right_camera: Camera):
-        left_frame = left_camera.get_shared_frame()
-        right_frame = right_camera.get_shared_frame()
-        mtx1 = left_camera.get_intrinsics_matrix()
-        mtx2 = right_camera.get_intrinsics_matrix()
-        left_frame = cv2.undistort(left_frame, mtx1, left_camera.get_distortion_coefficients(), None, mtx1)
-        right_frame = cv2.undistort(right_frame, mtx2, right_camera.get_distortion_coefficients(), None, mtx2)
+    @staticmethod
+    def get_frame(camera: Camera, undistort_frame = True) -> Optional[np.ndarray]:
+        """ Private copy of the latest frame, read under a lease so that the capture can't overwrite it midway """
+        frame_lease = camera.acquire_shared_frame()
+        if frame_lease is None:
+            return None
+        with frame_lease:
+            if undistort_frame:
+                return camera.get_undistorter().undistort_frame(frame_lease.get_frame())
+            return frame_lease.get_frame().copy()
+
+    def get_frames(self, left_camera: Camera, right_camera: Camera, undistort_frames = True):
+        left_frame = self.get_frame(left_camera, undistort_frames)
+        right_frame = self.get_frame(right_camera, undistort_frames)
         # left_frame = cv2.bilateralFilter(left_frame, d=15, sigmaColor=50, sigmaSpace=75)
         # right_frame = cv2.bilateralFilter(right_frame, d=15, sigmaColor=50, sigmaSpace=75)
         return left_frame, right_frame
@@ -60,20 +71,15 @@ class MocapCore:
             converted_points.append([x, y])
         return np.array(converted_points, dtype=np.float32)
 
-    def triangulate_from_points_2d(self, rotation_matrix, translation_matrix, left_camera: Camera, right_camera: Camera, left_points, right_points):
-        # RT matrix for C1 is identity.
-        RT1 = np.concatenate([np.eye(3), np.array([[0], [0], [0]])], axis=-1)
-        P1 = left_camera.get_intrinsics_matrix() @ RT1  # projection matrix for C1
-        # RT matrix for C2 is the R and T obtained from stereo calibration.
-        RT2 = np.concatenate([rotation_matrix, translation_matrix], axis=-1)
-        P2 = right_camera.get_intrinsics_matrix() @ RT2  # projection matrix for C2
-        points_4d = cv2.triangulatePoints(P1, P2, left_points.T, right_points.T)
-        points_3d = points_4d[:3, :] / points_4d[3, :]  # Convertir en coordonnées 3D
-        return points_3d.T
-
-    def full_process(self, left_camera: Camera, right_camera: Camera, calibration_stereo_data: CalibrationStereoData, mode_interlace = True):
+    def triangulate_from_points_2d(self, stereo_rig: StereoRig, left_points, right_points):
+        return stereo_rig.triangulate(left_points, right_points)
+
+    def full_process(self, stereo_rig: StereoRig, mode_interlace = True, undistort_points_mode = True):
+        # In points mode only the detected landmarks are undistorted instead of the full frames
         points_3d = None
-        left_frame, right_frame = self.get_frames(left_camera, right_camera)
+        left_camera = stereo_rig.get_left_camera()
+        right_camera = stereo_rig.get_right_camera()
+        left_frame, right_frame = self.get_frames(left_camera, right_camera, not undistort_points_mode)
         results_left_frame, results_right_frame = self.detects_landmarks(left_frame, right_frame, mode_interlace)
         if results_left_frame is not None and results_right_frame is not None:
             if results_left_frame.multi_hand_landmarks is not None and results_right_frame.multi_hand_landmarks is not None:
@@ -81,27 +87,32 @@ class MocapCore:
                 left_points_3d = self.converts(results_left_frame.multi_hand_landmarks[0].landmark, width, height)
                 height, width = left_frame.shape[:2]
                 right_points_3d = self.converts(results_right_frame.multi_hand_landmarks[0].landmark, width, height)
-                points_3d = self.triangulate_from_points_2d(
-                    calibration_stereo_data.get_rotation_matrix(), calibration_stereo_data.get_translation_matrix(),
-                    left_camera, right_camera,
-                    left_points_3d, right_points_3d)
+                if undistort_points_mode:
+                    left_points_3d = left_camera.get_undistorter().undistort_points(left_points_3d)
+                    right_points_3d = right_camera.get_undistorter().undistort_points(right_points_3d)
+                points_3d = self.triangulate_from_points_2d(stereo_rig, left_points_3d, right_points_3d)
         if mode_interlace:
             self.mocap_internal_results.increment_counter()
         return points_3d
 
     # OLD; Dépréciée
-    def triangulate(self, R, T, left_camera: Camera, right_camera: Camera, v: int, mode_interlace = True):
-        frame1 = left_camera.get_shared_frame()
-        frame2 = right_camera.get_shared_frame()
+    def triangulate(self, stereo_rig: StereoRig, v: int, mode_interlace = True, frame1 = None, frame2 = None):
+        left_camera = stereo_rig.get_left_camera()
+        right_camera = stereo_rig.get_right_camera()
+        if frame1 is None or frame2 is None:
+            frame1 = self.get_frame(left_camera, False)
+            frame2 = self.get_frame(right_camera, False)
+            if frame1 is None or frame2 is None:
+                return None
 
         h1, w1 = frame1.shape[:2]
         h2, w2 = frame2.shape[:2]
 
-        mtx1 = left_camera.get_intrinsics_matrix()
-        mtx2 = right_camera.get_intrinsics_matrix()
-
-        frame1 = cv2.undistort(frame1, mtx1, left_camera.get_distortion_coefficients(), None, mtx1)
-        frame2 = cv2.undistort(frame2, mtx2, right_camera.get_distortion_coefficients(), None, mtx2)
+        latency_metrics = self.latency_metrics
+        undistort_start = latency_metrics.start()
+        frame1 = left_camera.get_undistorter().undistort_frame(frame1)
+        frame2 = right_camera.get_undistorter().undistort_frame(frame2)
+        latency_metrics.stop(SPAN_UNDISTORT, undistort_start)
         #frame1 = cv2.GaussianBlur(frame1, (5, 5), 0)
         #frame2 = cv2.GaussianBlur(frame2, (5, 5), 0)
 
@@ -112,6 +123,7 @@ class MocapCore:
         results1 = self.results1
         results2 = self.results2
 
+        inference_start = latency_metrics.start()
         if mode_interlace:
             if results1 is None or v % 2 == 0:
                 rgb_frame_1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2RGB)
@@ -130,6 +142,7 @@ class MocapCore:
             results2 = self.right_hands.process(rgb_frame_2)
             self.results1 = results1
             self.results2 = results2
+        latency_metrics.stop(SPAN_INFERENCE, inference_start)
 
         # A BOUGER DANS UNE FONCTION DE CONVERSION DE TYPE DE TABLEAU
         if results1 is not None and results2 is not None and results1.multi_hand_landmarks is not None and results2.multi_hand_landmarks is not None:
@@ -159,17 +172,9 @@ class MocapCore:
                 self.point2_filtered = points2 * alpha + (1 - alpha) * self.point2_filtered
             # -----------------------------
 
-            # A BOUGER DANS UNE FONCTION SPECIFIQUE AU CALCUL 3D
-            # RT matrix for C1 is identity.
-            RT1 = np.concatenate([np.eye(3),  np.array([[0], [0], [0]])], axis=-1)
-            P1 = mtx1 @ RT1  # projection matrix for C1
-
-            # RT matrix for C2 is the R and T obtained from stereo calibration.
-            RT2 = np.concatenate([R, T], axis=-1)
-            P2 = mtx2 @ RT2  # projection matrix for C2
-
-            points4D = cv2.triangulatePoints(P1, P2, points1.T, points2.T)
-            points3D = points4D[:3, :] / points4D[3, :]  # Convertir en coordonnées 3D
-            return points3D.T
+            triangulation_start = latency_metrics.start()
+            positions = self.triangulate_from_points_2d(stereo_rig, points1, points2)
+            latency_metrics.stop(SPAN_TRIANGULATION, triangulation_start)
+            return positions
         else:
             return None
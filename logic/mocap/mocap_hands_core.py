@@ -1,24 +1,31 @@
 import cv2
 import numpy as np
 
-from data.calibration_stereo_data import CalibrationStereoData
 from data.math.point_2d import Point2D
-from data.math.point_3d import Point3D
+from data.landmark_set import LandmarkSet
 from logic.mocap.mocap_hands_tracker_2d import MocapHandsTracker2D
 from logic.mocap.mocap_hands_tracker_3d import MocapHandsTracker3D
+from logic.mocap.mocap_parallel_detector import MocapParallelDetector
+from logic.stereo_rig import StereoRig
+from logic.undistorter import Undistorter
 
 
 class MocapHandsCore:
-    def __init__(self):
-        self.mocap_left_cam_hands_tracker_2d = MocapHandsTracker2D()
-        self.mocap_right_cam_hands_tracker_2d = MocapHandsTracker2D()
+    def __init__(self, parallel_detection = False, cameras_number = 2):
+        """ The first two cameras are the stereo pair that is triangulated, the others are only detected """
+        if cameras_number < 2:
+            raise ValueError(f"MocapHandsCore needs at least the two cameras of the stereo pair, got {cameras_number}")
+        self.mocap_cam_hands_trackers_2d = [MocapHandsTracker2D() for _ in range(cameras_number)]
+        self.mocap_left_cam_hands_tracker_2d = self.mocap_cam_hands_trackers_2d[0]
+        self.mocap_right_cam_hands_tracker_2d = self.mocap_cam_hands_trackers_2d[1]
         self.mocap_hands_tracker_3d = MocapHandsTracker3D()
+        self.mocap_parallel_detector = MocapParallelDetector(self.mocap_cam_hands_trackers_2d, parallel_detection)
 
-    def initialize_trackers_2d(self, left_positions_captures: list[Point3D], right_positions_captures: list[Point3D]):
+    def initialize_trackers_2d(self, left_positions_captures: list[LandmarkSet], right_positions_captures: list[LandmarkSet]):
         self.mocap_left_cam_hands_tracker_2d.initialize(left_positions_captures)
         self.mocap_right_cam_hands_tracker_2d.initialize(right_positions_captures)
 
-    def initialize_trackers_3d(self, positions_captures: list[Point3D]):
+    def initialize_trackers_3d(self, positions_captures: list[LandmarkSet]):
         self.mocap_hands_tracker_3d.initialize(positions_captures)
 
     def are_2d_trackers_initialized(self) -> bool:
@@ -28,41 +35,49 @@ class MocapHandsCore:
         return self.mocap_hands_tracker_3d.is_initialized()
 
     def detects_raw_points_3d_stereo(self, left_frame, right_frame):
-        left_cam_landmarks = self.mocap_left_cam_hands_tracker_2d.detects_raw_points_3d(left_frame)
-        right_cam_landmarks = self.mocap_right_cam_hands_tracker_2d.detects_raw_points_3d(right_frame)
+        left_cam_landmarks, right_cam_landmarks = self.detects_raw_points_3d_multi([left_frame, right_frame])
         return left_cam_landmarks, right_cam_landmarks
 
-    def draw_2d_debug(self, frame, points_3d: list[Point3D], frame_size: Point2D) -> None:
-        for point_3d in points_3d:
-            size = (int(point_3d.get_x() * frame_size.get_x()), int(point_3d.get_y() * frame_size.get_y()))
-            cv2.circle(frame, size, 5, (0, 255, 0), -1)
+    def detects_raw_points_3d_multi(self, frames: list, rgb = False) -> list:
+        """ One frame per camera, in the same order as the 2D trackers """
+        return self.mocap_parallel_detector.detects_raw_points_3d(frames, rgb)
 
-    def apply_filtration_trackers_2d(self, left_cam_points_3d: list[Point3D], right_cam_points_3d: list[Point3D]):
+    def get_detection_durations_ms(self) -> list[float]:
+        return self.mocap_parallel_detector.get_last_durations_ms()
+
+    def release(self) -> None:
+        self.mocap_parallel_detector.shutdown()
+
+    def draw_2d_debug(self, frame, points_3d: LandmarkSet, frame_size: Point2D) -> None:
+        pixels = (points_3d.get_points_2d() * (frame_size.get_x(), frame_size.get_y())).astype(np.int32)
+        for x, y in pixels.tolist():
+            cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
+
+    def apply_filtration_trackers_2d(self, left_cam_points_3d: LandmarkSet, right_cam_points_3d: LandmarkSet):
         left_cam_filtered_points_3d = self.mocap_left_cam_hands_tracker_2d.apply_filtration(left_cam_points_3d)
         right_cam_filtered_points_3d = self.mocap_right_cam_hands_tracker_2d.apply_filtration(right_cam_points_3d)
         return left_cam_filtered_points_3d, right_cam_filtered_points_3d
 
-    def apply_filtration_tracker_3d(self, raw_positions_3d: list[Point3D]):
+    def apply_filtration_tracker_3d(self, raw_positions_3d: LandmarkSet):
         return self.mocap_hands_tracker_3d.apply_filtration(raw_positions_3d)
 
-    def convert_for_triangulation(self, left_cam_points_3d: list[Point3D], right_cam_points_3d: list[Point3D], frame_size: Point2D):
-        left_cam_points_3d = np.array([(point_3d.x * frame_size.x, point_3d.y * frame_size.y) for point_3d in left_cam_points_3d])
-        right_cam_points_3d = np.array([(point_3d.x * frame_size.x, point_3d.y * frame_size.y) for point_3d in right_cam_points_3d])
-        return left_cam_points_3d, right_cam_points_3d
-
-    def triangulate_raw_points(self,
-                       left_landmarks,
-                       right_landmarks,
-                       left_intrinsics_matrix,
-                       right_intrinsics_matrix,
-                       calibration_stereo_data: CalibrationStereoData,
-                    ):
-        positions = self.mocap_hands_tracker_3d.triangulate_raw_points(left_landmarks,
-                                                                  right_landmarks,
-                                                                  left_intrinsics_matrix,
-                                                                  right_intrinsics_matrix,
-                                                                  calibration_stereo_data)
-        return [Point3D(position[0], position[1], position[2]) for position in positions]
+    def convert_for_triangulation(self, left_cam_points_3d: LandmarkSet, right_cam_points_3d: LandmarkSet, frame_size: Point2D):
+        """ Normalized image coordinates to pixels, z stays 0 """
+        scale = np.array([frame_size.get_x(), frame_size.get_y(), 0], dtype=np.float32)
+        return left_cam_points_3d.with_positions(left_cam_points_3d.get_positions() * scale), right_cam_points_3d.with_positions(right_cam_points_3d.get_positions() * scale)
+
+    def undistort_points_for_triangulation(self, left_cam_points_2d: LandmarkSet, right_cam_points_2d: LandmarkSet, left_undistorter: Undistorter, right_undistorter: Undistorter):
+        # Only the landmarks are undistorted, the frames themselves are left untouched
+        return (
+            left_cam_points_2d.with_points_2d(left_undistorter.undistort_points(left_cam_points_2d.get_points_2d())),
+            right_cam_points_2d.with_points_2d(right_undistorter.undistort_points(right_cam_points_2d.get_points_2d())),
+        )
+
+    def triangulate_raw_points(self, left_landmarks: LandmarkSet, right_landmarks: LandmarkSet, stereo_rig: StereoRig) -> LandmarkSet:
+        positions, reprojection_errors = self.mocap_hands_tracker_3d.triangulate_raw_points(left_landmarks.get_points_2d(), right_landmarks.get_points_2d(), stereo_rig)
+        # A triangulated landmark is only as trustworthy as its weakest view
+        confidences = np.minimum(left_landmarks.get_confidences(), right_landmarks.get_confidences())
+        return LandmarkSet(positions, confidences, left_landmarks.get_timestamp(), reprojection_errors.astype(np.float32), left_landmarks.get_handedness())
 
     def get_left_camera_hand_tracker_2d(self) -> MocapHandsTracker2D:
         return self.mocap_left_cam_hands_tracker_2d
@@ -70,5 +85,8 @@ class MocapHandsCore:
     def get_right_camera_hand_tracker_2d(self) -> MocapHandsTracker2D:
         return self.mocap_right_cam_hands_tracker_2d
 
+    def get_cameras_hand_trackers_2d(self) -> list[MocapHandsTracker2D]:
+        return self.mocap_cam_hands_trackers_2d
+
     def get_hands_tracker_3d(self) -> MocapHandsTracker3D:
         return self.mocap_hands_tracker_3d
\ No newline at end of file
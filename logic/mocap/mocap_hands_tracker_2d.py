@@ -4,15 +4,18 @@ import cv2
 import mediapipe as mp
 import numpy as np
 
-from data.math.point_3d import Point3D
+from data.landmark_set import LandmarkSet, HANDEDNESS_LEFT, HANDEDNESS_RIGHT, HANDEDNESS_UNKNOWN
 from logic.mocap.mocap_multi_kalman_filters import MocapMultiFilters
 
+FILTER_MEASURE_CORRECTOR_FACTOR = 1000
+FILTER_PROCESS_CORRECTOR_FACTOR = 0.00001
+
 
 class MocapHandsTracker2D:
     def __init__(self):
         mp_hands = mp.solutions.hands
         self.hands = mp_hands.Hands(static_image_mode=False, max_num_hands=1, min_detection_confidence=0.5)
-        self.multi_filters = MocapMultiFilters(1000, 0.00001)
+        self.multi_filters = MocapMultiFilters(FILTER_MEASURE_CORRECTOR_FACTOR, FILTER_PROCESS_CORRECTOR_FACTOR, dimensions=2)
         self.landmarks_number = 21
 
     def initialize(self, positions_capture: list) -> None:
@@ -24,18 +27,37 @@ class MocapHandsTracker2D:
     def get_landmarks_number(self) -> int:
         return self.landmarks_number
 
-    def detects_raw_points_3d(self, frame) -> Optional[list[Point3D]]:
-        points_3d = None
+    def detects_raw_points_3d(self, frame) -> Optional[LandmarkSet]:
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self.detects_raw_points_3d_from_rgb(rgb_frame)
+
+    def detects_raw_points_3d_from_rgb(self, rgb_frame) -> Optional[LandmarkSet]:
+        points_3d = None
         detections = self.hands.process(rgb_frame)
         if detections is not None and detections.multi_hand_landmarks is not None:
             raw_landmarks = detections.multi_hand_landmarks[0].landmark
-            points_3d = [Point3D(raw_landmark.x, raw_landmark.y, 0) for raw_landmark in raw_landmarks]
+            positions = np.zeros((len(raw_landmarks), 3), dtype=np.float32)
+            for index, raw_landmark in enumerate(raw_landmarks):
+                positions[index, 0] = raw_landmark.x
+                positions[index, 1] = raw_landmark.y
+            # MediaPipe gives no per landmark score for hands, the hand score is shared by all of them
+            score, handedness = self.get_hand_classification(detections)
+            confidences = np.full(len(raw_landmarks), score, dtype=np.float32)
+            points_3d = LandmarkSet(positions, confidences, handedness=handedness)
         return points_3d
 
-    def apply_filtration(self, points_3d: list[Point3D]) -> list[Point3D]:
+    @staticmethod
+    def get_hand_classification(detections) -> tuple[float, int]:
+        """ Score and handedness of the first hand, MediaPipe labels them as seen in a mirrored image """
+        if not detections.multi_handedness:
+            return 1.0, HANDEDNESS_UNKNOWN
+        classification = detections.multi_handedness[0].classification[0]
+        handedness = {'Left': HANDEDNESS_LEFT, 'Right': HANDEDNESS_RIGHT}.get(classification.label, HANDEDNESS_UNKNOWN)
+        return classification.score, handedness
+
+    def apply_filtration(self, points_3d: LandmarkSet) -> LandmarkSet:
         filtrated_points = self.multi_filters.correct_and_predict(points_3d)
         return filtrated_points
 
-    def apply_prediction(self) -> list[Point3D]:
+    def apply_prediction(self) -> LandmarkSet:
         return self.multi_filters.predict()
\ No newline at end of file
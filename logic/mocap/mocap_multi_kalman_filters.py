@@ -1,50 +1,56 @@
-from data.filter_data import FilterData
-from data.math.point_3d import Point3D
-from logic.mocap.mocap_kalman_filter import MocapKalmanFilter
+import numpy as np
+
+from data.landmark_set import LandmarkSet
+from logic.mocap.mocap_batch_kalman_filter import MocapBatchKalmanFilter
+
+# Reprojection error (pixels) at which a landmark's measurement noise is doubled
+REPROJECTION_ERROR_REFERENCE = 5.0
 
 
 class MocapMultiFilters(object):
-    def __init__(self, measure_corrector_factor: float, process_corrector_factor: float):
-        self.filters = []
+    def __init__(self, measure_corrector_factor: float, process_corrector_factor: float, dimensions = 3, hands_number = 1):
+        # 2 dimensions for the trackers working in image space, their z axis is always 0
+        self.batch_filter = None
         self.measure_corrector_factor = measure_corrector_factor
         self.process_corrector_factor = process_corrector_factor
+        self.dimensions = dimensions
+        self.hands_number = hands_number
 
     def are_filters_ready(self) -> bool:
-        return len(self.filters) > 0
-
-    def initialize_filters(self, positions_captures: list, landmarks_number: int):
-        filter_data_list = []
-        history_size = len(positions_captures)
-        # Create filters data
-        for index in range(0, landmarks_number):
-            filter_data_list.append(FilterData(history_size))
-        # Add points from captures to filters
-        for positions_capture in positions_captures:
-            for index in range(0, landmarks_number):
-                filter_data_list[index].add_point_to_history(positions_capture[index])
-        # Create filters
-        for filter_data in filter_data_list:
-            filter_data.compute_measure_noise()
-            self.filters.append(MocapKalmanFilter(filter_data, self.measure_corrector_factor, self.process_corrector_factor))
+        return self.batch_filter is not None
+
+    def initialize_filters(self, positions_captures: list[LandmarkSet], landmarks_number: int):
+        filters_number = landmarks_number * self.hands_number
+        if len(positions_captures) == 0:
+            raise RuntimeError("Not enough roll history to compute measure noise")
+        # (captures, landmarks, 3), the measure noise of every landmark is its spread over the captures
+        history = np.stack([positions_capture.get_positions()[:filters_number] for positions_capture in positions_captures])
+        standard_deviations = np.std(history, axis=0)
+        # Create filters, one batch for every landmark of every hand
+        self.batch_filter = MocapBatchKalmanFilter(self.dimensions, standard_deviations, self.process_corrector_factor)
 
     def update_measure_factor(self, measure_factor: float):
-        for current_filter in self.filters:
-            current_filter.update_measure_factor(measure_factor)
+        self.batch_filter.update_measure_factor(measure_factor)
 
     def update_process_factor(self, process_factor: float):
-        for current_filter in self.filters:
-            current_filter.update_process_factor(process_factor)
-
-    def correct_and_predict(self, points_3d: list[Point3D]) -> list[Point3D]:
-        corrected_positions = []
-        for index in range(0, len(points_3d)):
-            x,y,z = self.filters[index].correct_and_predict(points_3d[index])
-            corrected_positions.append(Point3D(x[0],y[0],z[0]))
-        return corrected_positions
-
-    def predict(self) -> list[Point3D]:
-        predicted_positions = []
-        for index in range(0, len(self.filters)):
-            x,y,z = self.filters[index].predict()
-            predicted_positions.append(Point3D(x,y,z))
-        return predicted_positions
\ No newline at end of file
+        self.batch_filter.update_process_factor(process_factor)
+
+    def correct_and_predict(self, points_3d: LandmarkSet) -> LandmarkSet:
+        measurement_noise_scales = None
+        reprojection_errors = points_3d.get_reprojection_errors()
+        if reprojection_errors is not None:
+            # Badly triangulated landmarks are trusted less, the prediction takes over
+            measurement_noise_scales = 1.0 + (reprojection_errors / REPROJECTION_ERROR_REFERENCE) ** 2
+        positions = self.to_positions(self.batch_filter.correct_and_predict(points_3d.get_positions(), measurement_noise_scales))
+        return points_3d.with_positions(positions)
+
+    def predict(self) -> LandmarkSet:
+        return LandmarkSet(self.to_positions(self.batch_filter.predict()))
+
+    def to_positions(self, predictions: np.ndarray) -> np.ndarray:
+        if self.dimensions == 3:
+            return predictions
+        # The z axis of the trackers working in image space stays 0
+        positions = np.zeros((len(predictions), 3), dtype=np.float32)
+        positions[:, :self.dimensions] = predictions
+        return positions
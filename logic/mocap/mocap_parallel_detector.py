@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from data.landmark_set import LandmarkSet
+from logic.mocap.mocap_hands_tracker_2d import MocapHandsTracker2D
+
+
+class MocapParallelDetector(object):
+    """
+    Runs the 2D detection of every camera at the same time on a persistent pool, one worker per camera.
+    MediaPipe releases the GIL while its graph runs, so threads are enough to overlap the inferences.
+    """
+
+    def __init__(self, trackers_2d: list[MocapHandsTracker2D], parallel = True):
+        self.trackers_2d = trackers_2d
+        self.executor = None
+        if parallel and len(trackers_2d) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=len(trackers_2d), thread_name_prefix='mocap-detection')
+        self.last_durations = [0.0] * len(trackers_2d)
+
+    def is_parallel(self) -> bool:
+        return self.executor is not None
+
+    def detects_raw_points_3d(self, frames: list[np.ndarray], rgb = False) -> list[Optional[LandmarkSet]]:
+        """ Frames are BGR unless rgb is set, in which case the colour conversion is skipped """
+        if len(frames) != len(self.trackers_2d):
+            raise ValueError(f"Expected {len(self.trackers_2d)} frames, got {len(frames)}")
+        if self.executor is None:
+            return [self.detects_one(index, frame, rgb) for index, frame in enumerate(frames)]
+        futures = [self.executor.submit(self.detects_one, index, frame, rgb) for index, frame in enumerate(frames)]
+        return [future.result() for future in futures]
+
+    def detects_one(self, index: int, frame: np.ndarray, rgb: bool) -> Optional[LandmarkSet]:
+        start_time = time.perf_counter()
+        tracker_2d = self.trackers_2d[index]
+        points_3d = tracker_2d.detects_raw_points_3d_from_rgb(frame) if rgb else tracker_2d.detects_raw_points_3d(frame)
+        self.last_durations[index] = time.perf_counter() - start_time
+        return points_3d
+
+    def get_last_durations_ms(self) -> list[float]:
+        return [duration * 1000.0 for duration in self.last_durations]
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
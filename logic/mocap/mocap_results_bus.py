@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from data.mocap_result import MocapResult
+
+
+class MocapResultsBus(object):
+    """
+    The pipeline publishes its per-frame landmarks here so that the previews can draw them
+    without running MediaPipe or touching the Kalman filters a second time.
+    """
+
+    def __init__(self, history_size = 8):
+        self.history_size = history_size
+        self.results = OrderedDict()
+        self.latest_result = None
+        self.lock = Lock()
+
+    def publish(self, mocap_result: MocapResult) -> None:
+        with self.lock:
+            self.results[mocap_result.get_frame_id()] = mocap_result
+            self.results.move_to_end(mocap_result.get_frame_id())
+            while len(self.results) > self.history_size:
+                self.results.popitem(last=False)
+            # Later stages publish richer results of older frames, the latest frame still wins
+            if self.latest_result is None or mocap_result.get_frame_id() >= self.latest_result.get_frame_id():
+                self.latest_result = mocap_result
+
+    def get_latest(self) -> Optional[MocapResult]:
+        return self.latest_result
+
+    def get(self, frame_id: int) -> Optional[MocapResult]:
+        with self.lock:
+            return self.results.get(frame_id)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.results.clear()
+            self.latest_result = None
@@ -0,0 +1,69 @@
+import numpy as np
+
+from logic.stereo_rig import StereoRig
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class MocapTriangulator(object):
+    """
+    Linear (DLT) stereo triangulation solved for any number of points at once: one landmark set,
+    several hands or a whole recording. Every point also gets its reprojection error in pixels,
+    the mean distance between its projections and the observed points.
+    """
+
+    def __init__(self, chunk_size = DEFAULT_CHUNK_SIZE):
+        # Bounds the (chunk, 4, 4) systems kept in memory when a whole recording is solved
+        self.chunk_size = chunk_size
+
+    def get_chunk_size(self) -> int:
+        return self.chunk_size
+
+    def triangulate(self, stereo_rig: StereoRig, left_points_2d: np.ndarray, right_points_2d: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Undistorted pixel coordinates of shape (..., 2), e.g. (landmarks, 2) or (frames, hands, landmarks, 2).
+        Returns the (..., 3) positions and the (...) reprojection errors.
+        """
+        left_points_2d = np.asarray(left_points_2d, dtype=np.float64)
+        right_points_2d = np.asarray(right_points_2d, dtype=np.float64)
+        if left_points_2d.shape != right_points_2d.shape or left_points_2d.shape[-1] != 2:
+            raise ValueError(f"Expected two (..., 2) arrays of the same shape, got {left_points_2d.shape} and {right_points_2d.shape}")
+        shape = left_points_2d.shape[:-1]
+        left_points_2d = left_points_2d.reshape(-1, 2)
+        right_points_2d = right_points_2d.reshape(-1, 2)
+        left_projection_matrix, right_projection_matrix = stereo_rig.get_projection_matrices()
+        points_number = len(left_points_2d)
+        positions = np.empty((points_number, 3), dtype=np.float64)
+        reprojection_errors = np.empty(points_number, dtype=np.float64)
+        for start in range(0, points_number, self.chunk_size):
+            end = min(start + self.chunk_size, points_number)
+            positions[start:end], reprojection_errors[start:end] = self.solve(
+                left_projection_matrix,
+                right_projection_matrix,
+                left_points_2d[start:end],
+                right_points_2d[start:end],
+            )
+        return positions.reshape(shape + (3,)), reprojection_errors.reshape(shape)
+
+    def solve(self, left_projection_matrix: np.ndarray, right_projection_matrix: np.ndarray, left_points_2d: np.ndarray, right_points_2d: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Each view gives two rows, x.P3 - P1 and y.P3 - P2, of the homogeneous system A.X = 0
+        systems = np.empty((len(left_points_2d), 4, 4), dtype=np.float64)
+        systems[:, 0:2] = left_points_2d[:, :, None] * left_projection_matrix[2] - left_projection_matrix[:2]
+        systems[:, 2:4] = right_points_2d[:, :, None] * right_projection_matrix[2] - right_projection_matrix[:2]
+        # Normalized rows keep the far camera from dominating the least squares solution
+        systems /= np.linalg.norm(systems, axis=2, keepdims=True)
+        # X is the right singular vector of the smallest singular value
+        _, _, vt = np.linalg.svd(systems)
+        homogeneous_points = vt[:, -1]
+        positions = homogeneous_points[:, :3] / homogeneous_points[:, 3:]
+        reprojection_errors = 0.5 * (
+            self.compute_reprojection_distances(left_projection_matrix, homogeneous_points, left_points_2d)
+            + self.compute_reprojection_distances(right_projection_matrix, homogeneous_points, right_points_2d)
+        )
+        return positions, reprojection_errors
+
+    @staticmethod
+    def compute_reprojection_distances(projection_matrix: np.ndarray, homogeneous_points: np.ndarray, points_2d: np.ndarray) -> np.ndarray:
+        projections = homogeneous_points @ projection_matrix.T
+        projections = projections[:, :2] / projections[:, 2:]
+        return np.linalg.norm(projections - points_2d, axis=1)
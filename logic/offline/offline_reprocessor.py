@@ -0,0 +1,193 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from data.landmark_set import LandmarkSet, HANDEDNESS_UNKNOWN
+from data.pipeline_frame import PipelineFrame
+from logic.mocap import mocap_hands_tracker_2d, mocap_hands_tracker_3d
+from logic.mocap.mocap_hands_tracker_2d import MocapHandsTracker2D
+from logic.mocap.mocap_multi_kalman_filters import MocapMultiFilters
+from logic.mocap.mocap_triangulator import MocapTriangulator
+from logic.recording.session_recorder import SessionRecorder
+from logic.source.video_frame_source import VideoFrameSource
+from logic.stereo_rig import StereoRig
+
+LANDMARKS_NUMBER = 21
+
+
+def detect_chunk(left_video_path: str, right_video_path: str, warm_up_start: int, start: int, end: int) -> dict:
+    """
+    Worker entry point: detects the hands of frames [start, end) of both videos. MediaPipe tracks
+    hands from one frame to the next, so detection starts at warm_up_start and those results are dropped.
+    """
+    frames_number = end - start
+    chunk = {
+        'left_positions': np.full((frames_number, LANDMARKS_NUMBER, 3), np.nan, dtype=np.float32),
+        'right_positions': np.full((frames_number, LANDMARKS_NUMBER, 3), np.nan, dtype=np.float32),
+        'left_confidences': np.zeros((frames_number, LANDMARKS_NUMBER), dtype=np.float32),
+        'right_confidences': np.zeros((frames_number, LANDMARKS_NUMBER), dtype=np.float32),
+        'left_handedness': np.full(frames_number, HANDEDNESS_UNKNOWN, dtype=np.uint8),
+        'right_handedness': np.full(frames_number, HANDEDNESS_UNKNOWN, dtype=np.uint8),
+        'frame_size': None,
+    }
+    sources = [VideoFrameSource(left_video_path, real_time=False), VideoFrameSource(right_video_path, real_time=False)]
+    trackers_2d = [MocapHandsTracker2D(), MocapHandsTracker2D()]
+    try:
+        for frame_source in sources:
+            frame_source.open()
+            frame_source.set_position(warm_up_start)
+        for frame_index in range(warm_up_start, end):
+            frames = []
+            for frame_source in sources:
+                result, frame = frame_source.read()
+                if not result:
+                    return chunk
+                frames.append(frame)
+            height, width = frames[0].shape[:2]
+            chunk['frame_size'] = (width, height)
+            for side, tracker_2d, frame in zip(('left', 'right'), trackers_2d, frames):
+                points_3d = tracker_2d.detects_raw_points_3d(frame)
+                if frame_index < start or points_3d is None:
+                    continue
+                row = frame_index - start
+                chunk[side + '_positions'][row] = points_3d.get_positions()
+                chunk[side + '_confidences'][row] = points_3d.get_confidences()
+                chunk[side + '_handedness'][row] = points_3d.get_handedness()
+    finally:
+        for frame_source in sources:
+            frame_source.release()
+    return chunk
+
+
+class OfflineReprocessor(object):
+    """
+    Reprocesses a recorded left/right video pair as fast as the machine allows: the recording is split
+    in chunks whose 2D detection runs on a process pool, every chunk starting warm_up_frames earlier
+    to rebuild the tracking state. Triangulation and filtering then run over the whole recording at once
+    and the result is written as a session (see SessionReader).
+    Unlike the live sampling phase, the filters learn their noise from the first valid frames.
+    """
+
+    def __init__(self, stereo_rig: StereoRig, chunk_size = 300, warm_up_frames = 30, workers_number: Optional[int] = None, history_size = 10):
+        self.stereo_rig = stereo_rig
+        self.chunk_size = chunk_size
+        self.warm_up_frames = warm_up_frames
+        self.workers_number = workers_number if workers_number is not None else os.cpu_count()
+        self.history_size = history_size
+
+    @staticmethod
+    def get_videos_info(left_video_path: str, right_video_path: str) -> tuple[int, float]:
+        """ Frames number of the shortest video and fps of the left one """
+        frames_counts = []
+        fps_list = []
+        for video_path in (left_video_path, right_video_path):
+            frame_source = VideoFrameSource(video_path, real_time=False)
+            frame_source.open()
+            frames_counts.append(frame_source.get_frames_count())
+            fps_list.append(frame_source.get_fps())
+            frame_source.release()
+        return min(frames_counts), fps_list[0]
+
+    def create_chunks(self, frames_number: int) -> list[tuple[int, int, int]]:
+        """ (warm up start, start, end) of every chunk """
+        return [
+            (max(0, start - self.warm_up_frames), start, min(start + self.chunk_size, frames_number))
+            for start in range(0, frames_number, self.chunk_size)
+        ]
+
+    def detect(self, left_video_path: str, right_video_path: str, frames_number: int) -> dict:
+        chunks = self.create_chunks(frames_number)
+        with ProcessPoolExecutor(max_workers=self.workers_number) as executor:
+            futures = [executor.submit(detect_chunk, left_video_path, right_video_path, *chunk) for chunk in chunks]
+            results = [future.result() for future in futures]
+        detections = {name: np.concatenate([result[name] for result in results]) for name in results[0] if name != 'frame_size'}
+        detections['frame_size'] = next((result['frame_size'] for result in results if result['frame_size'] is not None), None)
+        return detections
+
+    def process(self, left_video_path: str, right_video_path: str, output_directory: str) -> int:
+        """ Returns the number of frames written """
+        frames_number, fps = self.get_videos_info(left_video_path, right_video_path)
+        # Timestamps of the recording timeline, in nanoseconds like the live capture ones
+        frame_duration = int(1e9 / fps) if fps > 0 else 0
+        if frames_number <= 0:
+            # Empty, unreadable or a container that doesn't report its frames count: nothing to split in chunks
+            return 0
+        detections = self.detect(left_video_path, right_video_path, frames_number)
+        if detections['frame_size'] is None:
+            return 0
+        left_positions = detections['left_positions']
+        right_positions = detections['right_positions']
+        valid = ~(np.isnan(left_positions).any(axis=(1, 2)) | np.isnan(right_positions).any(axis=(1, 2)))
+        left_landmark_sets = self.to_landmark_sets(detections, 'left', frame_duration)
+        right_landmark_sets = self.to_landmark_sets(detections, 'right', frame_duration)
+        valid_indices = np.flatnonzero(valid)
+        left_filtrated = self.filter_2d([left_landmark_sets[index] for index in valid_indices])
+        right_filtrated = self.filter_2d([right_landmark_sets[index] for index in valid_indices])
+        positions = self.triangulate(left_filtrated, right_filtrated, detections['frame_size'])
+        filtrated_positions = self.filter_3d(positions)
+        session_recorder = SessionRecorder(output_directory, LANDMARKS_NUMBER)
+        session_recorder.open()
+        try:
+            valid_rows = {index: row for row, index in enumerate(valid_indices)}
+            for frame_index in range(len(valid)):
+                pipeline_frame = PipelineFrame(frame_index, frame_index * frame_duration)
+                pipeline_frame.left_points_3d = left_landmark_sets[frame_index]
+                pipeline_frame.right_points_3d = right_landmark_sets[frame_index]
+                row = valid_rows.get(frame_index)
+                if row is not None:
+                    pipeline_frame.left_filtrated_points_3d = left_filtrated[row]
+                    pipeline_frame.right_filtrated_points_3d = right_filtrated[row]
+                    pipeline_frame.positions = positions[row]
+                    pipeline_frame.filtrated_positions = filtrated_positions[row]
+                session_recorder.record(pipeline_frame)
+        finally:
+            session_recorder.close()
+        return len(valid)
+
+    @staticmethod
+    def to_landmark_sets(detections: dict, side: str, frame_duration: int) -> list[Optional[LandmarkSet]]:
+        landmark_sets = []
+        for frame_index, positions in enumerate(detections[side + '_positions']):
+            if np.isnan(positions).any():
+                landmark_sets.append(None)
+                continue
+            landmark_sets.append(LandmarkSet(positions, detections[side + '_confidences'][frame_index], frame_index * frame_duration, handedness=int(detections[side + '_handedness'][frame_index])))
+        return landmark_sets
+
+    def filter_2d(self, landmark_sets: list[LandmarkSet]) -> list[LandmarkSet]:
+        multi_filters = MocapMultiFilters(mocap_hands_tracker_2d.FILTER_MEASURE_CORRECTOR_FACTOR, mocap_hands_tracker_2d.FILTER_PROCESS_CORRECTOR_FACTOR, dimensions=2)
+        return self.filter(multi_filters, landmark_sets)
+
+    def filter_3d(self, landmark_sets: list[LandmarkSet]) -> list[LandmarkSet]:
+        multi_filters = MocapMultiFilters(mocap_hands_tracker_3d.FILTER_MEASURE_CORRECTOR_FACTOR, mocap_hands_tracker_3d.FILTER_PROCESS_CORRECTOR_FACTOR)
+        return self.filter(multi_filters, landmark_sets)
+
+    def filter(self, multi_filters: MocapMultiFilters, landmark_sets: list[LandmarkSet]) -> list[LandmarkSet]:
+        if len(landmark_sets) < self.history_size:
+            return landmark_sets
+        multi_filters.initialize_filters(landmark_sets[:self.history_size], LANDMARKS_NUMBER)
+        return [multi_filters.correct_and_predict(landmark_set) for landmark_set in landmark_sets]
+
+    def triangulate(self, left_landmark_sets: list[LandmarkSet], right_landmark_sets: list[LandmarkSet], frame_size: tuple[int, int]) -> list[LandmarkSet]:
+        """ Every valid frame converted, undistorted and triangulated in a handful of array operations """
+        if len(left_landmark_sets) == 0:
+            return []
+        scale = np.array(frame_size, dtype=np.float32)
+        points_2d = []
+        for landmark_sets, camera in ((left_landmark_sets, self.stereo_rig.get_left_camera()), (right_landmark_sets, self.stereo_rig.get_right_camera())):
+            pixels = np.stack([landmark_set.get_points_2d() for landmark_set in landmark_sets]) * scale
+            undistorted = camera.get_undistorter().undistort_points(pixels.reshape(-1, 2))
+            points_2d.append(undistorted.reshape(len(landmark_sets), LANDMARKS_NUMBER, 2))
+        positions, reprojection_errors = MocapTriangulator().triangulate(self.stereo_rig, points_2d[0], points_2d[1])
+        return [
+            LandmarkSet(
+                positions[index],
+                np.minimum(left_landmark_set.get_confidences(), right_landmark_set.get_confidences()),
+                left_landmark_set.get_timestamp(),
+                reprojection_errors[index].astype(np.float32),
+                left_landmark_set.get_handedness(),
+            )
+            for index, (left_landmark_set, right_landmark_set) in enumerate(zip(left_landmark_sets, right_landmark_sets))
+        ]
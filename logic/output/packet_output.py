@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+
+class PacketOutput(ABC):
+    """ Common API of every sink the mocap packets can be sent to """
+
+    on_packet_dropped: Optional[Callable[[], None]] = None
+
+    def set_on_packet_dropped(self, on_packet_dropped: Optional[Callable[[], None]]) -> None:
+        """ Called, from any thread, whenever a packet accepted by send() won't reach a consumer """
+        self.on_packet_dropped = on_packet_dropped
+
+    @abstractmethod
+    def start(self) -> None:
+        pass
+
+    @abstractmethod
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.stop()
+
+    @abstractmethod
+    def is_running(self) -> bool:
+        pass
+
+    @abstractmethod
+    def send(self, data) -> None:
+        """ Must never wait for a consumer """
+
+    @abstractmethod
+    def get_sent_packets(self) -> int:
+        pass
+
+    @abstractmethod
+    def get_dropped_packets(self) -> int:
+        pass
@@ -0,0 +1,99 @@
+import mmap
+import os
+import struct
+
+from logic.output.packet_output import PacketOutput
+
+SHARED_MEMORY_MAGIC = b'MCSM'
+SHARED_MEMORY_LAYOUT_VERSION = 1
+SLOTS_NUMBER = 2
+# magic, layout version, slots number, slot capacity (bytes), latest slot index
+SHARED_HEADER = struct.Struct('<4sIIII')
+# sequence (odd while the slot is being written), packet size
+SLOT_HEADER = struct.Struct('<QI4x')
+LATEST_SLOT_INDEX_OFFSET = SHARED_HEADER.size - 4
+ALIGNMENT = 64
+DEFAULT_SLOT_CAPACITY = 1024
+
+
+def get_slot_offset(slot_index: int, slot_capacity: int) -> int:
+    slot_size = (SLOT_HEADER.size + slot_capacity + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    return ALIGNMENT + slot_index * slot_size
+
+
+def get_file_size(slot_capacity: int) -> int:
+    return get_slot_offset(SLOTS_NUMBER, slot_capacity)
+
+
+class SharedMemoryOutput(PacketOutput):
+    """
+    Publishes the latest packet into a memory-mapped file for a consumer on the same host, the game
+    engine reading it at its own rate without any syscall. Packets keep the schema of the encoder in use.
+    Two slots, each guarded by a seqlock: the writer fills the slot that isn't the latest, its sequence
+    odd meanwhile, then points the header to it. A reader copies the latest slot and retries if the
+    sequence was odd or changed during the copy.
+    """
+
+    def __init__(self, path: str, slot_capacity = DEFAULT_SLOT_CAPACITY):
+        self.path = path
+        self.slot_capacity = slot_capacity
+        self.file = None
+        self.memory = None
+        self.latest_slot_index = 0
+        self.slots_sequences = [0] * SLOTS_NUMBER
+        self.sent_packets = 0
+        self.dropped_packets = 0
+
+    def get_path(self) -> str:
+        return self.path
+
+    def start(self) -> None:
+        if self.memory is not None:
+            return
+        size = get_file_size(self.slot_capacity)
+        directory = os.path.dirname(self.path)
+        if directory != '':
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'w+b')
+        self.file.truncate(size)
+        self.memory = mmap.mmap(self.file.fileno(), size)
+        self.latest_slot_index = 0
+        self.slots_sequences = [0] * SLOTS_NUMBER
+        SHARED_HEADER.pack_into(self.memory, 0, SHARED_MEMORY_MAGIC, SHARED_MEMORY_LAYOUT_VERSION, SLOTS_NUMBER, self.slot_capacity, self.latest_slot_index)
+
+    def stop(self) -> None:
+        if self.memory is not None:
+            self.memory.close()
+            self.memory = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def is_running(self) -> bool:
+        return self.memory is not None
+
+    def send(self, data) -> None:
+        memory = self.memory
+        size = len(data)
+        if memory is None or size > self.slot_capacity:
+            self.dropped_packets += 1
+            return
+        slot_index = 1 - self.latest_slot_index
+        offset = get_slot_offset(slot_index, self.slot_capacity)
+        sequence = self.slots_sequences[slot_index] + 1
+        SLOT_HEADER.pack_into(memory, offset, sequence, size)
+        start = offset + SLOT_HEADER.size
+        memory[start:start + size] = data
+        sequence += 1
+        SLOT_HEADER.pack_into(memory, offset, sequence, size)
+        self.slots_sequences[slot_index] = sequence
+        # The slot is complete, it becomes the one the readers pick
+        struct.pack_into('<I', memory, LATEST_SLOT_INDEX_OFFSET, slot_index)
+        self.latest_slot_index = slot_index
+        self.sent_packets += 1
+
+    def get_sent_packets(self) -> int:
+        return self.sent_packets
+
+    def get_dropped_packets(self) -> int:
+        return self.dropped_packets
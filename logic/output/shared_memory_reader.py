@@ -0,0 +1,40 @@
+import mmap
+import struct
+from typing import Optional
+
+from logic.output.shared_memory_output import SHARED_HEADER, SHARED_MEMORY_MAGIC, SLOT_HEADER, LATEST_SLOT_INDEX_OFFSET, get_slot_offset
+
+READ_RETRIES = 100
+
+
+class SharedMemoryReader(object):
+    """ Reference reader of the SharedMemoryOutput layout, for tools and engine side ports """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.memory = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.layout_version, self.slots_number, self.slot_capacity, _ = SHARED_HEADER.unpack_from(self.memory, 0)
+        if magic != SHARED_MEMORY_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a mocap shared memory output")
+
+    def read_latest(self) -> Optional[bytes]:
+        """ Latest packet, None if nothing was published yet or the writer kept overtaking the reader """
+        memory = self.memory
+        for _ in range(READ_RETRIES):
+            slot_index = struct.unpack_from('<I', memory, LATEST_SLOT_INDEX_OFFSET)[0]
+            offset = get_slot_offset(slot_index, self.slot_capacity)
+            sequence, size = SLOT_HEADER.unpack_from(memory, offset)
+            if sequence == 0:
+                return None
+            if sequence % 2 == 1:
+                continue
+            start = offset + SLOT_HEADER.size
+            packet = memory[start:start + size]
+            if SLOT_HEADER.unpack_from(memory, offset)[0] == sequence:
+                return packet
+        return None
+
+    def close(self) -> None:
+        self.memory.close()
+        self.file.close()
@@ -0,0 +1,91 @@
+import socket
+from threading import Lock
+from typing import Callable, Optional
+
+from logic.output.packet_output import PacketOutput
+from logic.output.udp_subscriber import UdpSubscriber
+
+STOP_TIMEOUT = 1.0
+
+
+class UdpOutputService(PacketOutput):
+    """
+    Fans the mocap packets out to any number of UDP endpoints (game, recorder, monitoring...).
+    send() only queues, the socket is non-blocking and every subscriber is served by its own thread,
+    so a slow or unreachable consumer never delays the mocap loop nor the other subscribers.
+    """
+
+    def __init__(self, addresses: Optional[list[tuple[str, int]]] = None, queue_size = 4):
+        self.queue_size = queue_size
+        self.output_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.output_socket.setblocking(False)
+        self.lock = Lock()
+        self.subscribers = {}
+        self.running = False
+        for target_ip, port in addresses or []:
+            self.add_subscriber(target_ip, port)
+
+    def add_subscriber(self, target_ip: str, port: int) -> UdpSubscriber:
+        address = (target_ip, port)
+        with self.lock:
+            subscriber = self.subscribers.get(address)
+            if subscriber is None:
+                subscriber = UdpSubscriber(address, self.output_socket, self.queue_size, self.on_packet_dropped)
+                # Copy on write, send() iterates without taking the lock
+                subscribers = dict(self.subscribers)
+                subscribers[address] = subscriber
+                self.subscribers = subscribers
+                if self.running:
+                    subscriber.start()
+                    # It missed every packet so far, a delta encoder must start it with a keyframe
+                    subscriber.notify_packet_dropped()
+        return subscriber
+
+    def remove_subscriber(self, target_ip: str, port: int) -> None:
+        with self.lock:
+            subscribers = dict(self.subscribers)
+            subscriber = subscribers.pop((target_ip, port), None)
+            self.subscribers = subscribers
+        if subscriber is not None:
+            subscriber.stop(STOP_TIMEOUT)
+
+    def set_on_packet_dropped(self, on_packet_dropped: Optional[Callable[[], None]]) -> None:
+        with self.lock:
+            self.on_packet_dropped = on_packet_dropped
+            for subscriber in self.subscribers.values():
+                subscriber.set_on_packet_dropped(on_packet_dropped)
+
+    def get_subscribers(self) -> list[UdpSubscriber]:
+        return list(self.subscribers.values())
+
+    def start(self) -> None:
+        with self.lock:
+            self.running = True
+            for subscriber in self.subscribers.values():
+                subscriber.start()
+
+    def stop(self) -> None:
+        with self.lock:
+            self.running = False
+            subscribers = list(self.subscribers.values())
+        for subscriber in subscribers:
+            subscriber.stop(STOP_TIMEOUT)
+
+    def is_running(self) -> bool:
+        return self.running
+
+    def send(self, data) -> None:
+        # Encoders reuse their buffers, the queued packet must own its bytes
+        packet = bytes(data)
+        for subscriber in self.subscribers.values():
+            subscriber.push(packet)
+
+    def get_sent_packets(self) -> int:
+        return sum(subscriber.get_sent_packets() for subscriber in self.subscribers.values())
+
+    def get_dropped_packets(self) -> int:
+        return sum(subscriber.get_dropped_packets() for subscriber in self.subscribers.values())
+
+    def close(self) -> None:
+        self.stop()
+        self.output_socket.close()
@@ -0,0 +1,76 @@
+import socket
+from threading import Thread
+from typing import Callable, Optional
+
+from logic.pipeline.bounded_queue import BoundedQueue, DROP_POLICY_DROP_OLDEST
+
+SEND_POLL_TIMEOUT = 0.2
+
+
+class UdpSubscriber(object):
+    """ One endpoint of the UDP output, fed from its own drop-oldest queue by its own sender thread """
+
+    def __init__(self, address: tuple[str, int], output_socket: socket.socket, queue_size = 4, on_packet_dropped: Optional[Callable[[], None]] = None):
+        self.address = address
+        self.output_socket = output_socket
+        self.queue_size = queue_size
+        self.on_packet_dropped = on_packet_dropped
+        self.packets_queue = self.create_packets_queue()
+        self.thread = None
+        self.running = False
+        self.sent_packets = 0
+        self.unsent_packets = 0
+
+    def get_address(self) -> tuple[str, int]:
+        return self.address
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.packets_queue = self.create_packets_queue()
+        self.running = True
+        self.thread = Thread(target=self.run, name=f'udp-output-{self.address[0]}:{self.address[1]}', daemon=True)
+        self.thread.start()
+
+    def create_packets_queue(self) -> BoundedQueue:
+        return BoundedQueue(self.queue_size, DROP_POLICY_DROP_OLDEST, lambda packet: self.notify_packet_dropped())
+
+    def set_on_packet_dropped(self, on_packet_dropped: Optional[Callable[[], None]]) -> None:
+        self.on_packet_dropped = on_packet_dropped
+
+    def notify_packet_dropped(self) -> None:
+        on_packet_dropped = self.on_packet_dropped
+        if on_packet_dropped is not None:
+            on_packet_dropped()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.running = False
+        self.packets_queue.close()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self.running
+
+    def push(self, packet: bytes) -> None:
+        """ Never waits, when the subscriber lags behind its oldest packet is dropped """
+        self.packets_queue.put(packet)
+
+    def run(self) -> None:
+        while self.running:
+            packet = self.packets_queue.get(SEND_POLL_TIMEOUT)
+            if packet is None:
+                continue
+            try:
+                self.output_socket.sendto(packet, self.address)
+                self.sent_packets += 1
+            except OSError:
+                # Full socket buffer (the socket never blocks) or unreachable endpoint, the packet is lost
+                self.unsent_packets += 1
+                self.notify_packet_dropped()
+
+    def get_sent_packets(self) -> int:
+        return self.sent_packets
+
+    def get_dropped_packets(self) -> int:
+        return self.packets_queue.get_dropped_items() + self.unsent_packets
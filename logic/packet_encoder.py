@@ -0,0 +1,71 @@
+import struct
+from typing import Sequence
+
+import numpy as np
+
+from data.landmark_set import LandmarkSet
+
+PACKET_MAGIC = b'MCAP'
+PACKET_VERSION = 1
+# magic, version, hands count, landmarks per hand, sequence, capture timestamp (perf_counter_ns)
+PACKET_HEADER = struct.Struct('<4sBBHIq')
+# handedness and padding, followed by landmarks per hand * (x, y, z) float32
+HAND_HEADER = struct.Struct('<B3x')
+
+
+class PacketEncoder(object):
+    """
+    Encodes the hands of one frame into a versioned little endian datagram, written in place into
+    preallocated buffers: no bytes are concatenated and no object is built per landmark.
+    A packet stays valid until buffers_number more packets were encoded, so that it can wait in a queue.
+    """
+
+    def __init__(self, max_hands = 2, landmarks_number = 21, buffers_number = 1):
+        self.max_hands = max_hands
+        self.landmarks_number = landmarks_number
+        self.hand_size = HAND_HEADER.size + landmarks_number * 3 * 4
+        self.packet_max_size = PACKET_HEADER.size + max_hands * self.hand_size
+        self.buffers = [bytearray(self.packet_max_size) for _ in range(buffers_number)]
+        self.buffer_index = 0
+        self.sequence = 0
+        # Views over the landmarks area of every hand block, the positions are copied straight in them
+        self.positions_views = [
+            [
+                np.frombuffer(buffer, dtype='<f4', count=landmarks_number * 3, offset=self.get_hand_offset(hand_index) + HAND_HEADER.size).reshape(landmarks_number, 3)
+                for hand_index in range(max_hands)
+            ]
+            for buffer in self.buffers
+        ]
+
+    def get_hand_offset(self, hand_index: int) -> int:
+        return PACKET_HEADER.size + hand_index * self.hand_size
+
+    def get_packet_max_size(self) -> int:
+        return self.packet_max_size
+
+    def get_sequence(self) -> int:
+        return self.sequence
+
+    def request_keyframe(self) -> None:
+        """ Every packet of this format stands on its own, nothing to resend after a loss """
+        pass
+
+    def encode(self, hands: Sequence[LandmarkSet], timestamp = None) -> memoryview:
+        """ The timestamp defaults to the capture timestamp of the first hand """
+        hands_number = len(hands)
+        if hands_number > self.max_hands:
+            raise ValueError(f"Can't encode {hands_number} hands, the packet holds {self.max_hands}")
+        if timestamp is None:
+            timestamp = hands[0].get_timestamp() if hands_number > 0 else 0
+        buffer_index = self.buffer_index
+        buffer = self.buffers[buffer_index]
+        positions_views = self.positions_views[buffer_index]
+        self.buffer_index = (buffer_index + 1) % len(self.buffers)
+        PACKET_HEADER.pack_into(buffer, 0, PACKET_MAGIC, PACKET_VERSION, hands_number, self.landmarks_number, self.sequence, timestamp)
+        for hand_index, hand in enumerate(hands):
+            if len(hand) != self.landmarks_number:
+                raise ValueError(f"Expected {self.landmarks_number} landmarks, got {len(hand)}")
+            HAND_HEADER.pack_into(buffer, self.get_hand_offset(hand_index), hand.get_handedness())
+            np.copyto(positions_views[hand_index], hand.get_positions())
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        return memoryview(buffer)[:self.get_hand_offset(hands_number)]
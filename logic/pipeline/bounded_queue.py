@@ -0,0 +1,77 @@
+from collections import deque
+from threading import Condition
+from typing import Callable, Optional
+
+DROP_POLICY_BLOCK = 'block'
+DROP_POLICY_DROP_OLDEST = 'drop_oldest'
+DROP_POLICY_DROP_NEWEST = 'drop_newest'
+
+
+class BoundedQueue(object):
+    """
+    Queue between two pipeline stages. When full, the producer either waits (block), evicts the oldest
+    item (drop_oldest, keeps the latency bounded) or discards the item it is pushing (drop_newest).
+    on_drop is only called for evicted items: a rejected item is reported by put() returning False.
+    """
+
+    def __init__(self, max_size: int, drop_policy = DROP_POLICY_DROP_OLDEST, on_drop: Optional[Callable] = None):
+        if drop_policy not in (DROP_POLICY_BLOCK, DROP_POLICY_DROP_OLDEST, DROP_POLICY_DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy {drop_policy}")
+        self.max_size = max_size
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.items = deque()
+        self.condition = Condition()
+        self.dropped_items = 0
+        self.closed = False
+
+    def put(self, item, timeout: Optional[float] = None) -> bool:
+        """ Returns whether the item has been queued """
+        dropped_item = None
+        with self.condition:
+            if self.drop_policy == DROP_POLICY_BLOCK:
+                if not self.condition.wait_for(lambda: len(self.items) < self.max_size or self.closed, timeout):
+                    return False
+            elif len(self.items) >= self.max_size:
+                dropped_item = self.items.popleft() if self.drop_policy == DROP_POLICY_DROP_OLDEST else item
+                self.dropped_items += 1
+            queued = dropped_item is not item and not self.closed
+            if queued:
+                self.items.append(item)
+                self.condition.notify_all()
+        if dropped_item is not None and dropped_item is not item and self.on_drop is not None:
+            self.on_drop(dropped_item)
+        return queued
+
+    def get(self, timeout: Optional[float] = None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.items) > 0 or self.closed, timeout):
+                return None
+            if len(self.items) == 0:
+                return None
+            item = self.items.popleft()
+            self.condition.notify_all()
+            return item
+
+    def open(self) -> None:
+        with self.condition:
+            self.closed = False
+
+    def close(self) -> None:
+        """ Wakes up every waiting producer and consumer: puts fail from now on, gets return what is left """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def drain(self) -> list:
+        with self.condition:
+            items = list(self.items)
+            self.items.clear()
+            self.condition.notify_all()
+        return items
+
+    def get_size(self) -> int:
+        return len(self.items)
+
+    def get_dropped_items(self) -> int:
+        return self.dropped_items
@@ -0,0 +1,234 @@
+from typing import Optional
+
+import time
+
+import cv2
+
+from data.math.point_2d import Point2D
+from data.mocap_result import MocapResult
+from data.pipeline_frame import PipelineFrame
+from logic.mocap.mocap_hands_core import MocapHandsCore
+from logic.metrics.latency_metrics import LatencyMetrics, SPAN_CAPTURE, SPAN_ENCODE, SPAN_END_TO_END, SPAN_UNDISTORT
+from logic.mocap.mocap_results_bus import MocapResultsBus
+from logic.output.packet_output import PacketOutput
+from logic.packet_encoder import PacketEncoder
+from logic.pipeline.bounded_queue import BoundedQueue, DROP_POLICY_DROP_OLDEST
+from logic.pipeline.pipeline_stage import PipelineStage
+from logic.recording.session_recorder import SessionRecorder
+from logic.stereo_cameras import StereoCameras
+from logic.stereo_rig import StereoRig
+
+FRAME_WAIT_TIMEOUT = 0.5
+
+
+class MocapPipeline(object):
+    """
+    Runs capture, colour conversion, detection, 2D filtering, triangulation, 3D filtering and sending
+    (packet encoding included) concurrently, each stage on its own worker, linked by bounded queues.
+    Throughput is then capped by the slowest stage instead of the sum of all of them.
+    """
+
+    def __init__(self,
+                 stereo_cameras: StereoCameras,
+                 mocap_hands_core: MocapHandsCore,
+                 stereo_rig: StereoRig,
+                 packet_output: PacketOutput,
+                 mocap_results_bus: Optional[MocapResultsBus] = None,
+                 queue_size = 2,
+                 drop_policy = DROP_POLICY_DROP_OLDEST,
+                 packet_encoder: Optional[PacketEncoder] = None,
+                 session_recorder: Optional[SessionRecorder] = None,
+                 latency_metrics: Optional[LatencyMetrics] = None,
+                 ):
+        self.stereo_cameras = stereo_cameras
+        self.mocap_hands_core = mocap_hands_core
+        self.stereo_rig = stereo_rig
+        # Packets are encoded by the send stage right before sending, one buffer is then enough and a delta
+        # encoder never builds on a packet that a queue drops afterwards
+        self.packet_encoder = packet_encoder if packet_encoder is not None else PacketEncoder(max_hands=1)
+        self.packet_output = packet_output
+        packet_output.set_on_packet_dropped(self.packet_encoder.request_keyframe)
+        self.session_recorder = session_recorder
+        self.latency_metrics = latency_metrics if latency_metrics is not None else LatencyMetrics(enabled=False)
+        self.mocap_results_bus = mocap_results_bus if mocap_results_bus is not None else MocapResultsBus()
+        self.next_frame_id = 0
+        self.stages = self.create_stages([
+            ('capture', self.capture),
+            ('colour_conversion', self.convert_colours),
+            ('detection', self.detects),
+            ('filter_2d', self.filter_2d),
+            ('triangulation', self.triangulate),
+            ('filter_3d', self.filter_3d),
+            ('send', self.send),
+        ], queue_size, drop_policy)
+
+    def create_stages(self, processes: list, queue_size: int, drop_policy: str) -> list[PipelineStage]:
+        stages = []
+        input_queue = None
+        for index, (name, process) in enumerate(processes):
+            output_queue = None
+            if index < len(processes) - 1:
+                output_queue = BoundedQueue(queue_size, drop_policy, self.finish_frame)
+            histogram = None
+            # The source stage spends its time waiting for the next frames, it records the capture span itself
+            if self.latency_metrics.is_enabled() and input_queue is not None:
+                histogram = self.latency_metrics.get_histogram(name)
+            stages.append(PipelineStage(name, process, input_queue, output_queue, self.finish_frame, histogram))
+            input_queue = output_queue
+        return stages
+
+    def finish_frame(self, pipeline_frame: PipelineFrame) -> None:
+        """ End of the journey of a frame: sent, without hands or dropped by a queue """
+        pipeline_frame.release()
+        if not pipeline_frame.finish():
+            # Recorded once only, whatever path reported it twice
+            return
+        if self.session_recorder is not None:
+            self.session_recorder.record(pipeline_frame)
+
+    def get_queues(self) -> list[BoundedQueue]:
+        return [stage.input_queue for stage in self.stages if stage.input_queue is not None]
+
+    def start(self) -> None:
+        for queue in self.get_queues():
+            queue.open()
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self) -> None:
+        for stage in self.stages:
+            stage.stop()
+        # A stage blocked on a full queue (block policy) or waiting on an empty one must see the stop
+        for queue in self.get_queues():
+            queue.close()
+        for stage in self.stages:
+            stage.join()
+            if stage.input_queue is not None:
+                for pipeline_frame in stage.input_queue.drain():
+                    pipeline_frame.release()
+
+    def is_running(self) -> bool:
+        return any(stage.is_running() for stage in self.stages)
+
+    def get_stages(self) -> list[PipelineStage]:
+        return self.stages
+
+    def get_latency_metrics(self) -> LatencyMetrics:
+        return self.latency_metrics
+
+    def get_mocap_results_bus(self) -> MocapResultsBus:
+        return self.mocap_results_bus
+
+    def publish_result(self, pipeline_frame: PipelineFrame) -> None:
+        self.mocap_results_bus.publish(MocapResult(
+            pipeline_frame.frame_id,
+            pipeline_frame.timestamp,
+            pipeline_frame.left_points_3d,
+            pipeline_frame.right_points_3d,
+            pipeline_frame.left_filtrated_points_3d,
+            pipeline_frame.right_filtrated_points_3d,
+            pipeline_frame.filtrated_positions,
+        ))
+
+    def get_stereo_rig(self) -> StereoRig:
+        return self.stereo_rig
+
+    def capture(self, _) -> Optional[PipelineFrame]:
+        if not self.stereo_cameras.is_started():
+            self.stop_all_stages()
+            return None
+        stereo_frame_pair = self.stereo_cameras.wait_for_next_frames(FRAME_WAIT_TIMEOUT)
+        if stereo_frame_pair is None:
+            return None
+        pipeline_frame = PipelineFrame(self.next_frame_id, stereo_frame_pair.get_timestamp(), stereo_frame_pair)
+        height, width, _ = stereo_frame_pair.get_left_frame().shape
+        pipeline_frame.frame_size = Point2D(width, height)
+        self.next_frame_id += 1
+        if self.latency_metrics.is_enabled():
+            self.latency_metrics.record(SPAN_CAPTURE, time.perf_counter_ns() - pipeline_frame.timestamp)
+        return pipeline_frame
+
+    def stop_all_stages(self) -> None:
+        for stage in self.stages:
+            stage.stop()
+        for queue in self.get_queues():
+            queue.close()
+
+    def convert_colours(self, pipeline_frame: PipelineFrame) -> PipelineFrame:
+        stereo_frame_pair = pipeline_frame.stereo_frame_pair
+        pipeline_frame.rgb_frames = [
+            cv2.cvtColor(stereo_frame_pair.get_left_frame(), cv2.COLOR_BGR2RGB),
+            cv2.cvtColor(stereo_frame_pair.get_right_frame(), cv2.COLOR_BGR2RGB),
+        ]
+        # The converted copies are all the next stages need, the capture slots can be reused now
+        pipeline_frame.release()
+        return pipeline_frame
+
+    def detects(self, pipeline_frame: PipelineFrame) -> Optional[PipelineFrame]:
+        left_points_3d, right_points_3d = self.mocap_hands_core.detects_raw_points_3d_multi(pipeline_frame.rgb_frames, True)
+        pipeline_frame.rgb_frames = None
+        for points_3d in (left_points_3d, right_points_3d):
+            if points_3d is not None:
+                points_3d.set_timestamp(pipeline_frame.timestamp)
+        pipeline_frame.left_points_3d = left_points_3d
+        pipeline_frame.right_points_3d = right_points_3d
+        if left_points_3d is None or right_points_3d is None:
+            # Still published, the previews must know that the hands are gone
+            self.publish_result(pipeline_frame)
+            return None
+        return pipeline_frame
+
+    def filter_2d(self, pipeline_frame: PipelineFrame) -> PipelineFrame:
+        mocap_hands_core = self.mocap_hands_core
+        if mocap_hands_core.are_2d_trackers_initialized():
+            pipeline_frame.left_filtrated_points_3d, pipeline_frame.right_filtrated_points_3d = mocap_hands_core.apply_filtration_trackers_2d(
+                pipeline_frame.left_points_3d,
+                pipeline_frame.right_points_3d,
+            )
+        else:
+            pipeline_frame.left_filtrated_points_3d = pipeline_frame.left_points_3d
+            pipeline_frame.right_filtrated_points_3d = pipeline_frame.right_points_3d
+        self.publish_result(pipeline_frame)
+        return pipeline_frame
+
+    def triangulate(self, pipeline_frame: PipelineFrame) -> Optional[PipelineFrame]:
+        stereo_rig = self.stereo_rig
+        if not stereo_rig.is_calibrated():
+            return None
+        mocap_hands_core = self.mocap_hands_core
+        left_camera = stereo_rig.get_left_camera()
+        right_camera = stereo_rig.get_right_camera()
+        left_points_2d, right_points_2d = mocap_hands_core.convert_for_triangulation(
+            pipeline_frame.left_filtrated_points_3d,
+            pipeline_frame.right_filtrated_points_3d,
+            pipeline_frame.frame_size,
+        )
+        undistort_start = self.latency_metrics.start()
+        left_points_2d, right_points_2d = mocap_hands_core.undistort_points_for_triangulation(
+            left_points_2d,
+            right_points_2d,
+            left_camera.get_undistorter(),
+            right_camera.get_undistorter(),
+        )
+        self.latency_metrics.stop(SPAN_UNDISTORT, undistort_start)
+        pipeline_frame.positions = mocap_hands_core.triangulate_raw_points(left_points_2d, right_points_2d, stereo_rig)
+        if pipeline_frame.positions is None:
+            return None
+        return pipeline_frame
+
+    def filter_3d(self, pipeline_frame: PipelineFrame) -> PipelineFrame:
+        if self.mocap_hands_core.is_3d_tracker_initialized():
+            pipeline_frame.filtrated_positions = self.mocap_hands_core.apply_filtration_tracker_3d(pipeline_frame.positions)
+        else:
+            pipeline_frame.filtrated_positions = pipeline_frame.positions
+        self.publish_result(pipeline_frame)
+        return pipeline_frame
+
+    def send(self, pipeline_frame: PipelineFrame) -> PipelineFrame:
+        encode_start = self.latency_metrics.start()
+        pipeline_frame.packet = self.packet_encoder.encode([pipeline_frame.filtrated_positions], pipeline_frame.timestamp)
+        self.latency_metrics.stop(SPAN_ENCODE, encode_start)
+        self.packet_output.send(pipeline_frame.packet)
+        if self.latency_metrics.is_enabled():
+            self.latency_metrics.record(SPAN_END_TO_END, time.perf_counter_ns() - pipeline_frame.timestamp)
+        return pipeline_frame
@@ -0,0 +1,108 @@
+import time
+import traceback
+from threading import Thread
+from typing import Callable, Optional
+
+from logic.metrics.latency_histogram import LatencyHistogram
+from logic.pipeline.bounded_queue import BoundedQueue
+
+STAGE_POLL_TIMEOUT = 0.2
+
+
+class PipelineStage(object):
+    """
+    Runs one processing step on its own worker thread, between an input and an output queue.
+    A stage without input queue is a source, a process returning None ends the journey of the item.
+    With a histogram, the duration of every process is recorded in it, from the worker thread only.
+    A process raising an exception loses its item only, the stage counts the failure and goes on.
+    """
+
+    def __init__(self, name: str, process: Callable, input_queue: Optional[BoundedQueue], output_queue: Optional[BoundedQueue], on_discard: Optional[Callable] = None, histogram: Optional[LatencyHistogram] = None):
+        self.name = name
+        self.process = process
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.on_discard = on_discard
+        self.histogram = histogram
+        self.running = False
+        self.thread = None
+        self.processed_items = 0
+        self.failed_items = 0
+        self.last_error = None
+        self.total_duration = 0
+        self.last_duration = 0
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = Thread(target=self.run, name='pipeline-' + self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def run(self) -> None:
+        while self.running:
+            item = None
+            if self.input_queue is not None:
+                item = self.input_queue.get(STAGE_POLL_TIMEOUT)
+                if item is None:
+                    continue
+            start_time = time.perf_counter_ns()
+            try:
+                result = self.process(item)
+            except Exception as error:
+                self.failed_items += 1
+                self.last_error = error
+                traceback.print_exc()
+                if item is not None and self.on_discard is not None:
+                    # Its frame leases must go back to the cameras
+                    self.on_discard(item)
+                continue
+            duration = time.perf_counter_ns() - start_time
+            self.last_duration = duration
+            self.total_duration += duration
+            if self.histogram is not None:
+                self.histogram.record(duration)
+            if result is None:
+                if item is not None and self.on_discard is not None:
+                    self.on_discard(item)
+                continue
+            self.processed_items += 1
+            if self.output_queue is not None and self.output_queue.put(result):
+                continue
+            if self.on_discard is not None:
+                # Last stage, or the item could not be queued: it is done
+                self.on_discard(result)
+
+    def is_running(self) -> bool:
+        return self.running
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_processed_items(self) -> int:
+        return self.processed_items
+
+    def get_failed_items(self) -> int:
+        return self.failed_items
+
+    def get_last_error(self) -> Optional[Exception]:
+        return self.last_error
+
+    def get_last_duration_ms(self) -> float:
+        return self.last_duration / 1e6
+
+    def get_mean_duration_ms(self) -> float:
+        if self.processed_items == 0:
+            return 0.0
+        return self.total_duration / self.processed_items / 1e6
+
+    def get_histogram(self) -> Optional[LatencyHistogram]:
+        return self.histogram
+
+    def get_dropped_items(self) -> int:
+        return 0 if self.input_queue is None else self.input_queue.get_dropped_items()
@@ -0,0 +1,158 @@
+import multiprocessing
+import queue
+import time
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from threading import Thread
+from typing import Callable, Optional
+
+import numpy as np
+
+from logic.common.frame_ring_buffer import FrameRingBuffer
+from logic.metrics.latency_histogram import LatencyHistogram
+from logic.source.frame_source import FrameSource
+
+PROCESS_FPS = 0
+PROCESS_CAPTURED_FRAMES = 1
+STARTUP_TIMEOUT = 10.0
+EVENTS_POLL_TIMEOUT = 0.2
+# The frame rate shared with the parent is refreshed every so many frames
+FPS_UPDATE_FRAMES = 30
+
+
+def run_capture_process(frame_source: FrameSource, slots_number: int, lock, events_queue, stop_event, counters) -> None:
+    """ Entry point of the capture process: grabs and decodes frames straight into a shared memory ring """
+    frame_source.open()
+    try:
+        if not frame_source.is_opened() or not frame_source.grab():
+            return
+        timestamp = time.perf_counter_ns()
+        result, frame = frame_source.retrieve()
+        if not result:
+            return
+        size = FrameRingBuffer.get_required_size(slots_number, frame.shape, frame.dtype)
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            capture_frames(frame_source, FrameRingBuffer(slots_number, frame.shape, frame.dtype, lock, memory.buf), frame, timestamp, memory.name, events_queue, stop_event, counters)
+        finally:
+            memory.close()
+    finally:
+        frame_source.release()
+        events_queue.put(None)
+
+
+def capture_frames(frame_source: FrameSource, frame_ring_buffer: FrameRingBuffer, first_frame: np.ndarray, timestamp: int, memory_name: str, events_queue, stop_event, counters) -> None:
+    frame_ring_buffer.initialize()
+    slot_index = frame_ring_buffer.get_write_slot_index()
+    np.copyto(frame_ring_buffer.get_write_slot(slot_index), first_frame)
+    events_queue.put((memory_name, first_frame.shape, first_frame.dtype.str))
+    events_queue.put(frame_ring_buffer.publish(slot_index, timestamp))
+    frame_intervals = LatencyHistogram('frame_interval')
+    while not stop_event.is_set() and frame_source.is_opened():
+        if not frame_source.grab():
+            break
+        last_timestamp = timestamp
+        timestamp = time.perf_counter_ns()
+        frame_intervals.record(timestamp - last_timestamp)
+        if frame_intervals.get_count() % FPS_UPDATE_FRAMES == 0:
+            counters[PROCESS_FPS] = frame_intervals.get_rate()
+        counters[PROCESS_CAPTURED_FRAMES] += 1
+        slot_index = frame_ring_buffer.get_write_slot_index()
+        if slot_index is None:
+            frame_ring_buffer.count_dropped_frame()
+            continue
+        slot = frame_ring_buffer.get_write_slot(slot_index)
+        result, frame = frame_source.retrieve(slot)
+        if not result:
+            break
+        if frame is not slot:
+            if not frame_ring_buffer.is_compatible(frame):
+                # The ring can't be resized once shared, such frames are lost
+                frame_ring_buffer.count_dropped_frame()
+                continue
+            np.copyto(slot, frame)
+        events_queue.put(frame_ring_buffer.publish(slot_index, timestamp))
+
+
+class ProcessCapture(object):
+    """
+    Runs a frame source in its own process so that capture and MJPEG decoding don't share the GIL
+    with the inference. Frames are exchanged through a shared memory FrameRingBuffer.
+    """
+
+    def __init__(self, frame_source: FrameSource, slots_number = 4):
+        self.frame_source = frame_source
+        self.slots_number = slots_number
+        self.lock = multiprocessing.Lock()
+        self.events_queue = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.counters = multiprocessing.Array('d', 2)
+        self.process = None
+        self.memory = None
+        self.memory_unlinked = False
+        self.frame_ring_buffer = None
+        self.running = False
+
+    def start(self, on_new_frame: Callable[[], None]) -> FrameRingBuffer:
+        # Shares one tracker with the capture process, the block is owned and unlinked by this side
+        resource_tracker.ensure_running()
+        self.process = multiprocessing.Process(
+            target=run_capture_process,
+            args=(self.frame_source, self.slots_number, self.lock, self.events_queue, self.stop_event, self.counters),
+            daemon=True
+        )
+        self.process.start()
+        try:
+            frame_info = self.events_queue.get(timeout=STARTUP_TIMEOUT)
+        except queue.Empty:
+            frame_info = None
+        if frame_info is None:
+            self.stop()
+            raise IOError("Could not open camera in the capture process")
+        memory_name, frame_shape, dtype = frame_info
+        self.memory = shared_memory.SharedMemory(name=memory_name)
+        self.memory_unlinked = False
+        self.frame_ring_buffer = FrameRingBuffer(self.slots_number, frame_shape, np.dtype(dtype), self.lock, self.memory.buf)
+        self.running = True
+        Thread(target=self.forward_events, args=(on_new_frame,), daemon=True).start()
+        return self.frame_ring_buffer
+
+    def forward_events(self, on_new_frame: Callable[[], None]) -> None:
+        while self.running:
+            try:
+                sequence = self.events_queue.get(timeout=EVENTS_POLL_TIMEOUT)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    break
+                continue
+            if sequence is None:
+                break
+            on_new_frame()
+        self.running = False
+        # Wakes up the readers, the capture is over
+        on_new_frame()
+
+    def stop(self) -> None:
+        # The events thread keeps draining the queue until the process says goodbye, otherwise join could block
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout=STARTUP_TIMEOUT)
+        if self.memory is not None and not self.memory_unlinked:
+            # The mapping stays valid for the views still held by readers, only the name is removed (once)
+            self.memory.unlink()
+            self.memory_unlinked = True
+
+    def is_running(self) -> bool:
+        return self.running
+
+    def get_frame_ring_buffer(self) -> Optional[FrameRingBuffer]:
+        return self.frame_ring_buffer
+
+    def get_fps(self) -> int:
+        return int(self.counters[PROCESS_FPS])
+
+    def get_captured_frames(self) -> int:
+        return int(self.counters[PROCESS_CAPTURED_FRAMES])
+
+    def get_dropped_frames(self) -> int:
+        return 0 if self.frame_ring_buffer is None else self.frame_ring_buffer.get_dropped_frames()
@@ -0,0 +1,60 @@
+import json
+import os
+
+import numpy as np
+
+from logic.recording.session_recorder import FLAGS_COLUMN, LANDMARKS_COLUMNS, MANIFEST_FILE_NAME, SESSION_FORMAT_VERSION, get_column_path
+
+
+class SessionReader(object):
+    """
+    Reads a SessionRecorder directory through read-only memory maps, nothing is loaded until used.
+    A session cut short (crash, session still being recorded) is read up to its last complete row.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE_NAME)) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest['format_version'] != SESSION_FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format version {manifest['format_version']}")
+        self.landmarks_number = manifest['landmarks_number']
+        self.columns = {name: (np.dtype(column['dtype']), tuple(column['shape'])) for name, column in manifest['columns'].items()}
+        self.frames_number = min(self.count_rows(name) for name in self.columns)
+        self.memory_maps = {}
+
+    def count_rows(self, name: str) -> int:
+        dtype, shape = self.columns[name]
+        path = get_column_path(self.directory, name)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (dtype.itemsize * int(np.prod(shape, dtype=np.int64)))
+
+    def get_frames_number(self) -> int:
+        return self.frames_number
+
+    def get_landmarks_number(self) -> int:
+        return self.landmarks_number
+
+    def get_column_names(self) -> list[str]:
+        return list(self.columns)
+
+    def get_column(self, name: str) -> np.ndarray:
+        """ (frames, ...) read-only np.memmap view of a column """
+        memory_map = self.memory_maps.get(name)
+        if memory_map is None:
+            dtype, shape = self.columns[name]
+            if self.frames_number == 0:
+                return np.empty((0,) + shape, dtype=dtype)
+            memory_map = np.memmap(get_column_path(self.directory, name), dtype=dtype, mode='r', shape=(self.frames_number,) + shape)
+            self.memory_maps[name] = memory_map
+        return memory_map
+
+    def get_presence(self, name: str) -> np.ndarray:
+        """ Boolean mask of the frames holding the given landmarks column """
+        bit = LANDMARKS_COLUMNS.index(name)
+        return (self.get_column(FLAGS_COLUMN) & (1 << bit)) != 0
+
+    def get_capture_order(self) -> np.ndarray:
+        """ Row indices sorted by frame id """
+        return np.argsort(self.get_column('frame_ids'), kind='stable')
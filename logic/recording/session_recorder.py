@@ -0,0 +1,123 @@
+import json
+import os
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+from data.landmark_set import LandmarkSet
+from data.pipeline_frame import PipelineFrame
+
+SESSION_FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = 'manifest.json'
+COLUMN_FILE_EXTENSION = '.bin'
+FLAGS_COLUMN = 'flags'
+# Landmark columns, in the order of their presence bit in the flags column
+LANDMARKS_COLUMNS = [
+    'left_points_3d',
+    'right_points_3d',
+    'left_filtrated_points_3d',
+    'right_filtrated_points_3d',
+    'positions',
+    'filtrated_positions',
+]
+
+
+def get_columns(landmarks_number: int) -> dict:
+    """ Name to (dtype, shape of one row) of every column of a session """
+    columns = {
+        'frame_ids': ('<i8', ()),
+        'timestamps': ('<i8', ()),
+        FLAGS_COLUMN: ('u1', ()),
+    }
+    for name in LANDMARKS_COLUMNS:
+        columns[name] = ('<f4', (landmarks_number, 3))
+    columns['reprojection_errors'] = ('<f4', (landmarks_number,))
+    return columns
+
+
+def get_column_path(directory: str, name: str) -> str:
+    return os.path.join(directory, name + COLUMN_FILE_EXTENSION)
+
+
+class SessionRecorder(object):
+    """
+    Appends every frame leaving the pipeline to a session directory, one raw file per column
+    (memory-mappable by SessionReader) and a JSON manifest describing them. Landmarks missing
+    for a frame are stored as NaN and their bit cleared in the flags column.
+    Rows are in the order frames leave the pipeline, frame_ids gives the capture order.
+    """
+
+    def __init__(self, directory: str, landmarks_number = 21):
+        self.directory = directory
+        self.landmarks_number = landmarks_number
+        self.columns = get_columns(landmarks_number)
+        self.lock = Lock()
+        self.files = None
+        self.recorded_frames = 0
+        self.missing_landmarks = np.full((landmarks_number, 3), np.nan, dtype=np.float32)
+        self.missing_errors = np.full(landmarks_number, np.nan, dtype=np.float32)
+
+    def get_directory(self) -> str:
+        return self.directory
+
+    def open(self) -> None:
+        """ Raises FileExistsError when the directory already holds a session, each session needs its own """
+        manifest_path = os.path.join(self.directory, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            raise FileExistsError(f"A session is already recorded in {self.directory}")
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {
+            'format_version': SESSION_FORMAT_VERSION,
+            'landmarks_number': self.landmarks_number,
+            'columns': {name: {'dtype': dtype, 'shape': list(shape)} for name, (dtype, shape) in self.columns.items()},
+        }
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        with self.lock:
+            self.files = {name: open(get_column_path(self.directory, name), 'wb') for name in self.columns}
+
+    def is_opened(self) -> bool:
+        return self.files is not None
+
+    def record(self, pipeline_frame: PipelineFrame) -> None:
+        flags = 0
+        landmarks = []
+        for bit, name in enumerate(LANDMARKS_COLUMNS):
+            landmark_set: Optional[LandmarkSet] = getattr(pipeline_frame, name)
+            if landmark_set is None or len(landmark_set) != self.landmarks_number:
+                landmarks.append(self.missing_landmarks)
+            else:
+                flags |= 1 << bit
+                landmarks.append(landmark_set.get_positions())
+        reprojection_errors = self.missing_errors
+        if pipeline_frame.positions is not None and pipeline_frame.positions.get_reprojection_errors() is not None:
+            reprojection_errors = pipeline_frame.positions.get_reprojection_errors()
+        with self.lock:
+            files = self.files
+            if files is None:
+                return
+            files['frame_ids'].write(np.int64(pipeline_frame.frame_id).tobytes())
+            files['timestamps'].write(np.int64(pipeline_frame.timestamp).tobytes())
+            files[FLAGS_COLUMN].write(np.uint8(flags).tobytes())
+            for name, positions in zip(LANDMARKS_COLUMNS, landmarks):
+                files[name].write(np.ascontiguousarray(positions, dtype='<f4').tobytes())
+            files['reprojection_errors'].write(np.ascontiguousarray(reprojection_errors, dtype='<f4').tobytes())
+            self.recorded_frames += 1
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.files is not None:
+                for file in self.files.values():
+                    file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            files = self.files
+            self.files = None
+        if files is not None:
+            for file in files.values():
+                file.close()
+
+    def get_recorded_frames(self) -> int:
+        return self.recorded_frames
@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from logic.source.frame_source import FrameSource
+
+
+class DeviceFrameSource(FrameSource):
+    def __init__(self, capture_id: int, fps: int, width = 1080, height = 720, backend: Optional[int] = None):
+        self.capture_id = capture_id
+        self.fps = fps
+        self.width = width
+        self.height = height
+        # DirectShow is only available on Windows, let OpenCV choose elsewhere
+        self.backend = backend if backend is not None else (cv2.CAP_DSHOW if os.name == 'nt' else cv2.CAP_ANY)
+        self.capture = None
+
+    def open(self) -> None:
+        self.capture = cv2.VideoCapture(self.capture_id, self.backend)
+        self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.capture.set(cv2.CAP_PROP_FPS, self.fps)
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
+    def release(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+
+    def is_opened(self) -> bool:
+        return self.capture is not None and self.capture.isOpened()
+
+    def grab(self) -> bool:
+        return self.capture.grab()
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> tuple[bool, Optional[np.ndarray]]:
+        return self.capture.retrieve(image)
+
+    def read(self, image: Optional[np.ndarray] = None) -> tuple[bool, Optional[np.ndarray]]:
+        return self.capture.read(image)
+
+    def get_fps(self) -> float:
+        return self.fps
@@ -0,0 +1,26 @@
+import time
+
+
+class FramePacer(object):
+    """ Sleeps between frames so that a source is delivered at a given rate """
+
+    def __init__(self, fps: float, real_time = True):
+        self.fps = fps
+        self.real_time = real_time and fps > 0
+        self.next_deadline = None
+
+    def reset(self) -> None:
+        self.next_deadline = None
+
+    def wait(self) -> None:
+        if not self.real_time:
+            return
+        period = 1.0 / self.fps
+        now = time.perf_counter()
+        if self.next_deadline is None:
+            self.next_deadline = now
+        delay = self.next_deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        # Never try to catch up more than one frame when the consumer was late
+        self.next_deadline = max(self.next_deadline + period, now)
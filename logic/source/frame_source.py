@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+
+class FrameSource(ABC):
+    """ Common API of every frame provider, modeled after cv2.VideoCapture """
+
+    @abstractmethod
+    def open(self) -> None:
+        pass
+
+    @abstractmethod
+    def release(self) -> None:
+        pass
+
+    @abstractmethod
+    def is_opened(self) -> bool:
+        pass
+
+    @abstractmethod
+    def grab(self) -> bool:
+        pass
+
+    @abstractmethod
+    def retrieve(self, image: Optional[np.ndarray] = None) -> tuple[bool, Optional[np.ndarray]]:
+        pass
+
+    def read(self, image: Optional[np.ndarray] = None) -> tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    @abstractmethod
+    def get_fps(self) -> float:
+        pass
@@ -0,0 +1,57 @@
+from typing import Optional
+
+import numpy as np
+
+from logic.source.frame_pacer import FramePacer
+from logic.source.frame_source import FrameSource
+
+
+class SyntheticFrameSource(FrameSource):
+    """ Generates frames with a moving square, at any resolution and rate, without any device """
+
+    def __init__(self, width = 1080, height = 720, fps = 60.0, real_time = True, square_size = 80):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.real_time = real_time
+        self.square_size = square_size
+        self.pacer = FramePacer(fps, real_time)
+        self.opened = False
+        self.frame_index = 0
+
+    def open(self) -> None:
+        self.opened = True
+        self.frame_index = 0
+        self.pacer.reset()
+
+    def release(self) -> None:
+        self.opened = False
+
+    def is_opened(self) -> bool:
+        return self.opened
+
+    def grab(self) -> bool:
+        if not self.opened:
+            return False
+        self.pacer.wait()
+        self.frame_index += 1
+        return True
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> tuple[bool, Optional[np.ndarray]]:
+        if not self.opened:
+            return False, None
+        shape = (self.height, self.width, 3)
+        if image is None or image.shape != shape or image.dtype != np.uint8:
+            image = np.empty(shape, dtype=np.uint8)
+        image[:] = 32
+        size = self.square_size
+        x = (self.frame_index * 7) % max(self.width - size, 1)
+        y = (self.frame_index * 3) % max(self.height - size, 1)
+        image[y:y + size, x:x + size] = 255
+        return True, image
+
+    def get_fps(self) -> float:
+        return self.fps
+
+    def get_frame_index(self) -> int:
+        return self.frame_index
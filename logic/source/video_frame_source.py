@@ -0,0 +1,57 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from logic.source.frame_pacer import FramePacer
+from logic.source.frame_source import FrameSource
+
+
+class VideoFrameSource(FrameSource):
+    """ Plays back a recorded video file, either at its real-time rate or as fast as possible """
+
+    def __init__(self, video_path: str, real_time = True, loop = False):
+        self.video_path = video_path
+        self.real_time = real_time
+        self.loop = loop
+        self.capture = None
+        self.fps = 0.0
+        self.pacer = None
+
+    def open(self) -> None:
+        self.capture = cv2.VideoCapture(self.video_path)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open video file {self.video_path}")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.pacer = FramePacer(self.fps, self.real_time)
+
+    def release(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+
+    def is_opened(self) -> bool:
+        return self.capture is not None and self.capture.isOpened()
+
+    def grab(self) -> bool:
+        self.pacer.wait()
+        result = self.capture.grab()
+        if not result and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            result = self.capture.grab()
+        if not result:
+            # End of the recording: behave like an unplugged device
+            self.release()
+        return result
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> tuple[bool, Optional[np.ndarray]]:
+        return self.capture.retrieve(image)
+
+    def get_fps(self) -> float:
+        return self.fps
+
+    def get_frames_count(self) -> int:
+        return int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def set_position(self, frame_index: int) -> None:
+        """ The next grabbed frame will be frame_index """
+        self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
@@ -1,22 +1,76 @@
+import os
+import time
+from threading import Thread
+from typing import Optional
+
 import cv2
 
 from data.calibration_data import CalibrationData
 from data.calibration_stereo_data import CalibrationStereoData
 from logic.camera import Camera
+from logic.chessboard_corners_cache import ChessboardCornersCache
+from logic.chessboard_detector import ChessboardDetector
 from data.chessboard_data import ChessboardData
+from logic.common.stereo_frame_pair import StereoFramePair
 from logic.filesystem import ImagesFileSystem
+from logic.latest_frame_reader import LatestFrameReader
+from logic.source.synthetic_frame_source import SyntheticFrameSource
+from logic.stereo_skew_stats import StereoSkewStats
+from logic.source.video_frame_source import VideoFrameSource
 
 STEREO_LEFT_CAMERA_INDEX = 0
 STEREO_RIGHT_CAMERA_INDEX = 1
 
 class StereoCameras:
-    def __init__(self, left_camera: Camera, right_camera: Camera):
+    def __init__(self, left_camera: Camera, right_camera: Camera, synchronized = False, max_skew_ms: Optional[float] = None):
         self.left_camera =  left_camera
         self.right_camera = right_camera
+        self.left_frame_reader = LatestFrameReader(left_camera)
+        self.right_frame_reader = LatestFrameReader(right_camera)
+        # Synchronized mode grabs both devices back to back from one thread before decoding any of them
+        self.synchronized = synchronized
+        if synchronized and (left_camera.is_capture_process() or right_camera.is_capture_process()):
+            raise ValueError("Cameras captured in their own process can't be synchronized")
+        if max_skew_ms is None:
+            max_skew_ms = 500.0 / left_camera.get_fps() if left_camera.get_fps() > 0 else 10.0
+        self.max_skew = int(max_skew_ms * 1e6)
+        self.skew_stats = StereoSkewStats()
+
+    @staticmethod
+    def from_video_files(left_video_path: str, right_video_path: str, real_time = True, loop = False, shared_mode = True, fps = 30) -> 'StereoCameras':
+        left_source = VideoFrameSource(left_video_path, real_time, loop)
+        right_source = VideoFrameSource(right_video_path, real_time, loop)
+        return StereoCameras(
+            Camera(STEREO_LEFT_CAMERA_INDEX, fps, shared_mode, frame_source=left_source),
+            Camera(STEREO_RIGHT_CAMERA_INDEX, fps, shared_mode, frame_source=right_source),
+        )
+
+    @staticmethod
+    def from_synthetic(width = 1080, height = 720, fps = 60.0, real_time = True, shared_mode = True) -> 'StereoCameras':
+        left_source = SyntheticFrameSource(width, height, fps, real_time)
+        right_source = SyntheticFrameSource(width, height, fps, real_time)
+        return StereoCameras(
+            Camera(STEREO_LEFT_CAMERA_INDEX, fps, shared_mode, frame_source=left_source),
+            Camera(STEREO_RIGHT_CAMERA_INDEX, fps, shared_mode, frame_source=right_source),
+        )
 
     def start_all_cameras(self):
-        self.left_camera.start()
-        self.right_camera.start()
+        self.left_camera.start(not self.synchronized)
+        self.right_camera.start(not self.synchronized)
+        if self.synchronized:
+            Thread(target=self.update_frames_synchronized, daemon=True).start()
+
+    def update_frames_synchronized(self):
+        while self.is_started():
+            try:
+                left_timestamp = self.left_camera.grab_frame()
+                right_timestamp = self.right_camera.grab_frame()
+                self.left_camera.retrieve_into_ring_buffer(left_timestamp)
+                self.right_camera.retrieve_into_ring_buffer(right_timestamp)
+            except IOError:
+                if not self.is_started():
+                    break
+                raise
 
     def stop_all_cameras(self):
         self.left_camera.stop()
@@ -37,17 +91,83 @@ class StereoCameras:
     def get_frames(self) -> list:
         return [self.left_camera.get_frame(), self.right_camera.get_frame()]
 
+    def wait_for_next_frames(self, timeout: Optional[float] = None) -> Optional[StereoFramePair]:
+        """
+        Returns the next pair of frames captured at most max_skew apart.
+        The older frame of an unmatched pair is dropped and replaced by the next one of its camera.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        left_lease = self.left_frame_reader.read_next(self.get_remaining_timeout(deadline))
+        if left_lease is None:
+            return None
+        right_lease = self.right_frame_reader.read_next(self.get_remaining_timeout(deadline))
+        while right_lease is not None:
+            skew = left_lease.get_timestamp() - right_lease.get_timestamp()
+            if abs(skew) <= self.max_skew:
+                self.skew_stats.add_pair(skew)
+                return StereoFramePair(left_lease, right_lease)
+            self.skew_stats.increment_dropped_frames()
+            if skew < 0:
+                left_lease.release()
+                left_lease = self.left_frame_reader.read_next(self.get_remaining_timeout(deadline))
+                if left_lease is None:
+                    right_lease.release()
+                    return None
+            else:
+                right_lease.release()
+                right_lease = self.right_frame_reader.read_next(self.get_remaining_timeout(deadline))
+        left_lease.release()
+        return None
+
+    @staticmethod
+    def get_remaining_timeout(deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+    def get_dropped_frames(self) -> tuple[int, int]:
+        return self.left_frame_reader.get_dropped_frames(), self.right_frame_reader.get_dropped_frames()
+
+    def get_skew_stats(self) -> StereoSkewStats:
+        return self.skew_stats
+
+    def get_max_skew_ms(self) -> float:
+        return self.max_skew / 1e6
+
+    def set_max_skew_ms(self, max_skew_ms: float) -> None:
+        self.max_skew = int(max_skew_ms * 1e6)
+
     def calibrate_all_cameras_individually(self, image_file_system: ImagesFileSystem, chessboard_data: ChessboardData) -> list:
-        calibrations_data_list = []
-        for camera in self.get_cameras_as_list():
-            calibration_data = self.calibrate_one_camera(camera, image_file_system, chessboard_data)
-            calibrations_data_list.append(calibration_data)
+        """
+        The images of both cameras are searched at once on a process pool, except those already in the
+        corners cache of the images folder. Each camera is calibrated with
+        all of its chessboards, but the returned calibration data only keep the pictures (matched by file
+        name) where both cameras found it, in the same order, as stereoCalibrate needs.
+        """
+        cameras = self.get_cameras_as_list()
+        images_paths_lists = [sorted(image_file_system.get_all_images_paths('/' + camera.get_camera_name() + '/')) for camera in cameras]
+        corners_cache = ChessboardCornersCache(image_file_system.get_corners_cache_path(), chessboard_data)
+        chessboard_detector = ChessboardDetector(chessboard_data, corners_cache=corners_cache)
+        all_detections = chessboard_detector.detect_all([image_path for images_paths in images_paths_lists for image_path in images_paths])
+        object_points = chessboard_detector.get_object_points()
+        detections_by_name_list = []
+        start = 0
+        for camera, images_paths in zip(cameras, images_paths_lists):
+            detections = all_detections[start:start + len(images_paths)]
+            start += len(images_paths)
+            camera.calibrate_from_detections(detections, object_points)
+            detections_by_name_list.append({os.path.basename(image_path): detection for image_path, detection in zip(images_paths, detections)})
+        calibrations_data_list = [CalibrationData() for _ in cameras]
+        common_names = sorted(set.intersection(*[set(detections_by_name) for detections_by_name in detections_by_name_list]))
+        for name in common_names:
+            detections = [detections_by_name[name] for detections_by_name in detections_by_name_list]
+            # A pair where one view missed the chessboard is dropped for both cameras
+            if any(corners is None for _, corners in detections):
+                continue
+            for calibration_data, (image_size, corners) in zip(calibrations_data_list, detections):
+                calibration_data.get_objects_points().append(object_points)
+                calibration_data.get_image_points().append(corners)
+                calibration_data.set_image_size(image_size)
         return calibrations_data_list
 
-    def calibrate_one_camera(self, camera: Camera, image_file_system: ImagesFileSystem, chessboard_data: ChessboardData) -> CalibrationData:
-        images_paths_list = image_file_system.get_all_images_paths('/' + camera.get_camera_name() + '/')
-        return camera.calibrate_new(images_paths_list, chessboard_data)
-
     def calibrate_stereo_cameras(self, calibration_data_list: list) -> CalibrationStereoData:
         cameras_list = self.get_cameras_as_list()
         retval, K1, D1, K2, D2, R, T, E, F = cv2.stereoCalibrate(
@@ -58,8 +178,8 @@ class StereoCameras:
             cameras_list[0].get_distortion_coefficients(),
             cameras_list[1].get_intrinsics_matrix(),
             cameras_list[1].get_distortion_coefficients(),
-            (9, 6),
+            calibration_data_list[0].get_image_size(),
             flags=cv2.CALIB_FIX_INTRINSIC
         )
-        calibration_stereo_data = CalibrationStereoData(R, T)
+        calibration_stereo_data = CalibrationStereoData(R, T, E, F)
         return calibration_stereo_data
\ No newline at end of file
@@ -0,0 +1,121 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from data.calibration_stereo_data import CalibrationStereoData
+from logic.camera import Camera
+
+
+class StereoRig(object):
+    """
+    Both cameras' intrinsics and distortion with the stereo extrinsics, plus what derives from them:
+    projection and rectification matrices. They are computed once and only rebuilt when a calibration
+    matrix is replaced, every rebuild bumps the version.
+    """
+
+    def __init__(self, left_camera: Camera, right_camera: Camera, calibration_stereo_data: Optional[CalibrationStereoData] = None):
+        self.left_camera = left_camera
+        self.right_camera = right_camera
+        self.calibration_stereo_data = calibration_stereo_data
+        self.calibration_key = None
+        self.version = 0
+        self.left_projection_matrix = None
+        self.right_projection_matrix = None
+        self.rectifications = {}
+
+    def get_left_camera(self) -> Camera:
+        return self.left_camera
+
+    def get_right_camera(self) -> Camera:
+        return self.right_camera
+
+    def get_calibration_stereo_data(self) -> Optional[CalibrationStereoData]:
+        return self.calibration_stereo_data
+
+    def set_calibration_stereo_data(self, calibration_stereo_data: CalibrationStereoData) -> None:
+        self.calibration_stereo_data = calibration_stereo_data
+
+    def is_calibrated(self) -> bool:
+        return (self.calibration_stereo_data is not None
+                and self.left_camera.get_intrinsics_matrix() is not None
+                and self.right_camera.get_intrinsics_matrix() is not None)
+
+    def get_calibration_key(self) -> tuple:
+        # Same rule as the undistorter: a calibration is replaced, never edited in place
+        calibration_stereo_data = self.calibration_stereo_data
+        return (
+            self.left_camera.get_intrinsics_matrix(),
+            self.left_camera.get_distortion_coefficients(),
+            self.right_camera.get_intrinsics_matrix(),
+            self.right_camera.get_distortion_coefficients(),
+            calibration_stereo_data,
+            None if calibration_stereo_data is None else calibration_stereo_data.get_rotation_matrix(),
+            None if calibration_stereo_data is None else calibration_stereo_data.get_translation_matrix(),
+        )
+
+    def is_up_to_date(self) -> bool:
+        calibration_key = self.calibration_key
+        if calibration_key is None:
+            return False
+        return all(cached is current for cached, current in zip(calibration_key, self.get_calibration_key()))
+
+    def update(self) -> None:
+        """ Rebuilds the derived matrices if the calibration changed since the last call """
+        if self.is_up_to_date():
+            return
+        if not self.is_calibrated():
+            raise RuntimeError("Stereo rig is not calibrated")
+        calibration_stereo_data = self.calibration_stereo_data
+        # RT matrix for C1 is identity, for C2 it is the R and T obtained from stereo calibration
+        rt_1 = np.hstack([np.eye(3), np.zeros((3, 1))])
+        rt_2 = np.hstack([calibration_stereo_data.get_rotation_matrix(), np.reshape(calibration_stereo_data.get_translation_matrix(), (3, 1))])
+        self.left_projection_matrix = self.left_camera.get_intrinsics_matrix() @ rt_1
+        self.right_projection_matrix = self.right_camera.get_intrinsics_matrix() @ rt_2
+        self.rectifications = {}
+        self.calibration_key = self.get_calibration_key()
+        self.version += 1
+
+    def get_version(self) -> int:
+        self.update()
+        return self.version
+
+    def get_projection_matrices(self) -> tuple[np.ndarray, np.ndarray]:
+        self.update()
+        return self.left_projection_matrix, self.right_projection_matrix
+
+    def get_rectification(self, image_size: tuple[int, int]) -> tuple:
+        """ (R1, R2, P1, P2, Q) from cv2.stereoRectify for a (width, height) image size """
+        self.update()
+        rectification = self.rectifications.get(image_size)
+        if rectification is None:
+            calibration_stereo_data = self.calibration_stereo_data
+            R1, R2, P1, P2, Q, _, _ = cv2.stereoRectify(
+                self.left_camera.get_intrinsics_matrix(),
+                self.left_camera.get_distortion_coefficients(),
+                self.right_camera.get_intrinsics_matrix(),
+                self.right_camera.get_distortion_coefficients(),
+                image_size,
+                calibration_stereo_data.get_rotation_matrix(),
+                calibration_stereo_data.get_translation_matrix(),
+            )
+            rectification = (R1, R2, P1, P2, Q)
+            self.rectifications[image_size] = rectification
+        return rectification
+
+    def set_rectification(self, image_size: tuple[int, int], rectification: tuple) -> None:
+        """ Results of get_rectification computed beforehand, for the current calibration """
+        self.update()
+        self.rectifications[image_size] = rectification
+
+    def triangulate(self, left_points_2d: np.ndarray, right_points_2d: np.ndarray) -> np.ndarray:
+        """ Undistorted (N, 2) pixel coordinates of both cameras to (N, 3) positions in the left camera frame """
+        left_projection_matrix, right_projection_matrix = self.get_projection_matrices()
+        points_4d = cv2.triangulatePoints(
+            left_projection_matrix,
+            right_projection_matrix,
+            np.asarray(left_points_2d, dtype=np.float64).T,
+            np.asarray(right_points_2d, dtype=np.float64).T,
+        )
+        points_3d = points_4d[:3, :] / points_4d[3, :]
+        return points_3d.T
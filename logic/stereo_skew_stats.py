@@ -0,0 +1,41 @@
+class StereoSkewStats:
+    def __init__(self):
+        self.pairs_counter = 0
+        self.dropped_frames = 0
+        self.skew_sum = 0
+        self.max_skew = 0
+        self.last_skew = 0
+
+    def reset(self):
+        self.pairs_counter = 0
+        self.dropped_frames = 0
+        self.skew_sum = 0
+        self.max_skew = 0
+        self.last_skew = 0
+
+    def add_pair(self, skew: int):
+        skew = abs(skew)
+        self.pairs_counter += 1
+        self.skew_sum += skew
+        self.max_skew = max(self.max_skew, skew)
+        self.last_skew = skew
+
+    def increment_dropped_frames(self):
+        self.dropped_frames += 1
+
+    def get_pairs_counter(self) -> int:
+        return self.pairs_counter
+
+    def get_dropped_frames(self) -> int:
+        return self.dropped_frames
+
+    def get_mean_skew_ms(self) -> float:
+        if self.pairs_counter == 0:
+            return 0.0
+        return self.skew_sum / self.pairs_counter / 1e6
+
+    def get_max_skew_ms(self) -> float:
+        return self.max_skew / 1e6
+
+    def get_last_skew_ms(self) -> float:
+        return self.last_skew / 1e6
@@ -0,0 +1,57 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class Undistorter(object):
+    """ Undistorts frames with remap tables built once per calibration, or only a set of points """
+
+    def __init__(self, intrinsics_matrix: np.ndarray, distortion_coefficients: np.ndarray):
+        self.intrinsics_matrix = intrinsics_matrix
+        self.distortion_coefficients = distortion_coefficients
+        self.frame_size = None
+        self.map_1 = None
+        self.map_2 = None
+
+    def matches(self, intrinsics_matrix: np.ndarray, distortion_coefficients: np.ndarray) -> bool:
+        return self.intrinsics_matrix is intrinsics_matrix and self.distortion_coefficients is distortion_coefficients
+
+    def build_maps(self, frame_size: tuple[int, int]) -> None:
+        # Fixed point maps make remap roughly twice as fast as the float ones
+        self.map_1, self.map_2 = cv2.initUndistortRectifyMap(
+            self.intrinsics_matrix,
+            self.distortion_coefficients,
+            None,
+            self.intrinsics_matrix,
+            frame_size,
+            cv2.CV_16SC2
+        )
+        self.frame_size = frame_size
+
+    def get_maps(self) -> tuple:
+        """ (frame size, map 1, map 2), the maps are None until a frame was undistorted """
+        return self.frame_size, self.map_1, self.map_2
+
+    def set_maps(self, frame_size: tuple[int, int], map_1: np.ndarray, map_2: np.ndarray) -> None:
+        """ Maps built beforehand by build_maps, e.g. loaded from a calibration bundle """
+        self.map_1 = map_1
+        self.map_2 = map_2
+        self.frame_size = frame_size
+
+    def undistort_frame(self, frame: np.ndarray, destination: Optional[np.ndarray] = None) -> np.ndarray:
+        height, width = frame.shape[:2]
+        if self.frame_size != (width, height):
+            self.build_maps((width, height))
+        return cv2.remap(frame, self.map_1, self.map_2, cv2.INTER_LINEAR, destination)
+
+    def undistort_points(self, points_2d: np.ndarray) -> np.ndarray:
+        """ Undistorts (N, 2) pixel coordinates, the result stays in pixel coordinates """
+        points_2d = np.ascontiguousarray(points_2d, dtype=np.float32).reshape(-1, 1, 2)
+        undistorted_points = cv2.undistortPoints(
+            points_2d,
+            self.intrinsics_matrix,
+            self.distortion_coefficients,
+            P=self.intrinsics_matrix
+        )
+        return undistorted_points.reshape(-1, 2)
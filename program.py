@@ -1,27 +1,35 @@
+import time
 from time import sleep
 
 import cv2
 
 from logic.camera import Camera
 from data.chessboard_data import ChessboardData
+from data.landmark_set import LandmarkSet
 from logic.filesystem import ImagesFileSystem, ConfigsFileSystem
+from logic.metrics.latency_metrics import LatencyMetrics, SPAN_CAPTURE, SPAN_END_TO_END, SPAN_ENCODE, SPAN_SEND
 from logic.mocap.mocap_core import MocapCore
-from logic.packet_builder import PacketBuilder
-from logic.stats import Stats
+from logic.output.udp_output_service import UdpOutputService
+from logic.packet_encoder import PacketEncoder
 from logic.stereo_cameras import StereoCameras
-from logic.udp_server import UdpServer
+from logic.stereo_rig import StereoRig
+
+FRAME_WAIT_TIMEOUT = 0.5
+# Set a file path to dump the latency histograms there when the mocap stops
+LATENCY_METRICS_PATH = None
 
 
 class Program:
     def __init__(self):
         self.imagesFileSystem = ImagesFileSystem('./images')
         self.configsFileSystem = ConfigsFileSystem('./configs')
-        self.stereo_cameras = StereoCameras(Camera(1, 30, False), Camera(0, 30, False))
+        self.stereo_cameras = StereoCameras(Camera(1, 30, True), Camera(0, 30, True), synchronized=True)
         self.chessboard_data = ChessboardData(9, 6, 0.016)
-        self.mocap_core = MocapCore()
-        self.packet_builder = PacketBuilder()
-        self.udp_server = UdpServer('127.0.0.1', 5005)
-        self.stats = Stats()
+        self.latency_metrics = LatencyMetrics()
+        self.mocap_core = MocapCore(self.latency_metrics)
+        # Same stamped format as the pipeline, tools/latency_receiver.py can measure its latency
+        self.packet_encoder = PacketEncoder(max_hands=1)
+        self.packet_output = UdpOutputService([('127.0.0.1', 5005)])
 
     def take_pictures_for_calibration(self) -> None:
         print('Starting soon...')
@@ -31,11 +39,20 @@ class Program:
             sleep(3)
             print('Picture #', i)
             for camera in self.stereo_cameras.get_cameras_as_list():
-                frame = camera.get_frame()
-                cv2.imshow('Chessboard Pictures', frame)
-                self.imagesFileSystem.save_image(('/' + camera.get_camera_name() + '/picture_' + str(i) + '.jpg'), frame)
+                self.save_shared_frame(camera, '/' + camera.get_camera_name() + '/picture_' + str(i) + '.jpg', True)
         print('Finished !')
 
+    def save_shared_frame(self, camera: Camera, image_path: str, show = False) -> None:
+        # Leased for the whole encoding, the capture can't overwrite the slot meanwhile
+        frame_lease = camera.acquire_shared_frame()
+        if frame_lease is None:
+            print('No frame yet for ' + camera.get_camera_name())
+            return
+        with frame_lease:
+            if show:
+                cv2.imshow('Chessboard Pictures', frame_lease.get_frame())
+            self.imagesFileSystem.save_image(image_path, frame_lease.get_frame())
+
     def calibrate_cameras_individually(self) -> None:
         self.stereo_cameras.calibrate_all_cameras_individually(self.imagesFileSystem, self.chessboard_data)
         for camera in self.stereo_cameras.get_cameras_as_list():
@@ -45,47 +62,70 @@ class Program:
         calibration_data_list = self.stereo_cameras.calibrate_all_cameras_individually(self.imagesFileSystem, self.chessboard_data)
         calibration_stereo_data = self.stereo_cameras.calibrate_stereo_cameras(calibration_data_list)
 
-    def execute_full_logic(self) -> None:
+    def load_or_calibrate_stereo_rig(self) -> StereoRig:
+        """ Starts from the saved calibration bundle of these cameras, calibrates and saves one otherwise """
+        stereo_rig = StereoRig(self.stereo_cameras.get_left_camera(), self.stereo_cameras.get_right_camera())
+        if self.configsFileSystem.load_stereo_cameras_configs(stereo_rig):
+            print('Calibration loaded from ' + self.configsFileSystem.get_stereo_cameras_calibration_config_path(stereo_rig))
+            return stereo_rig
         print('Calibration camera')
         calibration_data_list = self.stereo_cameras.calibrate_all_cameras_individually(self.imagesFileSystem, self.chessboard_data)
         print('Calibration stereo')
-        calibration_stereo_data = self.stereo_cameras.calibrate_stereo_cameras(calibration_data_list)
+        stereo_rig.set_calibration_stereo_data(self.stereo_cameras.calibrate_stereo_cameras(calibration_data_list))
+        self.configsFileSystem.save_stereo_cameras_configs(stereo_rig, calibration_data_list[0].get_image_size())
+        return stereo_rig
+
+    def execute_full_logic(self) -> None:
+        stereo_rig = self.load_or_calibrate_stereo_rig()
         print('Mocap core...')
-        left_camera = self.stereo_cameras.get_left_camera()
-        right_camera = self.stereo_cameras.get_right_camera()
 
+        latency_metrics = self.latency_metrics
         v = 0
         while self.stereo_cameras.is_started():
-            positions = self.mocap_core.triangulate(
-                calibration_stereo_data.get_rotation_matrix(),
-                calibration_stereo_data.get_translation_matrix(),
-                left_camera,
-                right_camera,
-                v
-            )
+            stereo_frame_pair = self.stereo_cameras.wait_for_next_frames(FRAME_WAIT_TIMEOUT)
+            if stereo_frame_pair is None:
+                continue
+            with stereo_frame_pair:
+                timestamp = stereo_frame_pair.get_timestamp()
+                # How old the pair is when the processing starts, not how long the loop waited for it
+                latency_metrics.record(SPAN_CAPTURE, time.perf_counter_ns() - timestamp)
+                positions = self.mocap_core.triangulate(
+                    stereo_rig,
+                    v,
+                    frame1=stereo_frame_pair.get_left_frame(),
+                    frame2=stereo_frame_pair.get_right_frame(),
+                )
             if positions is not None:
-                packet = self.packet_builder.build_hand_packet(positions)
-                self.udp_server.send(packet)
-
-            self.stats.increment_frame_counter()
-            fps = self.stats.compute_fps()
-            #print(fps)
+                encode_start = latency_metrics.start()
+                packet = self.packet_encoder.encode([LandmarkSet(positions, timestamp=timestamp)])
+                latency_metrics.stop(SPAN_ENCODE, encode_start)
+                send_start = latency_metrics.start()
+                self.packet_output.send(packet)
+                latency_metrics.stop(SPAN_SEND, send_start)
+                latency_metrics.record(SPAN_END_TO_END, time.perf_counter_ns() - timestamp)
             # if cv2.waitKey(1) & 0xFF == ord('q'):
             #     break
             # cv2.imshow('Mocap', left_camera.get_frame())
             v += 1
+        skew_stats = self.stereo_cameras.get_skew_stats()
+        print('Dropped frames (left, right): ' + str(self.stereo_cameras.get_dropped_frames()))
+        print(f'Stereo skew: mean {skew_stats.get_mean_skew_ms():.2f}ms, max {skew_stats.get_max_skew_ms():.2f}ms, unmatched {skew_stats.get_dropped_frames()}')
+        print(f'Packets sent {self.packet_output.get_sent_packets()}, dropped {self.packet_output.get_dropped_packets()}')
+        print(latency_metrics.get_report())
+        if LATENCY_METRICS_PATH is not None:
+            latency_metrics.dump(LATENCY_METRICS_PATH)
         print('Finished')
 
     def takes_pictures(self):
         sleep(3)
-        left_frame = self.stereo_cameras.get_left_camera().get_frame()
-        right_frame = self.stereo_cameras.get_right_camera().get_frame()
-        self.imagesFileSystem.save_image('/tests/images_test_0.jpg', left_frame)
-        self.imagesFileSystem.save_image('/tests/images_test_1.jpg', right_frame)
+        self.save_shared_frame(self.stereo_cameras.get_left_camera(), '/tests/images_test_0.jpg')
+        self.save_shared_frame(self.stereo_cameras.get_right_camera(), '/tests/images_test_1.jpg')
 
     def execute(self):
         self.stereo_cameras.start_all_cameras()
+        self.packet_output.start()
         self.execute_full_logic()
+        self.packet_output.close()
         self.stereo_cameras.stop_all_cameras()
 
 
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from data.calibration_stereo_data import CalibrationStereoData
+from logic.calibration_bundle import CalibrationBundle
+from logic.camera import Camera
+from logic.stereo_rig import StereoRig
+
+IMAGE_SIZE = (64, 48)
+
+
+def create_stereo_rig() -> StereoRig:
+    return StereoRig(Camera(2, 60), Camera(0, 60))
+
+
+def create_calibrated_stereo_rig() -> StereoRig:
+    stereo_rig = create_stereo_rig()
+    intrinsics_matrix = np.array([[50.0, 0.0, 32.0], [0.0, 50.0, 24.0], [0.0, 0.0, 1.0]])
+    for camera, distortion in ((stereo_rig.get_left_camera(), 0.1), (stereo_rig.get_right_camera(), -0.1)):
+        camera.set_intrinsics_matrix(intrinsics_matrix.copy())
+        camera.set_distortion_coefficients(np.array([[distortion, 0.01, 0.0, 0.0, 0.0]]))
+        camera.set_calibrated(True)
+    stereo_rig.set_calibration_stereo_data(CalibrationStereoData(
+        np.eye(3),
+        np.array([[-0.1], [0.0], [0.0]]),
+        None,
+        None,
+    ))
+    return stereo_rig
+
+
+def test_save_after_load_keeps_the_bundle_intact(tmp_path):
+    directory = str(tmp_path / 'stereo')
+    stereo_rig = create_calibrated_stereo_rig()
+    CalibrationBundle(directory).save(stereo_rig, IMAGE_SIZE)
+    expected_maps = [np.array(camera.get_undistorter().get_maps()[1]) for camera in (stereo_rig.get_left_camera(), stereo_rig.get_right_camera())]
+
+    loaded_stereo_rig = create_stereo_rig()
+    assert CalibrationBundle(directory).load(loaded_stereo_rig)
+    # The loaded maps are memory-mapped from the bundle files, saving them again must not write into those files
+    CalibrationBundle(directory).save(loaded_stereo_rig, IMAGE_SIZE)
+    loaded_maps = [camera.get_undistorter().get_maps()[1] for camera in (loaded_stereo_rig.get_left_camera(), loaded_stereo_rig.get_right_camera())]
+    for expected_map, loaded_map in zip(expected_maps, loaded_maps):
+        np.testing.assert_array_equal(loaded_map, expected_map)
+
+    reloaded_stereo_rig = create_stereo_rig()
+    assert CalibrationBundle(directory).load(reloaded_stereo_rig)
+    reloaded_maps = [camera.get_undistorter().get_maps()[1] for camera in (reloaded_stereo_rig.get_left_camera(), reloaded_stereo_rig.get_right_camera())]
+    for expected_map, reloaded_map in zip(expected_maps, reloaded_maps):
+        np.testing.assert_array_equal(reloaded_map, expected_map)
+    np.testing.assert_array_equal(reloaded_stereo_rig.get_left_camera().get_intrinsics_matrix(), stereo_rig.get_left_camera().get_intrinsics_matrix())
+
+
+def test_save_only_keeps_the_files_of_the_last_generation(tmp_path):
+    directory = str(tmp_path / 'stereo')
+    stereo_rig = create_calibrated_stereo_rig()
+    calibration_bundle = CalibrationBundle(directory)
+    calibration_bundle.save(stereo_rig)
+    calibration_bundle.save(stereo_rig)
+    manifest = calibration_bundle.read_manifest()
+    assert manifest['generation'] == 1
+    array_files = sorted(file_name for file_name in os.listdir(directory) if file_name.endswith('.npy'))
+    assert array_files == sorted(manifest['arrays'].values())
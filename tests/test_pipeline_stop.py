@@ -0,0 +1,111 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from logic.common.stereo_frame_pair import StereoFramePair
+from logic.pipeline.bounded_queue import BoundedQueue, DROP_POLICY_BLOCK
+from logic.pipeline.pipeline_stage import PipelineStage
+
+STOP_TIMEOUT = 2.0
+
+
+class FakeLease(object):
+    def __init__(self, timestamp: int):
+        self.timestamp = timestamp
+        self.frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        self.released = False
+
+    def get_frame(self) -> np.ndarray:
+        return self.frame
+
+    def get_timestamp(self) -> int:
+        return self.timestamp
+
+    def release(self) -> None:
+        self.released = True
+
+
+class FakeStereoCameras(object):
+    """ Delivers frames as fast as asked, every lease is kept to check that all of them are released """
+
+    def __init__(self):
+        self.leases = []
+
+    def is_started(self) -> bool:
+        return True
+
+    def wait_for_next_frames(self, timeout = None):
+        timestamp = time.perf_counter_ns()
+        left_lease, right_lease = FakeLease(timestamp), FakeLease(timestamp)
+        self.leases += [left_lease, right_lease]
+        return StereoFramePair(left_lease, right_lease)
+
+
+class BlockedHandsCore(object):
+    """ Detection never finishes until released, so that every queue upstream fills up """
+
+    def __init__(self):
+        self.release_event = threading.Event()
+
+    def detects_raw_points_3d_multi(self, frames, rgb = False):
+        self.release_event.wait()
+        return None, None
+
+
+def test_stop_wakes_a_stage_blocked_on_a_full_queue():
+    input_queue = BoundedQueue(1, DROP_POLICY_BLOCK)
+    output_queue = BoundedQueue(1, DROP_POLICY_BLOCK)
+    discarded = []
+    stage = PipelineStage('producer', lambda item: item, input_queue, output_queue, discarded.append)
+    stage.start()
+    # The first item fills the output queue, the second one blocks the stage inside put()
+    input_queue.put(1)
+    input_queue.put(2)
+    time.sleep(0.2)
+    stage.stop()
+    output_queue.close()
+    stage.join(STOP_TIMEOUT)
+    assert not stage.thread.is_alive()
+    assert discarded == [2]
+
+
+def test_block_policy_pipeline_stops_while_full():
+    pytest.importorskip('mediapipe')
+    from logic.output.packet_output import PacketOutput
+    from logic.pipeline.mocap_pipeline import MocapPipeline
+
+    class NullOutput(PacketOutput):
+        def start(self) -> None:
+            pass
+
+        def stop(self) -> None:
+            pass
+
+        def is_running(self) -> bool:
+            return True
+
+        def send(self, data) -> None:
+            pass
+
+        def get_sent_packets(self) -> int:
+            return 0
+
+        def get_dropped_packets(self) -> int:
+            return 0
+
+    stereo_cameras = FakeStereoCameras()
+    hands_core = BlockedHandsCore()
+    mocap_pipeline = MocapPipeline(stereo_cameras, hands_core, None, NullOutput(), queue_size=1, drop_policy=DROP_POLICY_BLOCK)
+    mocap_pipeline.start()
+    time.sleep(0.3)
+    stopper = threading.Thread(target=mocap_pipeline.stop, daemon=True)
+    stopper.start()
+    # The detection stage only returns once stop() has closed the queues behind it
+    time.sleep(0.1)
+    hands_core.release_event.set()
+    stopper.join(STOP_TIMEOUT)
+    assert not stopper.is_alive()
+    assert not any(stage.thread.is_alive() for stage in mocap_pipeline.get_stages())
+    assert all(lease.released for lease in stereo_cameras.leases)
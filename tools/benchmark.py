@@ -0,0 +1,44 @@
+import argparse
+import time
+
+from logic.mocap.mocap_hands_core import MocapHandsCore
+from logic.stereo_cameras import StereoCameras
+
+
+def create_stereo_cameras(arguments) -> StereoCameras:
+    if arguments.left_video is not None and arguments.right_video is not None:
+        return StereoCameras.from_video_files(arguments.left_video, arguments.right_video, arguments.real_time, shared_mode=False)
+    return StereoCameras.from_synthetic(arguments.width, arguments.height, arguments.fps, arguments.real_time, shared_mode=False)
+
+
+def run_benchmark(arguments) -> None:
+    stereo_cameras = create_stereo_cameras(arguments)
+    mocap_hands_core = MocapHandsCore(parallel_detection=arguments.parallel)
+    stereo_cameras.start_all_cameras()
+    frames_counter = 0
+    start_time = time.perf_counter()
+    while stereo_cameras.is_started() and frames_counter < arguments.frames:
+        try:
+            left_frame, right_frame = stereo_cameras.get_frames()
+        except IOError:
+            # End of the videos: what was measured so far is the result
+            break
+        mocap_hands_core.detects_raw_points_3d_stereo(left_frame, right_frame)
+        frames_counter += 1
+    elapsed_time = time.perf_counter() - start_time
+    stereo_cameras.stop_all_cameras()
+    mocap_hands_core.release()
+    print(f"{frames_counter} stereo frames in {elapsed_time:.2f}s ({frames_counter / max(elapsed_time, 1e-9):.1f} fps)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measures the mocap throughput without physical cameras")
+    parser.add_argument('--left-video', default=None)
+    parser.add_argument('--right-video', default=None)
+    parser.add_argument('--width', type=int, default=1080)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--real-time', action='store_true')
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--parallel', action='store_true')
+    run_benchmark(parser.parse_args())
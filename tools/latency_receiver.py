@@ -0,0 +1,62 @@
+import argparse
+import json
+import socket
+import time
+
+from logic.metrics.packet_latency_tracker import PacketLatencyTracker
+from logic.packet_encoder import PACKET_HEADER, PACKET_MAGIC
+
+RECEIVE_TIMEOUT = 0.5
+MAX_PACKET_SIZE = 65536
+
+
+def run_receiver(arguments) -> None:
+    """ Listens where the game does and measures how old the poses are when they arrive """
+    receiver_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver_socket.bind((arguments.host, arguments.port))
+    receiver_socket.settimeout(RECEIVE_TIMEOUT)
+    packet_latency_tracker = PacketLatencyTracker()
+    buffer = bytearray(MAX_PACKET_SIZE)
+    ignored_packets = 0
+    start_time = time.monotonic()
+    next_report_time = start_time + arguments.interval
+    print(f"Listening on {arguments.host}:{arguments.port}")
+    try:
+        while arguments.duration <= 0 or time.monotonic() - start_time < arguments.duration:
+            try:
+                size = receiver_socket.recv_into(buffer)
+                # Stamped before parsing, the parsing is part of the receiver, not of the latency
+                receive_time = time.perf_counter_ns()
+            except socket.timeout:
+                size = 0
+            if size >= PACKET_HEADER.size:
+                magic, version, hands_number, landmarks_number, sequence, timestamp = PACKET_HEADER.unpack_from(buffer, 0)
+                if magic == PACKET_MAGIC:
+                    packet_latency_tracker.add(sequence, timestamp, receive_time)
+                else:
+                    ignored_packets += 1
+            elif size > 0:
+                ignored_packets += 1
+            if time.monotonic() >= next_report_time:
+                print(packet_latency_tracker.get_report())
+                next_report_time += arguments.interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver_socket.close()
+    print(packet_latency_tracker.get_report())
+    if ignored_packets > 0:
+        print(f"{ignored_packets} packets without mocap header ignored (legacy format?)")
+    if arguments.dump is not None:
+        with open(arguments.dump, 'w') as file:
+            json.dump(packet_latency_tracker.snapshot(), file, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reports the capture to receive latency, jitter and loss of the mocap packets (same host only)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--interval', type=float, default=5.0, help="Seconds between two reports")
+    parser.add_argument('--duration', type=float, default=0.0, help="Seconds to listen, 0 until interrupted")
+    parser.add_argument('--dump', default=None, help="JSON file to write the final statistics to")
+    run_receiver(parser.parse_args())
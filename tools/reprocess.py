@@ -0,0 +1,41 @@
+import argparse
+import time
+
+import numpy as np
+
+from data.calibration_stereo_data import CalibrationStereoData
+from logic.offline.offline_reprocessor import OfflineReprocessor
+from logic.stereo_cameras import StereoCameras
+from logic.stereo_rig import StereoRig
+
+
+def create_stereo_rig(arguments) -> StereoRig:
+    stereo_cameras = StereoCameras.from_video_files(arguments.left_video, arguments.right_video, real_time=False, shared_mode=False)
+    left_camera = stereo_cameras.get_left_camera()
+    right_camera = stereo_cameras.get_right_camera()
+    calibration = np.load(arguments.calibration)
+    left_camera.set_intrinsics_matrix(calibration['K1'])
+    left_camera.set_distortion_coefficients(calibration['D1'])
+    right_camera.set_intrinsics_matrix(calibration['K2'])
+    right_camera.set_distortion_coefficients(calibration['D2'])
+    return StereoRig(left_camera, right_camera, CalibrationStereoData(calibration['R'], calibration['T']))
+
+
+def run_reprocessing(arguments) -> None:
+    offline_reprocessor = OfflineReprocessor(create_stereo_rig(arguments), arguments.chunk_size, arguments.warm_up, arguments.workers)
+    start_time = time.perf_counter()
+    frames_number = offline_reprocessor.process(arguments.left_video, arguments.right_video, arguments.output)
+    elapsed_time = time.perf_counter() - start_time
+    print(f"{frames_number} stereo frames in {elapsed_time:.2f}s ({frames_number / max(elapsed_time, 1e-9):.1f} fps), session written to {arguments.output}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reprocesses a recorded stereo video pair on all cores into a session")
+    parser.add_argument('--left-video', required=True)
+    parser.add_argument('--right-video', required=True)
+    parser.add_argument('--calibration', required=True, help="npz file holding K1, D1, K2, D2, R and T")
+    parser.add_argument('--output', required=True, help="Session directory")
+    parser.add_argument('--chunk-size', type=int, default=300)
+    parser.add_argument('--warm-up', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=None)
+    run_reprocessing(parser.parse_args())
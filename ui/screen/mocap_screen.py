@@ -1,3 +1,5 @@
+import os
+import time
 from threading import Thread
 from time import sleep
 
@@ -9,18 +11,37 @@ from kivy.uix.label import Label
 from kivy.uix.widget import Widget
 
 from data.math.point_2d import Point2D
+from logic.calibration_capture_worker import CalibrationCaptureWorker
 from logic.calibrator import Calibrator
 from logic.camera import Camera
 from data.chessboard_data import ChessboardData
-from logic.filesystem import ImagesFileSystem
+from logic.filesystem import ImagesFileSystem, ConfigsFileSystem
+from logic.metrics.latency_metrics import LatencyMetrics
+from logic.metrics.metrics_server import MetricsServer
 from logic.mocap.mocap_hands_core import MocapHandsCore
-from logic.packet_builder import PacketBuilder
+from logic.mocap.mocap_results_bus import MocapResultsBus
+from logic.output.packet_output import PacketOutput
+from logic.output.shared_memory_output import SharedMemoryOutput
+from logic.output.udp_output_service import UdpOutputService
+from logic.pipeline.mocap_pipeline import MocapPipeline
+from logic.recording.session_recorder import SessionRecorder
 from logic.stereo_cameras import StereoCameras
-from logic.udp_server import UdpServer
+from logic.stereo_rig import StereoRig
 from ui.widget.common_checkbox import CommonCheckbox
 from ui.widget.log_widget import LogWidget
 from ui.widget.mocap_stereo_view_widget import MocapStereoViewWidget
 
+FRAME_WAIT_TIMEOUT = 0.5
+# Game engine on the same host: set a file path to publish through shared memory instead of UDP
+SHARED_MEMORY_OUTPUT_PATH = None
+# Set a directory to record the sessions (one subdirectory each), to replay them later without anyone in front of the cameras
+SESSION_RECORDING_DIRECTORY = None
+# Per stage latency histograms, logged every METRICS_LOG_INTERVAL seconds while the mocap runs
+LATENCY_METRICS_ENABLED = False
+METRICS_LOG_INTERVAL = 10.0
+# Set a port to also serve them as JSON on http://127.0.0.1:<port>/metrics
+METRICS_SERVER_PORT = None
+
 
 class MocapMainScreen(BoxLayout):
     def __init__(self, **kwargs):
@@ -37,13 +58,36 @@ class MocapMainScreen(BoxLayout):
         self.stereo_cameras = StereoCameras(
             Camera(2, 60, True),
             Camera(0, 60, True),
+            synchronized=True,
         )
+        self.stereo_rig = StereoRig(self.stereo_cameras.get_left_camera(), self.stereo_cameras.get_right_camera())
         self.chessboard_data = ChessboardData(9, 6, 0.016)
         self.calibrator = Calibrator(self.chessboard_data)
         self.image_file_system = ImagesFileSystem(r"E:\Users\malik\Documents\Projects\NoGit\Python\MediapipeTest\images")
-        self.udp_server = UdpServer('127.0.0.1', 5005)
+        self.configs_file_system = ConfigsFileSystem('./configs')
+        self.calibration_capture_worker = CalibrationCaptureWorker(
+            self.stereo_cameras,
+            self.calibrator,
+            self.image_file_system,
+            on_log=self.post_log_entry,
+        )
+        self.packet_output = self.create_packet_output()
         self.build_interface()
-        self.mocap_hands_core = MocapHandsCore()
+        if self.configs_file_system.load_stereo_cameras_configs(self.stereo_rig):
+            self.log_widget.add_log_entry("Calibration loaded, mocap can run right away")
+        self.mocap_hands_core = MocapHandsCore(parallel_detection=True)
+        self.mocap_pipeline = None
+        self.session_recorder = None
+        self.mocap_results_bus = MocapResultsBus()
+        self.latency_metrics = LatencyMetrics(LATENCY_METRICS_ENABLED)
+        self.metrics_server = None
+        self.sampling_thread = None
+
+    @staticmethod
+    def create_packet_output() -> PacketOutput:
+        if SHARED_MEMORY_OUTPUT_PATH is not None:
+            return SharedMemoryOutput(SHARED_MEMORY_OUTPUT_PATH)
+        return UdpOutputService([('127.0.0.1', 5005)])
 
     def build_interface(self):
         left_area = self.create_left_area()
@@ -108,24 +152,22 @@ class MocapMainScreen(BoxLayout):
         return button
 
     def on_capture_button_pressed(self, instance):
-        Clock.schedule_interval(self.on_capture_timer_elapsed, 3)
-        self.log_widget.add_log_entry("Capture starting in 3 seconds")
-        self.counter = 0
+        if self.calibration_capture_worker.is_running():
+            self.log_widget.add_log_entry("Capture already running")
+            return
+        if self.is_mocap_running():
+            # Both would read the same frame readers and each get only part of the frames
+            self.log_widget.add_log_entry("Stop the mocap before capturing chessboards")
+            return
+        if self.is_sampling_running():
+            self.log_widget.add_log_entry("Wait for the sampling to finish")
+            return
+        self.log_widget.add_log_entry("Capture started, show the chessboard to both cameras")
+        self.calibration_capture_worker.start()
 
-    def on_capture_timer_elapsed(self, dt:float):
-        self.log_widget.add_log_entry("Capturing...")
-        result, left_frame, right_frame = self.calibrator.capture_stereo(self.stereo_cameras)
-        if result:
-            self.log_widget.add_log_entry("Success for iteration #" + str(self.counter + 1))
-            self.image_file_system.save_image(('/' + self.stereo_cameras.get_left_camera().get_camera_name() + '/picture_' + str(self.counter) + '.jpg'), left_frame)
-            self.image_file_system.save_image(('/' + self.stereo_cameras.get_right_camera().get_camera_name() + '/picture_' + str(self.counter) + '.jpg'), right_frame)
-            self.counter += 1
-        else:
-            self.log_widget.add_log_entry("Fail for iteration #" + str(self.counter + 1) + ", try again in 3 seconds")
-        if self.counter == 10:
-            self.log_widget.add_log_entry("Congratulations, you have captured chessboards for calibration !")
-            self.counter = 0
-            Clock.unschedule(self.on_capture_timer_elapsed)
+    def post_log_entry(self, message: str) -> None:
+        """ Thread safe log, the entry is added by the UI thread on its next frame """
+        Clock.schedule_once(lambda dt: self.log_widget.add_log_entry(message))
 
     def on_calibrate_button_pressed(self, instance):
         self.log_widget.add_log_entry("Calibrating all cameras individually...")
@@ -133,71 +175,59 @@ class MocapMainScreen(BoxLayout):
 
     def calibrate_cameras_individually(self):
         calibration_data_list = self.stereo_cameras.calibrate_all_cameras_individually(self.image_file_system, self.chessboard_data)
-        self.calibration_stereo_data = self.stereo_cameras.calibrate_stereo_cameras(calibration_data_list)
+        self.stereo_rig.set_calibration_stereo_data(self.stereo_cameras.calibrate_stereo_cameras(calibration_data_list))
+        self.configs_file_system.save_stereo_cameras_configs(self.stereo_rig, calibration_data_list[0].get_image_size())
+
+    def is_mocap_running(self) -> bool:
+        return self.mocap_pipeline is not None and self.mocap_pipeline.is_running()
+
+    def is_sampling_running(self) -> bool:
+        return self.sampling_thread is not None and self.sampling_thread.is_alive()
 
     def on_run_button_pressed(self, instance):
+        if self.calibration_capture_worker.is_running():
+            self.log_widget.add_log_entry("Wait for the chessboard capture to finish")
+            return
+        if self.is_sampling_running():
+            # The sampling initializes the trackers the pipeline filters with
+            self.log_widget.add_log_entry("Wait for the sampling to finish")
+            return
         self.log_widget.add_log_entry("Mocap is running...")
-        Thread(target=self.run_mocap_stereo_cameras, daemon=True).start()
+        self.run_mocap_stereo_cameras()
 
     def run_mocap_stereo_cameras(self):
-        mocap_hands_core = self.mocap_hands_core
-        packet_builder = PacketBuilder()
-        while self.stereo_cameras.is_started():
-            left_frame = self.stereo_cameras.get_left_camera().get_shared_frame()
-            right_frame = self.stereo_cameras.get_right_camera().get_shared_frame()
-            left_cam_points_3d, right_cam_points_3d = mocap_hands_core.detects_raw_points_3d_stereo(
-                left_frame,
-                right_frame,
-            )
-            if left_cam_points_3d is not None and right_cam_points_3d is not None:
-                height, width, _ = left_frame.shape
-                left_cam_filtrated_points_3d, right_cam_filtrated_points_3d = mocap_hands_core.apply_filtration_trackers_2d(left_cam_points_3d, right_cam_points_3d)
-                left_cam_filtrated_points_3d, right_cam_filtrated_points_3d = mocap_hands_core.convert_for_triangulation(left_cam_filtrated_points_3d, right_cam_filtrated_points_3d, Point2D(width, height))
-                positions = mocap_hands_core.triangulate_raw_points(
-                    left_cam_filtrated_points_3d,
-                    right_cam_filtrated_points_3d,
-                    self.stereo_cameras.get_left_camera().get_intrinsics_matrix(),
-                    self.stereo_cameras.get_right_camera().get_intrinsics_matrix(),
-                    self.calibration_stereo_data,
-                )
-                if positions is not None:
-                    positions = mocap_hands_core.apply_filtration_tracker_3d(positions)
-                    packet = packet_builder.build_hand_packet(positions)
-                    self.udp_server.send(packet)
-            # if left_cam_landmarks is not None and right_cam_landmarks is not None:
-            #     if left_cam_landmarks.multi_hand_landmarks is not None and right_cam_landmarks.multi_hand_landmarks is not None:
-            #         height,width,_ = left_frame.shape
-            #         left_landmarks = left_cam_landmarks.multi_hand_landmarks[0].landmark
-            #         right_landmarks = right_cam_landmarks.multi_hand_landmarks[0].landmark
-            #         left_landmarks = mocap_hands_core.converts_landmarks_to_np_array(left_landmarks)
-            #         right_landmarks = mocap_hands_core.converts_landmarks_to_np_array(right_landmarks)
-            #         left_landmarks_3d_fake = Tools.converts_2d_points_to_3d_points(left_landmarks)
-            #         right_landmarks_3d_fake = Tools.converts_2d_points_to_3d_points(right_landmarks)
-            #         # left_landmarks, right_landmarks = mocap_hands_core.apply_filtration(left_landmarks_3d_fake, right_landmarks_3d_fake)
-            #         positions = mocap_hands_core.triangulate_raw_points(
-            #             left_landmarks,
-            #             right_landmarks,
-            #             self.stereo_cameras.get_left_camera().get_intrinsics_matrix(),
-            #             self.stereo_cameras.get_right_camera().get_intrinsics_matrix(),
-            #             self.calibration_stereo_data,
-            #         )
-            #         if positions is not None:
-            #             packet = packet_builder.build_hand_packet(positions)
-            #             self.udp_server.send(packet)
+        if self.mocap_pipeline is not None:
+            self.mocap_pipeline.stop()
+        if SESSION_RECORDING_DIRECTORY is not None and self.session_recorder is None:
+            # One directory per session, a recorder never appends to an older one
+            self.session_recorder = SessionRecorder(os.path.join(SESSION_RECORDING_DIRECTORY, time.strftime('%Y%m%d_%H%M%S')))
+            self.session_recorder.open()
+        self.mocap_pipeline = MocapPipeline(
+            self.stereo_cameras,
+            self.mocap_hands_core,
+            self.stereo_rig,
+            self.packet_output,
+            self.mocap_results_bus,
+            session_recorder=self.session_recorder,
+            latency_metrics=self.latency_metrics,
+        )
+        self.packet_output.start()
+        self.mocap_pipeline.start()
+        if self.latency_metrics.is_enabled():
+            self.start_metrics_reporting()
 
-    # def run_mocap_stereo_cameras(self):
-    #     mocap_core = MocapCore()
-    #     packet_builder = PacketBuilder()
-    #     calibration_stereo_data = self.calibration_stereo_data
-    #     while self.stereo_cameras.is_started():
-    #         positions = mocap_core.full_process(
-    #             self.stereo_cameras.get_left_camera(),
-    #             self.stereo_cameras.get_right_camera(),
-    #             calibration_stereo_data)
-    #         if positions is not None:
-    #             filtered_position = self.multi_filters.correct_and_predict(positions)
-    #             packet = packet_builder.build_hand_packet(filtered_position)
-    #             self.udp_server.send(packet)
+    def start_metrics_reporting(self):
+        Clock.unschedule(self.on_metrics_timer_elapsed)
+        Clock.schedule_interval(self.on_metrics_timer_elapsed, METRICS_LOG_INTERVAL)
+        if METRICS_SERVER_PORT is not None and self.metrics_server is None:
+            self.metrics_server = MetricsServer(self.latency_metrics, METRICS_SERVER_PORT)
+            self.metrics_server.start()
+            self.log_widget.add_log_entry("Metrics served on http://127.0.0.1:" + str(METRICS_SERVER_PORT) + "/metrics")
+
+    def on_metrics_timer_elapsed(self, dt: float):
+        report = self.latency_metrics.get_report()
+        if report:
+            self.log_widget.add_log_entry(report)
 
     # def on_sample_error_button_pressed(self, instance):
     #     mocap_core = MocapCore()
@@ -218,18 +248,42 @@ class MocapMainScreen(BoxLayout):
     #     self.multi_filters.initialize_filters(positions_captures, 21)
     #     print("DONE")
 
+    def detects_raw_points_3d_next_stereo_frames(self):
+        stereo_frame_pair = self.stereo_cameras.wait_for_next_frames(FRAME_WAIT_TIMEOUT)
+        if stereo_frame_pair is None:
+            return None, None, None
+        with stereo_frame_pair:
+            left_frame = stereo_frame_pair.get_left_frame()
+            left_cam_points_3d, right_cam_points_3d = self.mocap_hands_core.detects_raw_points_3d_stereo(
+                left_frame,
+                stereo_frame_pair.get_right_frame(),
+            )
+        return left_cam_points_3d, right_cam_points_3d, left_frame.shape
+
     def on_new_sampling(self, instance):
+        if self.is_mocap_running():
+            # The pipeline reads the same frames and filters with the trackers the sampling initializes
+            self.log_widget.add_log_entry("Stop the mocap before sampling")
+            return
+        if self.calibration_capture_worker.is_running():
+            self.log_widget.add_log_entry("Wait for the chessboard capture to finish")
+            return
+        if self.is_sampling_running():
+            self.log_widget.add_log_entry("Sampling already running")
+            return
+        self.log_widget.add_log_entry("Sampling started, show your hands to both cameras")
+        # MediaPipe runs on every sampled pair, far too slow for the UI thread
+        self.sampling_thread = Thread(target=self.sample_trackers, daemon=True)
+        self.sampling_thread.start()
+
+    def sample_trackers(self):
         mocap_hands_core = self.mocap_hands_core
         left_cam_landmarks_captures = []
         right_cam_landmarks_captures = []
         history_size = 10
         history_counter = 0
         while self.stereo_cameras.is_started() and history_counter < history_size:
-            sleep(0.005)
-            left_cam_points_3d, right_cam_points_3d = mocap_hands_core.detects_raw_points_3d_stereo(
-                self.stereo_cameras.get_left_camera().get_shared_frame(),
-                self.stereo_cameras.get_right_camera().get_shared_frame(),
-            )
+            left_cam_points_3d, right_cam_points_3d, _ = self.detects_raw_points_3d_next_stereo_frames()
             if left_cam_points_3d is not None and right_cam_points_3d is not None:
                 left_cam_landmarks_captures.append(left_cam_points_3d)
                 right_cam_landmarks_captures.append(right_cam_points_3d)
@@ -238,57 +292,53 @@ class MocapMainScreen(BoxLayout):
         history_counter = 0
         triangulated_points_3d_captures = []
         while self.stereo_cameras.is_started() and history_counter < history_size:
-            left_cam_points_3d, right_cam_points_3d = mocap_hands_core.detects_raw_points_3d_stereo(
-                self.stereo_cameras.get_left_camera().get_shared_frame(),
-                self.stereo_cameras.get_right_camera().get_shared_frame(),
-            )
+            left_cam_points_3d, right_cam_points_3d, frame_shape = self.detects_raw_points_3d_next_stereo_frames()
             if left_cam_points_3d is not None and right_cam_points_3d is not None:
-                height, width, _ = self.stereo_cameras.get_left_camera().get_shared_frame().shape
+                height, width, _ = frame_shape
                 left_cam_points_3d, right_cam_points_3d = mocap_hands_core.apply_filtration_trackers_2d(left_cam_points_3d, right_cam_points_3d)
                 left_cam_points_3d, right_cam_points_3d = mocap_hands_core.convert_for_triangulation(left_cam_points_3d, right_cam_points_3d, Point2D(width, height))
-                positions = mocap_hands_core.triangulate_raw_points(
+                left_cam_points_3d, right_cam_points_3d = mocap_hands_core.undistort_points_for_triangulation(
                     left_cam_points_3d,
                     right_cam_points_3d,
-                    self.stereo_cameras.get_left_camera().get_intrinsics_matrix(),
-                    self.stereo_cameras.get_right_camera().get_intrinsics_matrix(),
-                    self.calibration_stereo_data,
+                    self.stereo_cameras.get_left_camera().get_undistorter(),
+                    self.stereo_cameras.get_right_camera().get_undistorter(),
                 )
+                positions = mocap_hands_core.triangulate_raw_points(left_cam_points_3d, right_cam_points_3d, self.stereo_rig)
                 if positions is not None:
                     triangulated_points_3d_captures.append(positions)
                     history_counter += 1
         mocap_hands_core.initialize_trackers_3d(triangulated_points_3d_captures)
-        print("Is mocap ready ? " + str(mocap_hands_core.are_2d_trackers_initialized()))
-        print("DONE")
+        self.post_log_entry("Sampling done, trackers initialized: " + str(mocap_hands_core.are_2d_trackers_initialized()))
 
     def on_update_image_left_event(self, frame, delta_time):
-        left_hand_tracker_2d = self.mocap_hands_core.get_left_camera_hand_tracker_2d()
-        if self.debug_2d_landmarks_checkbox.is_active():
-            points_3d = left_hand_tracker_2d.detects_raw_points_3d(frame)
-            if points_3d is not None:
-                height, width, _ = frame.shape
-                if left_hand_tracker_2d.is_initialized() and self.debug_2d_kalman_checkbox.is_active():
-                    points_3d = left_hand_tracker_2d.apply_filtration(points_3d)
-                self.mocap_hands_core.draw_2d_debug(frame, points_3d, Point2D(width, height))
-            elif points_3d is None:
-                height, width, _ = frame.shape
-                if left_hand_tracker_2d.is_initialized() and self.debug_2d_kalman_checkbox.is_active():
-                    points_3d = left_hand_tracker_2d.apply_prediction()
-                    self.mocap_hands_core.draw_2d_debug(frame, points_3d, Point2D(width, height))
+        mocap_result = self.mocap_results_bus.get_latest()
+        if mocap_result is not None:
+            self.draw_2d_debug(frame, mocap_result.get_left_points_3d(), mocap_result.get_left_filtrated_points_3d())
 
     def on_update_image_right_event(self, frame, delta_time):
-        right_hand_tracker_2d = self.mocap_hands_core.get_right_camera_hand_tracker_2d()
-        if self.debug_2d_landmarks_checkbox.is_active():
-            points_3d = right_hand_tracker_2d.detects_raw_points_3d(frame)
-            if points_3d is not None:
-                height, width, _ = frame.shape
-                if right_hand_tracker_2d.is_initialized() and self.debug_2d_kalman_checkbox.is_active():
-                    points_3d = right_hand_tracker_2d.apply_filtration(points_3d)
-                self.mocap_hands_core.draw_2d_debug(frame, points_3d, Point2D(width, height))
-            elif points_3d is None:
-                height, width, _ = frame.shape
-                if right_hand_tracker_2d.is_initialized() and self.debug_2d_kalman_checkbox.is_active():
-                    points_3d = right_hand_tracker_2d.apply_prediction()
-                    self.mocap_hands_core.draw_2d_debug(frame, points_3d, Point2D(width, height))
+        mocap_result = self.mocap_results_bus.get_latest()
+        if mocap_result is not None:
+            self.draw_2d_debug(frame, mocap_result.get_right_points_3d(), mocap_result.get_right_filtrated_points_3d())
+
+    def draw_2d_debug(self, frame, points_3d, filtrated_points_3d):
+        # Only reads what the pipeline published, MediaPipe and the filters never run on the UI thread
+        if not self.debug_2d_landmarks_checkbox.is_active():
+            return
+        if self.debug_2d_kalman_checkbox.is_active() and filtrated_points_3d is not None:
+            points_3d = filtrated_points_3d
+        if points_3d is not None:
+            height, width, _ = frame.shape
+            self.mocap_hands_core.draw_2d_debug(frame, points_3d, Point2D(width, height))
 
     def release(self):
-        self.stereo_previews.release()
\ No newline at end of file
+        self.calibration_capture_worker.stop()
+        Clock.unschedule(self.on_metrics_timer_elapsed)
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.mocap_pipeline is not None:
+            self.mocap_pipeline.stop()
+        self.packet_output.close()
+        if self.session_recorder is not None:
+            self.session_recorder.close()
+        self.stereo_previews.release()
+        self.mocap_hands_core.release()
\ No newline at end of file
@@ -1,3 +1,5 @@
+from threading import Thread
+
 from kivy.uix.boxlayout import BoxLayout
 
 from logic.stereo_cameras import StereoCameras
@@ -8,10 +10,16 @@ class MocapStereoViewWidget(BoxLayout):
     def __init__(self, stereo_camera: StereoCameras,  **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'horizontal'
-        self.mocap_left_view = MocapViewWidget(stereo_camera.get_left_camera())
-        self.mocap_right_view = MocapViewWidget(stereo_camera.get_right_camera())
+        self.stereo_camera = stereo_camera
+        # Both cameras are started together so that the stereo rig can synchronize their captures
+        self.mocap_left_view = MocapViewWidget(stereo_camera.get_left_camera(), start_camera=False)
+        self.mocap_right_view = MocapViewWidget(stereo_camera.get_right_camera(), start_camera=False)
         self.add_widget(self.mocap_left_view)
         self.add_widget(self.mocap_right_view)
+        Thread(target=self.initialize_cameras, daemon=True).start()
+
+    def initialize_cameras(self):
+        self.stereo_camera.start_all_cameras()
 
     def get_mocap_left_view(self) -> MocapViewWidget:
         return self.mocap_left_view
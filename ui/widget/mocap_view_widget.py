@@ -10,8 +10,9 @@ from kivy.uix.label import Label
 from logic.camera import Camera
 
 class MocapViewWidget(BoxLayout):
-    def __init__(self, camera: Camera, on_update_image_callback = None, **kwargs):
+    def __init__(self, camera: Camera, on_update_image_callback = None, start_camera = True, undistorted_preview = False, **kwargs):
         super().__init__(**kwargs)
+        self.undistorted_preview = undistorted_preview
         self.on_update_image_callback = on_update_image_callback
         self.orientation = 'vertical'
         self.camera = camera
@@ -25,24 +26,38 @@ class MocapViewWidget(BoxLayout):
         )
         self.add_widget(self.label)
         self.add_widget(self.image)
-        Thread(target=self.initialize_camera, daemon=True).start()
+        if start_camera:
+            Thread(target=self.initialize_camera, daemon=True).start()
         Clock.schedule_interval(self.update_image, 1.0 / self.camera.get_fps())
 
     def initialize_camera(self):
         self.camera.start()
 
     def update_image(self, delta_time: float):
-        if self.camera.is_started() and self.camera.is_frame_available():
-            frame = self.camera.get_shared_frame()
-            if self.on_update_image_callback is not None:
-                self.on_update_image_callback(frame, delta_time)
+        if not (self.camera.is_started() and self.camera.is_frame_available()):
+            return
+        frame_lease = self.camera.acquire_shared_frame()
+        if frame_lease is None:
+            return
+        with frame_lease:
+            # The slot stays pinned until the converted copy is made, the capture can't overwrite it meanwhile
+            frame = frame_lease.get_frame()
+            if self.undistorted_preview and self.camera.is_calibrated():
+                # The full frame remap is only paid when the preview is asked to show it
+                frame = self.camera.get_undistorter().undistort_frame(frame)
+            # Shared frames are read-only views, the overlays draw on the converted copy (RGB)
             frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            height, width, _ = frame.shape
-            texture = Texture.create(size=(width, height), colorfmt="rgb")
-            texture.blit_buffer(frame.tobytes(), colorfmt="rgb", bufferfmt="ubyte")
-            texture.flip_vertical()
-            self.label.text = self.camera.get_camera_name() + " (" + str(self.camera.get_fps_stats()) + ")"
-            self.image.texture = texture
+        if self.on_update_image_callback is not None:
+            self.on_update_image_callback(frame, delta_time)
+        height, width, _ = frame.shape
+        texture = Texture.create(size=(width, height), colorfmt="rgb")
+        texture.blit_buffer(frame.tobytes(), colorfmt="rgb", bufferfmt="ubyte")
+        texture.flip_vertical()
+        self.label.text = self.camera.get_camera_name() + " (" + str(self.camera.get_fps_stats()) + ")"
+        self.image.texture = texture
+
+    def set_undistorted_preview(self, undistorted_preview: bool):
+        self.undistorted_preview = undistorted_preview
 
     def set_on_update_image_callback(self, on_update_image_callback):
         self.on_update_image_callback = on_update_image_callback